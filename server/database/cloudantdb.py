@@ -4,17 +4,70 @@ Handles CRUD operations for dealers and reviews.
 """
 
 import os
+import functools
 import json
 import requests
 import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from .localstore import get_local_store
 
 logger = logging.getLogger(__name__)
 
+
+def _no_timer(name):
+    return nullcontext()
+
+
+# Context manager factory wrapped around each public query as ``timer(name)``.
+# This layer keeps no metrics itself; the Django app installs its own with set_timer().
+_timer = _no_timer
+
+
+def set_timer(timer):
+    """Time every public query with ``timer(function name)``; None turns timing off."""
+    global _timer
+    _timer = timer or _no_timer
+
+
+def _timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _timer(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
 CLOUDANT_URL = os.environ.get("CLOUDANT_URL", "")
 CLOUDANT_KEY = os.environ.get("CLOUDANT_KEY", "")
 DEALERS_DB = "dealerships"
 REVIEWS_DB = "reviews"
 
+DEALER_FIELDS = ["id", "full_name", "short_name", "address", "city", "state", "st", "zip", "lat", "long"]
+
+# Mango JSON indexes: database -> [(index name, indexed fields)]
+QUERY_INDEXES = {
+    DEALERS_DB: [
+        ("dealer-id", ["id"]),
+        ("dealer-state", ["state"]),
+        ("dealer-st", ["st"]),
+    ],
+    REVIEWS_DB: [
+        ("review-dealership", ["dealership"]),
+    ],
+}
+
+# Client pool settings
+CLOUDANT_POOL_SIZE = int(os.environ.get("CLOUDANT_POOL_SIZE", "4"))
+CLOUDANT_RENEW_INTERVAL = int(os.environ.get("CLOUDANT_RENEW_INTERVAL", "1200"))
+CLOUDANT_HEALTH_CHECK_INTERVAL = int(os.environ.get("CLOUDANT_HEALTH_CHECK_INTERVAL", "30"))
+CLOUDANT_CHECKOUT_TIMEOUT = float(os.environ.get("CLOUDANT_CHECKOUT_TIMEOUT", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
 
 def get_database_client():
     """Get a Cloudant client instance."""
@@ -28,7 +81,8 @@ def get_database_client():
             None,
             CLOUDANT_KEY,
             url=CLOUDANT_URL,
-            connect=True
+            connect=True,
+            auto_renew=True
         )
         return client
     except ImportError:
@@ -39,95 +93,429 @@ def get_database_client():
         return None
 
 
+class ClientPool:
+    """Thread-safe pool of long-lived Cloudant clients.
+
+    Clients are created on demand up to ``max_size`` and reused for the
+    life of the process. A background thread renews every client's IAM
+    session each ``renew_interval`` seconds, and a client that has not been
+    checked for ``health_check_interval`` seconds is pinged on checkout and
+    replaced if the ping fails.
+    """
+
+    def __init__(self, factory, max_size=4, renew_interval=1200,
+                 health_check_interval=30, checkout_timeout=10):
+        self.factory = factory
+        self.max_size = max_size
+        self.renew_interval = renew_interval
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        # Idle clients, most recently checked in last
+        self._idle = []
+        self._clients = {}
+        # Slots reserved by checkouts that are still creating their client
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Notified whenever a client is checked in or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def _create(self):
+        """Create a client in a slot already reserved by the caller."""
+        client = None
+        try:
+            client = self.factory()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if client is not None:
+                    self._clients[id(client)] = [client, time.monotonic()]
+                else:
+                    self._available.notify()
+        if client is None:
+            return None
+        self._start_renewer()
+        return client
+
+    def _discard(self, client):
+        with self._lock:
+            self._clients.pop(id(client), None)
+            self._available.notify()
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+
+    def _is_healthy(self, client):
+        with self._lock:
+            entry = self._clients.get(id(client))
+        if entry is None:
+            return False
+        if time.monotonic() - entry[1] < self.health_check_interval:
+            return True
+        try:
+            client.session()
+        except Exception as e:
+            logger.warning(f"Cloudant client failed health check: {e}")
+            return False
+        entry[1] = time.monotonic()
+        return True
+
+    def checkout(self):
+        """Return a healthy client, or None if none can be created."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._available:
+                while not self._idle and len(self._clients) + self._pending >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.error("Timed out waiting for a Cloudant client")
+                        return None
+                    self._available.wait(remaining)
+                client = self._idle.pop() if self._idle else None
+                if client is None:
+                    self._pending += 1
+            if client is None:
+                return self._create()
+            if self._is_healthy(client):
+                return client
+            self._discard(client)
+
+    def checkin(self, client):
+        with self._lock:
+            if id(client) in self._clients and not self._stop.is_set():
+                self._idle.append(client)
+                self._available.notify()
+
+    @contextmanager
+    def client(self):
+        client = self.checkout()
+        try:
+            yield client
+        finally:
+            if client is not None:
+                self.checkin(client)
+
+    def renew(self):
+        """Renew the IAM session of every pooled client."""
+        with self._lock:
+            entries = list(self._clients.values())
+        for entry in entries:
+            try:
+                entry[0].session_login()
+                entry[1] = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Cloudant session renewal failed: {e}")
+                entry[1] = 0.0
+
+    def _start_renewer(self):
+        with self._lock:
+            if self._renewer is not None or self.renew_interval <= 0:
+                return
+            self._renewer = threading.Thread(
+                target=self._renew_loop, name="cloudant-renew", daemon=True
+            )
+        self._renewer.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.renew_interval):
+            self.renew()
+
+    def size(self):
+        with self._lock:
+            return len(self._clients)
+
+    def close(self):
+        """Stop renewing sessions and disconnect every client."""
+        self._stop.set()
+        with self._lock:
+            clients = [entry[0] for entry in self._clients.values()]
+            self._clients.clear()
+            self._idle.clear()
+            self._available.notify_all()
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+
+def get_client_pool():
+    """Return the process-wide Cloudant client pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ClientPool(
+                    get_database_client,
+                    max_size=CLOUDANT_POOL_SIZE,
+                    renew_interval=CLOUDANT_RENEW_INTERVAL,
+                    health_check_interval=CLOUDANT_HEALTH_CHECK_INTERVAL,
+                    checkout_timeout=CLOUDANT_CHECKOUT_TIMEOUT,
+                )
+    return _pool
+
+
+def database_client():
+    """Context manager yielding a pooled client, or None without credentials."""
+    return get_client_pool().client()
+
+
+@_timed
 def get_all_dealers():
     """Retrieve all dealers from Cloudant."""
-    client = get_database_client()
-    if not client:
-        return _mock_dealers()
-    
+    with database_client() as client:
+        if not client:
+            return _mock_dealers()
+
+        try:
+            db = client[DEALERS_DB]
+            dealers = [doc for doc in db]
+            return dealers
+        except Exception as e:
+            logger.error(f"Error fetching dealers: {e}")
+            return _mock_dealers()
+
+
+def _casings(value):
+    """Spellings a state name or code is likely stored under."""
+    value = str(value)
+    return list(dict.fromkeys([value, value.title(), value.upper(), value.lower()]))
+
+
+def _id_values(dealer_id):
+    """Match dealer ids stored either as numbers or as strings."""
+    values = [str(dealer_id)]
     try:
-        db = client[DEALERS_DB]
-        dealers = [doc for doc in db]
-        client.disconnect()
-        return dealers
-    except Exception as e:
-        logger.error(f"Error fetching dealers: {e}")
-        return _mock_dealers()
+        values.insert(0, int(dealer_id))
+    except (TypeError, ValueError):
+        pass
+    return values
 
 
+@_timed
 def get_dealers_by_state(state):
-    """Retrieve dealers filtered by state."""
-    all_dealers = get_all_dealers()
-    return [d for d in all_dealers if d.get("state", "").lower() == state.lower()]
+    """Retrieve dealers whose state name or code matches ``state``.
+
+    Runs one indexed query per field and merges the results, since Mango
+    cannot serve a top-level ``$or`` from an index.
+    """
+    with database_client() as client:
+        if not client:
+            return _mock_dealers(state)
+
+        try:
+            db = client[DEALERS_DB]
+            dealers = {}
+            for field in ("state", "st"):
+                results = db.get_query_result(
+                    {field: {"$in": _casings(state)}},
+                    fields=DEALER_FIELDS,
+                    use_index=f"dealer-{field}",
+                )
+                for doc in results:
+                    dealers.setdefault(str(doc.get("id")), doc)
+            return list(dealers.values())
+        except Exception as e:
+            logger.error(f"Error fetching dealers by state: {e}")
+            return _mock_dealers(state)
 
 
+@_timed
 def get_dealer_by_id(dealer_id):
     """Retrieve a single dealer by ID."""
-    all_dealers = get_all_dealers()
-    for dealer in all_dealers:
-        if str(dealer.get("id", "")) == str(dealer_id):
-            return dealer
-    return None
+    with database_client() as client:
+        if not client:
+            return get_local_store().get_dealer(dealer_id)
+
+        try:
+            db = client[DEALERS_DB]
+            result = db.get_query_result(
+                {"id": {"$in": _id_values(dealer_id)}},
+                fields=DEALER_FIELDS,
+                use_index="dealer-id",
+                limit=1,
+                raw_result=True,
+            )
+            docs = result.get("docs", [])
+            return docs[0] if docs else None
+        except Exception as e:
+            logger.error(f"Error fetching dealer: {e}")
+            return None
+
+
+@_timed
+def ensure_indexes():
+    """Create any missing Mango indexes. Safe to run repeatedly.
+
+    Returns the names of the indexes that were created.
+    """
+    created = []
+    with database_client() as client:
+        if not client:
+            logger.warning("Cloudant not configured, no indexes created")
+            return created
+
+        for db_name, indexes in QUERY_INDEXES.items():
+            db = client[db_name]
+            existing = {
+                index.get("name")
+                for index in db.get_query_indexes(raw_result=True).get("indexes", [])
+            }
+            for name, fields in indexes:
+                if name in existing:
+                    continue
+                db.create_query_index(design_document_id=name, index_name=name, fields=fields)
+                created.append(name)
+    return created
 
 
+@_timed
 def get_reviews_for_dealer(dealer_id):
     """Retrieve all reviews for a specific dealer."""
-    client = get_database_client()
-    if not client:
-        return _mock_reviews(dealer_id)
-    
-    try:
-        db = client[REVIEWS_DB]
-        selector = {"selector": {"dealership": {"$eq": int(dealer_id)}}}
-        results = db.get_query_result(selector["selector"])
-        reviews = list(results)
-        client.disconnect()
-        return reviews
-    except Exception as e:
-        logger.error(f"Error fetching reviews: {e}")
-        return _mock_reviews(dealer_id)
+    with database_client() as client:
+        if not client:
+            return _mock_reviews(dealer_id)
+
+        try:
+            db = client[REVIEWS_DB]
+            selector = {"selector": {"dealership": {"$eq": int(dealer_id)}}}
+            results = db.get_query_result(selector["selector"], use_index="review-dealership")
+            reviews = list(results)
+            return reviews
+        except Exception as e:
+            logger.error(f"Error fetching reviews: {e}")
+            return _mock_reviews(dealer_id)
+
+
+@_timed
+def get_reviews_page(dealer_id, limit=50, bookmark=None):
+    """Retrieve one page of a dealer's reviews.
+
+    Returns ``{"docs": [...], "bookmark": ...}``; pass the bookmark back to
+    fetch the next page. ``bookmark`` is None once the last page is reached.
+    """
+    with database_client() as client:
+        if not client:
+            docs, next_bookmark = get_local_store().reviews_for_dealer(dealer_id, limit, bookmark)
+            return {"docs": docs, "bookmark": next_bookmark}
+
+        try:
+            db = client[REVIEWS_DB]
+            kwargs = {"limit": limit, "use_index": "review-dealership", "raw_result": True}
+            if bookmark:
+                kwargs["bookmark"] = bookmark
+            result = db.get_query_result({"dealership": {"$eq": int(dealer_id)}}, **kwargs)
+            docs = result.get("docs", [])
+            next_bookmark = result.get("bookmark") if len(docs) >= limit else None
+            return {"docs": docs, "bookmark": next_bookmark}
+        except Exception as e:
+            logger.error(f"Error fetching reviews page: {e}")
+            return {"docs": [], "bookmark": None}
+
 
+def iter_reviews_for_dealer(dealer_id, page_size=100):
+    """Yield a dealer's reviews one page at a time."""
+    bookmark = None
+    while True:
+        page = get_reviews_page(dealer_id, limit=page_size, bookmark=bookmark)
+        yield from page["docs"]
+        bookmark = page["bookmark"]
+        if not bookmark:
+            return
 
+
+@_timed
 def save_review(review_data):
     """Save a new review to Cloudant."""
-    client = get_database_client()
-    if not client:
-        logger.info(f"Mock: Would save review: {review_data}")
-        return {"ok": True, "id": "mock_id", "rev": "1-mock"}
-    
-    try:
-        db = client[REVIEWS_DB]
-        response = db.create_document(review_data)
-        client.disconnect()
-        return response
-    except Exception as e:
-        logger.error(f"Error saving review: {e}")
-        return None
+    with database_client() as client:
+        if not client:
+            logger.info(f"Mock: Would save review: {review_data}")
+            return {"ok": True, "id": "mock_id", "rev": "1-mock"}
+
+        try:
+            db = client[REVIEWS_DB]
+            response = db.create_document(review_data)
+            return response
+        except Exception as e:
+            logger.error(f"Error saving review: {e}")
+            return None
+
+
+def is_configured():
+    """Return True when Cloudant credentials are set."""
+    return bool(CLOUDANT_URL and CLOUDANT_KEY)
+
+
+@_timed
+def save_reviews(review_docs):
+    """Save several reviews in one ``_bulk_docs`` request.
+
+    Returns the per-document results, where an ``error`` of ``conflict``
+    means a document with that ``_id`` already exists.
+    """
+    if not review_docs:
+        return []
+    with database_client() as client:
+        if not client:
+            logger.info(f"Mock: Would save {len(review_docs)} review(s)")
+            return [{"ok": True, "id": doc.get("_id"), "rev": "1-mock"} for doc in review_docs]
+
+        try:
+            db = client[REVIEWS_DB]
+            response = db.bulk_docs(review_docs)
+            return response
+        except Exception as e:
+            logger.error(f"Error saving reviews: {e}")
+            return None
+
+
+@_timed
+def get_all_reviews(mock_fallback=True):
+    """Retrieve every review document from Cloudant.
+
+    Without a client or on a query error the development reviews are
+    returned, or None when ``mock_fallback`` is False.
+    """
+    with database_client() as client:
+        if not client:
+            return _mock_reviews() if mock_fallback else None
+
+        try:
+            db = client[REVIEWS_DB]
+            reviews = [dict(doc) for doc in db]
+            return reviews
+        except Exception as e:
+            logger.error(f"Error fetching reviews: {e}")
+            return _mock_reviews() if mock_fallback else None
+
+
+@_timed
+def update_reviews(review_docs):
+    """Write back modified review documents in a single bulk request."""
+    if not review_docs:
+        return []
+    with database_client() as client:
+        if not client:
+            logger.info(f"Mock: Would update {len(review_docs)} review(s)")
+            return [{"ok": True, "id": doc.get("_id", doc.get("id"))} for doc in review_docs]
+
+        try:
+            db = client[REVIEWS_DB]
+            response = db.bulk_docs(review_docs)
+            return response
+        except Exception as e:
+            logger.error(f"Error updating reviews: {e}")
+            return None
 
 
-def _mock_dealers():
-    """Return mock dealer data for development."""
-    return [
-        {"id": 1, "full_name": "Sunshine Toyota", "short_name": "Sunshine", "city": "Wichita", "state": "Kansas", "st": "KS", "address": "123 Main St", "zip": "67201", "lat": 37.69, "long": -97.34},
-        {"id": 2, "full_name": "Prairie Ford", "short_name": "Prairie", "city": "Topeka", "state": "Kansas", "st": "KS", "address": "456 Elm Ave", "zip": "66601", "lat": 39.05, "long": -95.68},
-        {"id": 3, "full_name": "Lakeside Honda", "short_name": "Lakeside", "city": "Austin", "state": "Texas", "st": "TX", "address": "789 Oak Blvd", "zip": "73301", "lat": 30.27, "long": -97.74},
-        {"id": 4, "full_name": "Metro Chevrolet", "short_name": "Metro", "city": "Houston", "state": "Texas", "st": "TX", "address": "321 Pine Rd", "zip": "77001", "lat": 29.76, "long": -95.37},
-        {"id": 5, "full_name": "Coastal BMW", "short_name": "Coastal", "city": "Los Angeles", "state": "California", "st": "CA", "address": "654 Sunset Blvd", "zip": "90001", "lat": 34.05, "long": -118.24},
-        {"id": 6, "full_name": "Empire Mercedes", "short_name": "Empire", "city": "New York", "state": "New York", "st": "NY", "address": "987 Fifth Ave", "zip": "10001", "lat": 40.71, "long": -74.01},
-        {"id": 7, "full_name": "Bluegrass Hyundai", "short_name": "Bluegrass", "city": "Overland Park", "state": "Kansas", "st": "KS", "address": "147 West St", "zip": "66204", "lat": 38.98, "long": -94.67},
-        {"id": 8, "full_name": "Gateway VW", "short_name": "Gateway", "city": "Chicago", "state": "Illinois", "st": "IL", "address": "258 Michigan Ave", "zip": "60601", "lat": 41.88, "long": -87.63},
-    ]
+def _mock_dealers(state=None):
+    """Return development dealer data from the local store."""
+    return get_local_store().list_dealers(state)
 
 
 def _mock_reviews(dealer_id=None):
-    """Return mock review data for development."""
-    reviews = [
-        {"id": "r1", "dealership": 1, "name": "John Smith", "purchase": True, "review": "Fantastic services and very friendly staff!", "purchase_date": "2023-10-15", "car_make": "Toyota", "car_model": "Camry", "car_year": 2023, "sentiment": "positive"},
-        {"id": "r2", "dealership": 1, "name": "Jane Doe", "purchase": False, "review": "Great experience overall. Would definitely recommend!", "purchase_date": "", "car_make": "Toyota", "car_model": "RAV4", "car_year": 2022, "sentiment": "positive"},
-        {"id": "r3", "dealership": 2, "name": "Bob Johnson", "purchase": True, "review": "Excellent service and fair pricing. Very happy!", "purchase_date": "2023-09-20", "car_make": "Ford", "car_model": "F-150", "car_year": 2023, "sentiment": "positive"},
-        {"id": "r4", "dealership": 3, "name": "Alice Williams", "purchase": True, "review": "Amazing dealership! Very helpful and honest team.", "purchase_date": "2023-11-01", "car_make": "Honda", "car_model": "Civic", "car_year": 2023, "sentiment": "positive"},
-        {"id": "r5", "dealership": 4, "name": "Charlie Brown", "purchase": False, "review": "Terrible experience. Rude staff and overpriced vehicles.", "purchase_date": "", "car_make": "Chevrolet", "car_model": "Silverado", "car_year": 2022, "sentiment": "negative"},
-    ]
-    if dealer_id:
-        return [r for r in reviews if str(r["dealership"]) == str(dealer_id)]
+    """Return development review data from the local store."""
+    reviews, _ = get_local_store().reviews_for_dealer(dealer_id)
     return reviews
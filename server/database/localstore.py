@@ -0,0 +1,338 @@
+"""
+Embedded SQLite stand-in for the Cloud Functions / Cloudant backend.
+Serves the same dealer and review endpoints from indexed tables, so it can
+be used as an offline target (BACKEND_MODE=local) or as the fallback when
+upstream calls fail. Tables can be bulk-loaded with large datasets.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from urllib.parse import parse_qsl
+
+LOCAL_STORE_PATH = os.environ.get("LOCAL_STORE_PATH", ":memory:")
+LOCAL_STORE_MMAP_SIZE = int(os.environ.get("LOCAL_STORE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+DEALER_COLUMNS = ["id", "full_name", "short_name", "address", "city", "state", "st", "zip", "lat", "long"]
+REVIEW_COLUMNS = [
+    "id", "dealership", "name", "purchase", "review", "purchase_date",
+    "car_make", "car_model", "car_year", "sentiment", "sentiment_version",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dealers (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT, short_name TEXT, address TEXT, city TEXT,
+    state TEXT, st TEXT, zip TEXT, lat REAL, long REAL
+);
+CREATE INDEX IF NOT EXISTS dealers_state ON dealers (state COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS dealers_st ON dealers (st COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS reviews (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    dealership INTEGER,
+    name TEXT, purchase INTEGER, review TEXT, purchase_date TEXT,
+    car_make TEXT, car_model TEXT, car_year INTEGER,
+    sentiment TEXT, sentiment_version TEXT
+);
+CREATE INDEX IF NOT EXISTS reviews_dealership ON reviews (dealership, seq);
+"""
+
+SEED_DEALERS = [
+    {"id": 1, "full_name": "Sunshine Toyota", "short_name": "Sunshine", "city": "Wichita", "state": "Kansas", "st": "KS", "address": "123 Main St", "zip": "67201", "lat": 37.69, "long": -97.34},
+    {"id": 2, "full_name": "Prairie Ford", "short_name": "Prairie", "city": "Topeka", "state": "Kansas", "st": "KS", "address": "456 Elm Ave", "zip": "66601", "lat": 39.05, "long": -95.68},
+    {"id": 3, "full_name": "Lakeside Honda", "short_name": "Lakeside", "city": "Austin", "state": "Texas", "st": "TX", "address": "789 Oak Blvd", "zip": "73301", "lat": 30.27, "long": -97.74},
+    {"id": 4, "full_name": "Metro Chevrolet", "short_name": "Metro", "city": "Houston", "state": "Texas", "st": "TX", "address": "321 Pine Rd", "zip": "77001", "lat": 29.76, "long": -95.37},
+    {"id": 5, "full_name": "Coastal BMW", "short_name": "Coastal", "city": "Los Angeles", "state": "California", "st": "CA", "address": "654 Sunset Blvd", "zip": "90001", "lat": 34.05, "long": -118.24},
+    {"id": 6, "full_name": "Empire Mercedes", "short_name": "Empire", "city": "New York", "state": "New York", "st": "NY", "address": "987 Fifth Ave", "zip": "10001", "lat": 40.71, "long": -74.01},
+    {"id": 7, "full_name": "Bluegrass Hyundai", "short_name": "Bluegrass", "city": "Overland Park", "state": "Kansas", "st": "KS", "address": "147 West St", "zip": "66204", "lat": 38.98, "long": -94.67},
+    {"id": 8, "full_name": "Gateway VW", "short_name": "Gateway", "city": "Chicago", "state": "Illinois", "st": "IL", "address": "258 Michigan Ave", "zip": "60601", "lat": 41.88, "long": -87.63},
+]
+
+SEED_REVIEWS = [
+    {"id": "r1", "dealership": 1, "name": "John Smith", "purchase": True, "review": "Fantastic services and very friendly staff!", "purchase_date": "2023-10-15", "car_make": "Toyota", "car_model": "Camry", "car_year": 2023, "sentiment": "positive"},
+    {"id": "r2", "dealership": 1, "name": "Jane Doe", "purchase": False, "review": "Great experience overall. Would definitely recommend!", "purchase_date": "", "car_make": "Toyota", "car_model": "RAV4", "car_year": 2022, "sentiment": "positive"},
+    {"id": "r3", "dealership": 2, "name": "Bob Johnson", "purchase": True, "review": "Excellent service and fair pricing. Very happy!", "purchase_date": "2023-09-20", "car_make": "Ford", "car_model": "F-150", "car_year": 2023, "sentiment": "positive"},
+    {"id": "r4", "dealership": 3, "name": "Alice Williams", "purchase": True, "review": "Amazing dealership! Very helpful and honest team.", "purchase_date": "2023-11-01", "car_make": "Honda", "car_model": "Civic", "car_year": 2023, "sentiment": "positive"},
+    {"id": "r5", "dealership": 4, "name": "Charlie Brown", "purchase": False, "review": "Terrible experience. Rude staff and overpriced vehicles.", "purchase_date": "", "car_make": "Chevrolet", "car_model": "Silverado", "car_year": 2022, "sentiment": "negative"},
+]
+
+
+def _parse_endpoint(endpoint, **kwargs):
+    """Split ``/api/x?a=1&b`` into its path and a dict of query parameters."""
+    path, _, query = endpoint.partition("?")
+    params = dict(parse_qsl(query, keep_blank_values=True))
+    params.update({key: str(value) for key, value in kwargs.items()})
+    return path.rstrip("/"), params
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LocalStore:
+    def __init__(self, path=":memory:", mmap_size=0):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            if mmap_size:
+                self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn.executescript(SCHEMA)
+
+    # Loading
+
+    def load_dealers(self, dealers, chunk_size=10000):
+        """Insert or replace dealers from any iterable. Returns the count."""
+        sql = (f"INSERT OR REPLACE INTO dealers ({', '.join(DEALER_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(DEALER_COLUMNS))})")
+        return self._load(sql, DEALER_COLUMNS, dealers, chunk_size)
+
+    def load_reviews(self, reviews, chunk_size=10000):
+        """Insert reviews from any iterable, skipping known ids. Returns the count."""
+        sql = (f"INSERT OR IGNORE INTO reviews ({', '.join(REVIEW_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(REVIEW_COLUMNS))})")
+        return self._load(sql, REVIEW_COLUMNS, reviews, chunk_size)
+
+    def _load(self, sql, columns, docs, chunk_size):
+        total = 0
+        chunk = []
+        for doc in docs:
+            doc = dict(doc)
+            if "id" not in doc and "_id" in doc:
+                doc["id"] = doc["_id"]
+            chunk.append(tuple(doc.get(column) for column in columns))
+            if len(chunk) >= chunk_size:
+                total += self._insert(sql, chunk)
+                chunk = []
+        if chunk:
+            total += self._insert(sql, chunk)
+        return total
+
+    def _insert(self, sql, rows):
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+        return len(rows)
+
+    def seed(self):
+        """Load the demo dealers and reviews if the store is empty."""
+        if not self.count("dealers"):
+            self.load_dealers(SEED_DEALERS)
+        if not self.count("reviews"):
+            self.load_reviews(SEED_REVIEWS)
+
+    def count(self, table):
+        if table not in ("dealers", "reviews"):
+            raise ValueError(f"Unknown table {table}")
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def copy_to(self, target):
+        """Copy every dealer and review into ``target``, another LocalStore."""
+        with self._lock, target._lock:
+            self._conn.backup(target._conn)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM dealers")
+            self._conn.execute("DELETE FROM reviews")
+
+    # Queries
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def list_dealers(self, state=None):
+        columns = ", ".join(DEALER_COLUMNS)
+        if state:
+            return self._query(
+                f"SELECT {columns} FROM dealers WHERE state = ? COLLATE NOCASE "
+                f"UNION SELECT {columns} FROM dealers WHERE st = ? COLLATE NOCASE ORDER BY id",
+                (state, state),
+            )
+        return self._query(f"SELECT {columns} FROM dealers ORDER BY id")
+
+    def get_dealer(self, dealer_id):
+        rows = self._query(
+            f"SELECT {', '.join(DEALER_COLUMNS)} FROM dealers WHERE id = ?", (_int_or_none(dealer_id),)
+        )
+        return rows[0] if rows else None
+
+    def _review_rows(self, rows):
+        for row in rows:
+            row.pop("seq", None)
+            row["purchase"] = bool(row["purchase"])
+            if row["sentiment_version"] is None:
+                row.pop("sentiment_version")
+        return rows
+
+    def reviews_for_dealer(self, dealer_id=None, limit=None, bookmark=None):
+        """Return ``(reviews, next_bookmark)`` in insertion order.
+
+        ``bookmark`` is the opaque value from the previous page; paging uses
+        the (dealership, seq) index so every page costs the same. A
+        ``dealer_id`` that is not an integer matches no reviews.
+        """
+        columns = "seq, " + ", ".join(REVIEW_COLUMNS)
+        where, params = [], []
+        dealer = _int_or_none(dealer_id)
+        if dealer is None and dealer_id not in (None, ""):
+            return [], None
+        if dealer is not None:
+            where.append("dealership = ?")
+            params.append(dealer)
+        after = _int_or_none(bookmark)
+        if after is not None:
+            where.append("seq > ?")
+            params.append(after)
+        sql = f"SELECT {columns} FROM reviews"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        rows = self._query(sql, params)
+        next_bookmark = str(rows[-1]["seq"]) if limit and len(rows) >= int(limit) else None
+        return self._review_rows(rows), next_bookmark
+
+    def save_reviews(self, docs):
+        """Save reviews, reporting ``conflict`` for ids that already exist."""
+        results = []
+        with self._lock, self._conn:
+            for doc in docs:
+                doc_id = str(doc.get("_id") or doc.get("id") or "")
+                if not doc_id:
+                    doc_id = f"local-{uuid.uuid4().hex}"
+                values = dict(doc, id=doc_id)
+                cursor = self._conn.execute(
+                    f"INSERT OR IGNORE INTO reviews ({', '.join(REVIEW_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(REVIEW_COLUMNS))})",
+                    tuple(values.get(column) for column in REVIEW_COLUMNS),
+                )
+                if cursor.rowcount:
+                    results.append({"ok": True, "id": doc_id, "rev": "1-local"})
+                else:
+                    results.append({"id": doc_id, "error": "conflict", "reason": "Document update conflict."})
+        return results
+
+    # Cloud Functions emulation
+
+    def get(self, endpoint, **kwargs):
+        """Answer a Cloud Functions GET the way the upstream action would."""
+        path, params = _parse_endpoint(endpoint, **kwargs)
+        if path.endswith("/review"):
+            limit = _int_or_none(params.get("limit"))
+            reviews, bookmark = self.reviews_for_dealer(params.get("id"), limit, params.get("bookmark"))
+            if limit:
+                return {"data": {"docs": reviews, "bookmark": bookmark}}
+            return reviews
+        if path.endswith("/dealership"):
+            if params.get("id"):
+                dealer = self.get_dealer(params["id"])
+                return [dealer] if dealer else []
+            return self.list_dealers(params.get("state"))
+        return []
+
+    def post(self, endpoint, payload):
+        """Answer a Cloud Functions POST the way the upstream action would."""
+        path, _ = _parse_endpoint(endpoint)
+        if path.endswith("/review"):
+            result = self.save_reviews([payload])[0]
+            if result.get("ok"):
+                return {"status": 200, "message": "Review submitted", "id": result["id"]}
+            return {"status": 409, "message": "Review already exists", "id": result["id"]}
+        return {"status": 404, "message": f"Unknown endpoint {path}"}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_local_store():
+    """Return the process-wide local store, seeded with demo data if empty."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = LocalStore(LOCAL_STORE_PATH, mmap_size=LOCAL_STORE_MMAP_SIZE)
+                store.seed()
+                _store = store
+    return _store
+
+
+def _iter_json_array(fh, read_size=1 << 16):
+    """Yield the items of the JSON array in ``fh``, reading it ``read_size`` characters at a time."""
+    decode = json.JSONDecoder().raw_decode
+    buf, pos = "", 0
+
+    def more():
+        nonlocal buf, pos
+        chunk = fh.read(read_size)
+        if not chunk:
+            return False
+        buf, pos = buf[pos:] + chunk, 0
+        return True
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or not more():
+                return
+
+    skip_space()
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    skip_space()
+    if buf[pos:pos + 1] == "]":
+        return
+    while True:
+        try:
+            item, end = decode(buf, pos)
+        except json.JSONDecodeError:
+            if more():
+                continue
+            raise
+        # A number cut at the buffer edge ("1.", "2e") decodes short; read on and retry
+        if (end == len(buf) or buf[end] not in " \t\n\r,]") and more():
+            continue
+        pos = end
+        yield item
+        skip_space()
+        separator = buf[pos:pos + 1]
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}")
+        skip_space()
+
+
+def iter_json_records(path):
+    """Yield records from a JSON array file or an NDJSON file.
+
+    Both formats are streamed, so files larger than memory can be loaded.
+    """
+    with open(path, encoding="utf-8") as fh:
+        first = fh.read(1)
+        while first and first.isspace():
+            first = fh.read(1)
+        fh.seek(0)
+        if first == "[":
+            yield from _iter_json_array(fh)
+            return
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -1,6 +1,28 @@
+import functools
+import threading
 from django.apps import AppConfig
 
 
 class DjangoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'djangoapp'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_delete, post_migrate, post_save
+        from database import cloudantdb
+        from . import instrumentation, restapis
+        from .car_catalog import car_catalog
+        from .catalog_seed import seed_on_migrate
+        from .models import CarMake, CarModel
+
+        for model in (CarMake, CarModel):
+            post_save.connect(car_catalog.invalidate, sender=model, dispatch_uid=f"car_catalog_save_{model.__name__}")
+            post_delete.connect(car_catalog.invalidate, sender=model, dispatch_uid=f"car_catalog_delete_{model.__name__}")
+        cloudantdb.set_timer(functools.partial(instrumentation.timed, "db"))
+        instrumentation.register_collector(restapis.render_pool_metrics)
+        if settings.SEED_CARS_ON_MIGRATE:
+            post_migrate.connect(seed_on_migrate, sender=self, dispatch_uid="seed_cars_on_migrate")
+
+        if restapis.ibm_nlu_warmup:
+            threading.Thread(target=restapis.warm_up_nlu, name="nlu-warmup", daemon=True).start()
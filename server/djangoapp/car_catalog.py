@@ -0,0 +1,103 @@
+"""
+Precomputed car catalog.
+The /djangoapp/get_cars response body is serialised once and served from
+memory together with its ETag and Last-Modified stamp. Saving or deleting
+a CarMake or CarModel invalidates it through model signals; the TTL is a
+safety net for edits made by other worker processes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+
+from .models import CarModel
+
+CAR_TYPE_LABELS = dict(CarModel.CAR_TYPES)
+
+# Response field name -> model lookup
+CATALOG_FIELDS = {
+    "CarModel": "name",
+    "CarMake": "car_make__name",
+    "CarType": "car_type",
+    "ModelYear": "year",
+    "DealerId": "dealer_id",
+}
+
+
+class CatalogEntry:
+    def __init__(self, body, built_at):
+        self.body = body
+        self.built_at = built_at
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class CarCatalog:
+    def __init__(self, builder, ttl=300):
+        self.builder = builder
+        self.ttl = ttl
+        self._entry = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current CatalogEntry, building it on first use."""
+        entry = self._entry
+        if entry is not None and (not self.ttl or time.time() - entry.built_at < self.ttl):
+            return entry
+        with self._lock:
+            entry = self._entry
+            if entry is not None and (not self.ttl or time.time() - entry.built_at < self.ttl):
+                return entry
+            generation = self._generation
+            entry = CatalogEntry(json.dumps(self.builder()).encode("utf-8"), time.time())
+            # A write during the build leaves the entry uncached so the next call sees it
+            if generation == self._generation:
+                self._entry = entry
+            return entry
+
+    def invalidate(self, **kwargs):
+        """Drop the cached body. Accepts signal arguments so it can be a receiver."""
+        self._generation += 1
+        self._entry = None
+
+    def is_warm(self):
+        return self._entry is not None
+
+
+def _rows_to_cars(rows, fields):
+    cars = []
+    for row in rows:
+        car = dict(zip(fields, row))
+        if "CarType" in car:
+            car["CarType"] = CAR_TYPE_LABELS.get(car["CarType"], car["CarType"])
+        cars.append(car)
+    return cars
+
+
+def build_catalog():
+    """Return the get_cars payload in a single query."""
+    fields = list(CATALOG_FIELDS)
+    rows = CarModel.objects.values_list(*CATALOG_FIELDS.values())
+    return {"CarModels": _rows_to_cars(rows, fields)}
+
+
+def query_catalog(filters, fields=None, limit=100, after=None):
+    """Return one keyset page of the catalog as ``(cars, next_cursor)``.
+
+    ``filters`` are model lookups such as ``{"year__gte": 2020}``. Rows are
+    ordered by id and ``after`` is the last id of the previous page, so
+    each page is an index range scan rather than an offset.
+    """
+    fields = list(fields or CATALOG_FIELDS)
+    queryset = CarModel.objects.filter(**filters).order_by("id")
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    rows = list(queryset.values_list("id", *[CATALOG_FIELDS[f] for f in fields])[:limit + 1])
+    next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+    return _rows_to_cars((row[1:] for row in rows[:limit]), fields), next_cursor
+
+
+car_catalog = CarCatalog(build_catalog, ttl=settings.CAR_CATALOG_TTL)
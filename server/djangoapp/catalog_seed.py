@@ -0,0 +1,142 @@
+"""
+Bulk, idempotent car catalog import.
+Records are flat make/model rows read from the built-in seed data or from
+CSV, JSON array or NDJSON files, and inserted in chunks with bulk_create
+inside a single transaction. Conflicts on the unique make name and
+(make, model name) pair are ignored, so an import can be re-run or raced
+without creating duplicates.
+"""
+
+import csv
+from itertools import islice
+
+from django.db import transaction
+
+from database.localstore import iter_json_records
+from .car_catalog import CAR_TYPE_LABELS, car_catalog
+from .models import CarMake, CarModel
+
+SEED_MAKES = {
+    "Toyota": {"description": "Japanese automobile manufacturer", "country_of_origin": "Japan", "founded_year": 1937},
+    "Ford": {"description": "American automobile manufacturer", "country_of_origin": "USA", "founded_year": 1903},
+    "Honda": {"description": "Japanese automobile manufacturer", "country_of_origin": "Japan", "founded_year": 1948},
+    "Chevrolet": {"description": "American automobile manufacturer", "country_of_origin": "USA", "founded_year": 1911},
+    "BMW": {"description": "German luxury automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1916},
+    "Mercedes-Benz": {"description": "German luxury automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1926},
+    "Hyundai": {"description": "South Korean automobile manufacturer", "country_of_origin": "South Korea", "founded_year": 1967},
+    "Volkswagen": {"description": "German automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1937},
+}
+
+SEED_MODELS = [
+    ("Toyota", "Camry", "SEDAN", 2023),
+    ("Toyota", "RAV4", "SUV", 2022),
+    ("Toyota", "Corolla", "SEDAN", 2021),
+    ("Ford", "F-150", "TRUCK", 2023),
+    ("Ford", "Explorer", "SUV", 2022),
+    ("Ford", "Mustang", "COUPE", 2023),
+    ("Honda", "Civic", "SEDAN", 2023),
+    ("Honda", "CR-V", "SUV", 2022),
+    ("Honda", "Accord", "SEDAN", 2021),
+    ("Chevrolet", "Silverado", "TRUCK", 2023),
+    ("Chevrolet", "Equinox", "SUV", 2022),
+    ("BMW", "3 Series", "SEDAN", 2023),
+    ("BMW", "X5", "SUV", 2022),
+    ("Mercedes-Benz", "C-Class", "SEDAN", 2023),
+    ("Mercedes-Benz", "GLE", "SUV", 2022),
+    ("Hyundai", "Elantra", "SEDAN", 2023),
+    ("Hyundai", "Tucson", "SUV", 2022),
+    ("Volkswagen", "Jetta", "SEDAN", 2023),
+    ("Volkswagen", "Tiguan", "SUV", 2022),
+]
+
+
+def seed_records():
+    """Yield the built-in catalog as import records."""
+    for make, model, car_type, year in SEED_MODELS:
+        yield dict(SEED_MAKES[make], make=make, model=model, car_type=car_type, year=year)
+
+
+def iter_csv_records(path):
+    """Yield rows of a CSV file with a header line as dicts."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        yield from csv.DictReader(fh)
+
+
+def iter_catalog_file(path):
+    """Yield records from a .csv file, or from a JSON array or NDJSON file."""
+    if str(path).lower().endswith(".csv"):
+        return iter_csv_records(path)
+    return iter_json_records(path)
+
+
+def _int_or_none(value):
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def _car_type(value):
+    if not value:
+        return "SEDAN"
+    value = str(value).upper()
+    if value in CAR_TYPE_LABELS:
+        return value
+    for code, label in CAR_TYPE_LABELS.items():
+        if label.upper() == value:
+            return code
+    raise ValueError(f"Unknown car type: {value}")
+
+
+def _import_chunk(rows, using):
+    makes = {}
+    for row in rows:
+        if row["make"] not in makes:
+            makes[row["make"]] = CarMake(
+                name=row["make"],
+                description=row.get("description") or "",
+                country_of_origin=row.get("country_of_origin") or "",
+                founded_year=_int_or_none(row.get("founded_year")),
+            )
+    CarMake.objects.using(using).bulk_create(makes.values(), ignore_conflicts=True)
+    make_ids = dict(CarMake.objects.using(using).filter(name__in=list(makes)).values_list("name", "id"))
+
+    CarModel.objects.using(using).bulk_create([
+        CarModel(
+            car_make_id=make_ids[row["make"]],
+            name=row["model"],
+            car_type=_car_type(row.get("car_type")),
+            year=_int_or_none(row.get("year")) or 2023,
+            dealer_id=_int_or_none(row.get("dealer_id")),
+        )
+        for row in rows if row.get("model")
+    ], ignore_conflicts=True)
+
+
+def import_catalog(records, batch_size=1000, using="default"):
+    """Import make/model ``records`` in chunks of ``batch_size``.
+
+    Each record needs ``make`` and usually ``model``; ``car_type``,
+    ``year``, ``dealer_id``, ``description``, ``country_of_origin`` and
+    ``founded_year`` are optional. Returns ``(makes created, models created)``.
+    """
+    records = iter(records)
+    with transaction.atomic(using=using):
+        makes_before = CarMake.objects.using(using).count()
+        models_before = CarModel.objects.using(using).count()
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                break
+            _import_chunk(chunk, using)
+        created = (
+            CarMake.objects.using(using).count() - makes_before,
+            CarModel.objects.using(using).count() - models_before,
+        )
+    # bulk_create sends no post_save signals
+    car_catalog.invalidate()
+    return created
+
+
+def seed_on_migrate(sender, using="default", **kwargs):
+    """post_migrate receiver that loads the built-in catalog."""
+    import_catalog(seed_records(), using=using)
@@ -0,0 +1,141 @@
+"""
+In-process dealer directory.
+The full dealer list is fetched once, indexed by id, state, state code and
+location, and served from memory. Once an entry is older than its TTL it keeps being
+served while a background thread refreshes it, so requests only wait on
+the very first load.
+"""
+
+import logging
+import threading
+import time
+
+from .geo_index import GeoIndex
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY = "dealer_directory"
+
+
+class DealerDirectory:
+    def __init__(self, loader, parser, ttl=300, shared_alias=""):
+        self.loader = loader
+        self.parser = parser
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._index = None
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+
+    def _shared(self):
+        if not self.shared_alias:
+            return None
+        try:
+            from django.core.cache import caches
+            return caches[self.shared_alias]
+        except Exception as e:
+            logger.error(f"Shared dealer directory unavailable: {e}")
+            return None
+
+    def _fetch(self):
+        """Return ``(docs, fetched_at)`` from the shared cache or the loader."""
+        shared = self._shared()
+        if shared is not None:
+            try:
+                cached = shared.get(SHARED_KEY)
+            except Exception as e:
+                logger.error(f"Shared dealer directory error: {e}")
+                cached = None
+            if cached is not None and time.time() - cached[1] < self.ttl:
+                return cached
+
+        docs = self.loader()
+        if not isinstance(docs, list):
+            raise ValueError("Dealer directory loader did not return a list")
+        fetched_at = time.time()
+        if shared is not None:
+            try:
+                shared.set(SHARED_KEY, (docs, fetched_at), self.ttl)
+            except Exception as e:
+                logger.error(f"Shared dealer directory error: {e}")
+        return docs, fetched_at
+
+    def _build_index(self, docs):
+        dealers = []
+        by_id = {}
+        by_state = {}
+        for doc in docs:
+            dealer = self.parser(doc)
+            if dealer is None:
+                continue
+            dealers.append(dealer)
+            by_id[str(dealer.id)] = dealer
+            for key in {str(dealer.state).lower(), str(dealer.st).lower()}:
+                if key:
+                    by_state.setdefault(key, []).append(dealer)
+        return dealers, by_id, by_state, GeoIndex(dealers)
+
+    def refresh(self):
+        """Reload the directory now. Returns True on success."""
+        try:
+            docs, fetched_at = self._fetch()
+            index = self._build_index(docs)
+        except Exception as e:
+            logger.error(f"Dealer directory refresh failed: {e}")
+            return False
+        self._index = index
+        self._loaded_at = time.monotonic() - (time.time() - fetched_at)
+        return True
+
+    def refresh_in_background(self):
+        """Start a background refresh unless one is already running."""
+        with self._load_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="dealer-directory-refresh", daemon=True).start()
+
+    def is_warm(self):
+        return self._index is not None
+
+    def is_stale(self):
+        return time.monotonic() - self._loaded_at >= self.ttl
+
+    def _current(self):
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self.refresh()
+            if self._index is None:
+                return [], {}, {}, GeoIndex([])
+        elif self.is_stale():
+            self.refresh_in_background()
+        return self._index
+
+    def all(self):
+        """Return every dealer."""
+        return list(self._current()[0])
+
+    def by_state(self, state):
+        """Return dealers whose state name or code matches ``state``."""
+        return list(self._current()[2].get(str(state).lower(), []))
+
+    def get(self, dealer_id):
+        """Return the dealer with ``dealer_id`` or None."""
+        return self._current()[1].get(str(dealer_id))
+
+    def near(self, lat, long, k=None, radius_km=None):
+        """Return ``[(distance_km, dealer)]`` for the dealers nearest a point."""
+        return self._current()[3].nearest(lat, long, k=k, radius_km=radius_km)
+
+    def clear(self):
+        self._index = None
+        self._loaded_at = 0.0
@@ -0,0 +1,148 @@
+"""
+In-memory nearest-neighbour index over dealer coordinates.
+Dealers are bucketed into a fixed grid of ``cell_size`` degree cells and
+their coordinates kept in flat ``array('d')`` buffers, pre-converted to
+radians. A query scans rings of cells outward from the query point and
+stops as soon as no unscanned cell can hold a closer dealer, so only the
+dealers near the point are ever measured.
+"""
+
+import heapq
+import math
+from array import array
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points in degrees."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _coordinates(item):
+    try:
+        lat, lon = float(item.lat), float(item.long)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    # parse_dealer_json defaults missing coordinates to 0, 0
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0) or (lat == 0 and lon == 0):
+        return None
+    return lat, lon
+
+
+class GeoIndex:
+    def __init__(self, items, cell_size=1.0):
+        """Index ``items`` by their ``lat``/``long``; items without valid coordinates are skipped."""
+        self.cell_size = cell_size
+        self._columns = max(int(round(360.0 / cell_size)), 1)
+        self.items = []
+        self._lat = array("d")
+        self._lon = array("d")
+        self._cos_lat = array("d")
+        self._cells = {}
+        for item in items:
+            coords = _coordinates(item)
+            if coords is None:
+                continue
+            index = len(self.items)
+            self.items.append(item)
+            lat, lon = math.radians(coords[0]), math.radians(coords[1])
+            self._lat.append(lat)
+            self._lon.append(lon)
+            self._cos_lat.append(math.cos(lat))
+            row, col = self._cell(*coords)
+            self._cells.setdefault((row, col % self._columns), array("l")).append(index)
+        rows = [row for row, _ in self._cells] or [0]
+        self._min_row, self._max_row = min(rows), max(rows)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cell(self, lat, lon):
+        """Return ``(row, column)``; the column is not wrapped to the grid width."""
+        return int(math.floor(lat / self.cell_size)), int(math.floor((lon + 180.0) / self.cell_size))
+
+    def _distances(self, lat, lon, cos_lat, indices):
+        """Haversine distances from one point (in radians) to the indexed points."""
+        lats, lons, coss = self._lat, self._lon, self._cos_lat
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        scale = 2 * EARTH_RADIUS_KM
+        return [
+            scale * asin(min(1.0, sqrt(
+                sin((lats[i] - lat) / 2) ** 2 + cos_lat * coss[i] * sin((lons[i] - lon) / 2) ** 2
+            )))
+            for i in indices
+        ]
+
+    def _ring(self, row, col, ring):
+        if ring == 0:
+            yield row, col % self._columns
+            return
+        for r in range(row - ring, row + ring + 1):
+            if r < self._min_row or r > self._max_row:
+                continue
+            if r in (row - ring, row + ring):
+                cols = range(col - ring, col + ring + 1)
+            else:
+                cols = (col - ring, col + ring)
+            for c in cols:
+                yield r, c % self._columns
+
+    def _unscanned_bound(self, lat, lon, row, col, ring):
+        """Lower bound in km on the distance to any cell outside ``ring``."""
+        size = self.cell_size
+        if (ring * 2 + 1) * size >= 360.0:
+            lon_gap = math.inf
+        else:
+            west = lon + 180.0 - (col - ring) * size
+            east = (col + ring + 1) * size - (lon + 180.0)
+            # Distance to the nearest meridian ``gap`` away; past 90 degrees
+            # the closest such points are at the pole
+            gap = min(math.radians(min(west, east)), math.pi / 2)
+            lon_gap = EARTH_RADIUS_KM * math.asin(math.cos(math.radians(lat)) * math.sin(gap))
+        south = lat - (row - ring) * size if row - ring > self._min_row else math.inf
+        north = (row + ring + 1) * size - lat if row + ring < self._max_row else math.inf
+        lat_gap = math.radians(min(south, north)) * EARTH_RADIUS_KM
+        return min(lon_gap, lat_gap)
+
+    def nearest(self, lat, lon, k=None, radius_km=None):
+        """Return ``[(distance_km, item)]`` sorted by distance.
+
+        Gives the ``k`` nearest items, every item within ``radius_km``, or
+        the ``k`` nearest within ``radius_km`` when both are set.
+        """
+        if not self.items or (k is not None and k <= 0):
+            return []
+        if k is None and radius_km is None:
+            raise ValueError("k or radius_km is required")
+
+        row, col = self._cell(lat, lon)
+        lat_r, lon_r = math.radians(lat), math.radians(lon)
+        cos_lat = math.cos(lat_r)
+        limit = math.inf if radius_km is None else radius_km
+        # Max-heap of (-distance, index) for the k best so far, or every match without k
+        best = []
+        seen = set()
+        max_ring = max(self._columns, self._max_row - self._min_row + 1)
+        for ring in range(max_ring + 1):
+            for cell in self._ring(row, col, ring):
+                # Rings wider than the grid wrap around and revisit cells
+                if cell in seen:
+                    continue
+                seen.add(cell)
+                indices = self._cells.get(cell)
+                if not indices:
+                    continue
+                for index, distance in zip(indices, self._distances(lat_r, lon_r, cos_lat, indices)):
+                    if distance > limit:
+                        continue
+                    if k is None or len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, index))
+            bound = self._unscanned_bound(lat, lon, row, col, ring)
+            if bound > limit or (k is not None and len(best) >= k and bound >= -best[0][0]):
+                break
+        return [(-neg, self.items[index]) for neg, index in sorted(best, reverse=True)]
@@ -0,0 +1,158 @@
+"""
+Request and upstream-call instrumentation.
+Views are timed by InstrumentationMiddleware, and calls to the upstream
+API, Watson NLU and Cloudant are timed with ``timed``; the database layer
+gets it through ``cloudantdb.set_timer`` so it never imports this app.
+Both feed Prometheus-style histograms served at /metrics, alongside any
+series added with ``register_collector``. Time spent in each
+upstream component is also added up per request and reported in the
+``Server-Timing`` response header.
+"""
+
+import contextvars
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from sentiment_analyzer.metrics import RequestMetrics
+
+logger = logging.getLogger(__name__)
+
+# Fraction of successful upstream calls that are logged; failures always are
+log_sample_rate = float(os.environ.get("UPSTREAM_LOG_SAMPLE_RATE", "0.01"))
+
+view_metrics = RequestMetrics("djangoapp")
+upstream_metrics = RequestMetrics("djangoapp_upstream")
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+# Callables adding gauges and counters kept elsewhere, e.g. connection pools
+_collectors = []
+
+
+def endpoint_label(url):
+    """Reduce an endpoint URL to its path so labels stay low-cardinality."""
+    return urlsplit(url).path or url
+
+
+def record(component, target, duration, ok=True):
+    """Record one timed call against the metrics and the current request."""
+    upstream_metrics.observe(duration, component=component, target=target, status="ok" if ok else "error")
+    timings = _request_timings.get()
+    if timings is not None:
+        total, count = timings.get(component, (0.0, 0))
+        timings[component] = (total + duration, count + 1)
+
+
+@contextmanager
+def timed(component, target):
+    """Time the enclosed block as a call to ``component``."""
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(component, target, time.perf_counter() - start, ok)
+
+
+def log_call(method, url, status, duration):
+    """Log an upstream call as key=value fields, sampling successful calls."""
+    ok = status is not None and status < 400
+    if ok and random.random() >= log_sample_rate:
+        return
+    fields = {"method": method, "url": url, "status": status, "duration_ms": round(duration * 1000, 1)}
+    logger.log(
+        logging.INFO if ok else logging.WARNING,
+        "upstream_call " + " ".join(f"{key}={value}" for key, value in fields.items()),
+        extra={"upstream": fields},
+    )
+
+
+@contextmanager
+def upstream_call(method, url):
+    """Time and log an HTTP call; the block stores the response code in ``call["status"]``."""
+    call = {"status": None}
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        duration = time.perf_counter() - start
+        status = call["status"]
+        record("upstream", endpoint_label(url), duration, status is not None and status < 400)
+        log_call(method, url, status, duration)
+
+
+def server_timing(timings, total):
+    """Format accumulated per-component timings as a Server-Timing value."""
+    parts = [
+        f'{component};dur={seconds * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+        for component, (seconds, count) in sorted(timings.items())
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def register_collector(collect):
+    """Add ``collect()``, which returns Prometheus text, to the /metrics output."""
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def render_metrics():
+    parts = [view_metrics.render(), upstream_metrics.render()]
+    for collect in list(_collectors):
+        try:
+            parts.append(collect())
+        except Exception as e:
+            logger.error(f"Metrics collector failed: {e}")
+    return "".join(parts)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+class InstrumentationMiddleware:
+    """Time every request and attach a Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - start)
+
+    def _finish(self, request, response, timings, duration):
+        view_metrics.observe(duration, view=_view_name(request), method=request.method,
+                             status=str(response.status_code))
+        response["Server-Timing"] = server_timing(timings, duration)
+        return response
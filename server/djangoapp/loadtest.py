@@ -0,0 +1,238 @@
+"""
+In-process load test harness for the djangoapp endpoints.
+Requests are driven through Django's test client from a pool of threads,
+so runs need no network and can target the local backend store. Results
+are written as JSON so runs can be compared. isolated_environment() points
+a run at a throwaway database, local store and review files, so nothing it
+writes outlives it.
+"""
+
+import io
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from database import localstore
+from database.localstore import LocalStore, get_local_store
+from . import restapis
+
+LOADTEST_USER = "loadtest"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "mean_ms": (sum(latencies) / count * 1000) if count else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] * 1000) if count else 0.0,
+    }
+
+
+def new_password():
+    return secrets.token_urlsafe(24)
+
+
+def default_scenarios(dealer_count, seed=0, password=""):
+    """Return ``{name: callable(client, rng)}`` covering djangoapp/urls.py.
+
+    ``password`` is the one the login scenario sends for LOADTEST_USER.
+    """
+    states = ["Kansas", "TX", "California", "OH", "New York"]
+
+    def dealer_id(rng):
+        return rng.randint(1, max(dealer_count, 1))
+
+    return {
+        "get_dealers": lambda c, rng: c.get("/djangoapp/get_dealers"),
+        "get_dealers_by_state": lambda c, rng: c.get(f"/djangoapp/get_dealers/{rng.choice(states)}"),
+        "dealer_details": lambda c, rng: c.get(f"/djangoapp/dealer/{dealer_id(rng)}"),
+        "dealer_reviews": lambda c, rng: c.get(f"/djangoapp/reviews/dealer/{dealer_id(rng)}"),
+        "dealer_reviews_page": lambda c, rng: c.get(f"/djangoapp/reviews/dealer/{dealer_id(rng)}?limit=20"),
+        "add_review": lambda c, rng: c.post(
+            "/djangoapp/add_review",
+            data=json.dumps({
+                "dealership": dealer_id(rng),
+                "review": "Friendly staff but slow paperwork",
+                "purchase": False,
+            }),
+            content_type="application/json",
+        ),
+        "get_cars": lambda c, rng: c.get("/djangoapp/get_cars"),
+        "analyze_review": lambda c, rng: c.get(
+            "/djangoapp/analyze_review",
+            {"text": rng.choice(["Great service", "Rude and slow", "It was fine"])},
+        ),
+        "login": lambda c, rng: c.post(
+            "/djangoapp/login",
+            data=json.dumps({"userName": LOADTEST_USER, "password": password}),
+            content_type="application/json",
+        ),
+    }
+
+
+def ensure_user(password):
+    user, created = User.objects.get_or_create(username=LOADTEST_USER)
+    if created or not user.check_password(password):
+        user.set_password(password)
+        user.save()
+    return user
+
+
+def remove_user():
+    User.objects.filter(username=LOADTEST_USER).delete()
+
+
+@contextmanager
+def isolated_environment():
+    """Point a load test at throwaway state and discard it afterwards.
+
+    The Django database is swapped for a freshly migrated test database
+    with the car catalog seeded, the local store for a copy of the current
+    one, and the review queue, search and stats files for files in a
+    temporary directory.
+    """
+    global_store = localstore._store
+    indexes, queue = dict(restapis._review_indexes), restapis._review_queue
+    old_name = connection.settings_dict["NAME"]
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        store = LocalStore(os.path.join(tmp, "local_store.sqlite3"))
+        get_local_store().copy_to(store)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command("seed_cars", stdout=io.StringIO())
+            localstore._store = store
+            restapis._review_indexes.clear()
+            restapis._review_queue = None
+            with override_settings(
+                REVIEW_QUEUE_PATH=os.path.join(tmp, "review_queue.sqlite3"),
+                REVIEW_SEARCH_PATH=os.path.join(tmp, "review_search.sqlite3"),
+                REVIEW_STATS_PATH=os.path.join(tmp, "review_stats.sqlite3"),
+            ):
+                yield
+        finally:
+            if restapis._review_queue is not None:
+                restapis._review_queue.stop(timeout=5)
+            restapis._review_queue = queue
+            restapis._review_indexes.clear()
+            restapis._review_indexes.update(indexes)
+            localstore._store = global_store
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def run_scenario(action, requests, concurrency, seed=0, password=None):
+    """Fire ``requests`` calls of ``action`` from ``concurrency`` threads."""
+    password = password or new_password()
+    ensure_user(password)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    # Log in up front so password hashing is not part of the measured time
+    clients = []
+    for _ in range(concurrency):
+        client = Client()
+        client.login(username=LOADTEST_USER, password=password)
+        clients.append(client)
+
+    def worker(index, count):
+        client = clients[index]
+        rng = random.Random(seed + index)
+        local, failed = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                response = action(client, rng)
+                if response.status_code >= 500:
+                    failed += 1
+            except Exception:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, i, n) for i, n in enumerate(per_worker) if n]:
+            future.result()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def run(scenarios, requests, concurrency, seed=0, warmup=5, password=None):
+    """Run every scenario and return a result document.
+
+    LOADTEST_USER is created with ``password`` (a random one by default)
+    and deleted again when the run ends.
+    """
+    password = password or new_password()
+    results = {}
+    try:
+        for name, action in scenarios.items():
+            if warmup:
+                run_scenario(action, warmup, 1, seed, password)
+            results[name] = run_scenario(action, requests, concurrency, seed, password)
+    finally:
+        remove_user()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "requests_per_endpoint": requests,
+        "concurrency": concurrency,
+        "results": results,
+    }
+
+
+def save(result, directory):
+    """Write ``result`` to a timestamped JSON file and return its path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = result["timestamp"].replace(":", "").replace("-", "").split(".")[0]
+    path = os.path.join(directory, f"loadtest-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return path
+
+
+def compare(current, baseline):
+    """Return ``{endpoint: {metric: percent change}}`` against a baseline."""
+    changes = {}
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        changes[name] = {
+            metric: ((stats[metric] - base[metric]) / base[metric] * 100) if base[metric] else 0.0
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return changes
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from database import cloudantdb
+from djangoapp.restapis import (
+    analyze_review_sentiments_many,
+    current_sentiment_version,
+    stored_sentiment,
+)
+
+
+class Command(BaseCommand):
+    help = "Score and persist sentiment for reviews stored without one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Number of reviews scored and written per batch.")
+        parser.add_argument("--rescore-outdated", action="store_true",
+                            help="Also rescore reviews tagged with an older sentiment version.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report how many reviews need scoring without writing.")
+
+    def handle(self, *args, **options):
+        version = current_sentiment_version()
+        pending = []
+        for review in cloudantdb.get_all_reviews():
+            if stored_sentiment(review) is None:
+                pending.append(review)
+            elif options["rescore_outdated"] and review.get("sentiment_version") != version:
+                pending.append(review)
+
+        self.stdout.write(f"{len(pending)} review(s) need scoring with {version}")
+        if options["dry_run"] or not pending:
+            return
+
+        batch_size = max(options["batch_size"], 1)
+        updated = 0
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            scored = analyze_review_sentiments_many([r.get("review", "") for r in batch], with_version=True)
+            for review, (sentiment, scorer) in zip(batch, scored):
+                review["sentiment"] = sentiment
+                review["sentiment_version"] = scorer
+            if cloudantdb.update_reviews(batch) is None:
+                self.stderr.write(f"Failed to write batch starting at {start}")
+                continue
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled sentiment for {updated} review(s)"))
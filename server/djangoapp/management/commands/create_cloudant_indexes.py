@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from database import cloudantdb
+
+
+class Command(BaseCommand):
+    help = "Create the Mango indexes used by the dealer and review queries."
+
+    def handle(self, *args, **options):
+        created = cloudantdb.ensure_indexes()
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Created indexes: {', '.join(created)}"))
+        else:
+            self.stdout.write("All indexes already exist")
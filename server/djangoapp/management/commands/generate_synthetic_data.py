@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from database.localstore import LOCAL_STORE_PATH, get_local_store
+from djangoapp import synthetic
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic dealers, reviews, makes and models for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dealers", type=int, default=1000)
+        parser.add_argument("--reviews", type=int, default=10000)
+        parser.add_argument("--makes", type=int, default=50)
+        parser.add_argument("--models-per-make", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=10000,
+                            help="Rows written per transaction.")
+        parser.add_argument("--with-sentiment", action="store_true",
+                            help="Store a sentiment on generated reviews.")
+        parser.add_argument("--clear", action="store_true",
+                            help="Empty the local store before loading.")
+
+    def handle(self, *args, **options):
+        if LOCAL_STORE_PATH == ":memory:":
+            self.stderr.write("LOCAL_STORE_PATH is :memory:, generated data will not outlive this command")
+
+        store = get_local_store()
+        if options["clear"]:
+            store.clear()
+        chunk_size = max(options["chunk_size"], 1)
+        seed = options["seed"]
+
+        started = time.perf_counter()
+        catalog = synthetic.generate_catalog(options["makes"], options["models_per_make"], seed)
+        makes, models = synthetic.load_catalog(catalog, seed, options["dealers"], batch_size=chunk_size)
+        self.stdout.write(f"Created {makes} make(s) and {models} model(s)")
+
+        count = store.load_dealers(synthetic.generate_dealers(options["dealers"], seed), chunk_size=chunk_size)
+        self.stdout.write(f"Loaded {count} dealer(s)")
+
+        reviews = synthetic.generate_reviews(
+            options["reviews"], options["dealers"], catalog, seed, options["with_sentiment"]
+        )
+        count = store.load_reviews(reviews, chunk_size=chunk_size)
+        self.stdout.write(f"Loaded {count} review(s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {time.perf_counter() - started:.1f}s: store has {store.count('dealers')} dealer(s) "
+            f"and {store.count('reviews')} review(s)"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from database.localstore import LOCAL_STORE_PATH, get_local_store, iter_json_records
+
+
+class Command(BaseCommand):
+    help = "Bulk-load dealers and reviews into the embedded local backend store."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dealers", help="JSON array or NDJSON file of dealer documents.")
+        parser.add_argument("--reviews", help="JSON array or NDJSON file of review documents.")
+        parser.add_argument("--clear", action="store_true", help="Delete existing data before loading.")
+        parser.add_argument("--chunk-size", type=int, default=10000,
+                            help="Rows inserted per transaction.")
+
+    def handle(self, *args, **options):
+        if LOCAL_STORE_PATH == ":memory:":
+            self.stderr.write("LOCAL_STORE_PATH is :memory:, data will not outlive this command")
+
+        store = get_local_store()
+        if options["clear"]:
+            store.clear()
+
+        chunk_size = max(options["chunk_size"], 1)
+        if options["dealers"]:
+            count = store.load_dealers(iter_json_records(options["dealers"]), chunk_size=chunk_size)
+            self.stdout.write(f"Loaded {count} dealer(s)")
+        if options["reviews"]:
+            count = store.load_reviews(iter_json_records(options["reviews"]), chunk_size=chunk_size)
+            self.stdout.write(f"Loaded {count} review(s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Local store has {store.count('dealers')} dealer(s) and {store.count('reviews')} review(s)"
+        ))
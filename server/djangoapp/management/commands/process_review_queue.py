@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from djangoapp.restapis import get_review_queue
+
+
+class Command(BaseCommand):
+    help = "Flush journalled reviews upstream, once or continuously."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Drain every review that is ready and exit.")
+
+    def handle(self, *args, **options):
+        queue = get_review_queue(start_worker=not options["once"])
+        if options["once"]:
+            handled = queue.drain()
+            self.stdout.write(self.style.SUCCESS(f"Processed {handled} review(s)"))
+            self.stdout.write(f"Queue status: {queue.stats()}")
+            return
+
+        self.stdout.write("Processing review queue, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(60)
+                self.stdout.write(f"Queue status: {queue.stats()}")
+        except KeyboardInterrupt:
+            queue.stop()
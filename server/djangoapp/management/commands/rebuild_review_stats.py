@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from database.localstore import iter_json_records
+from djangoapp.restapis import all_review_docs, get_review_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute per-dealer review aggregates from the review backend or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", help="JSON array or NDJSON file of reviews to aggregate instead.")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Rows inserted per batch.")
+
+    def handle(self, *args, **options):
+        if settings.REVIEW_STATS_PATH == ":memory:":
+            self.stderr.write("REVIEW_STATS_PATH is :memory:, the aggregates will not outlive this command")
+
+        docs = iter_json_records(options["file"]) if options["file"] else all_review_docs()
+        if docs is None:
+            raise CommandError("The review backend could not be read; nothing was changed")
+        count = get_review_stats().rebuild(docs, chunk_size=max(options["chunk_size"], 1))
+        self.stdout.write(self.style.SUCCESS(f"Aggregated {count} review(s)"))
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from database.localstore import get_local_store
+from djangoapp import loadtest, restapis
+
+
+class Command(BaseCommand):
+    help = "Drive the djangoapp endpoints in-process and report throughput and latency percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--endpoints", nargs="*", help="Subset of scenario names to run.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="loadtest_results",
+                            help="Directory the JSON result file is written to.")
+        parser.add_argument("--compare", help="Earlier result file to compare against.")
+        parser.add_argument("--remote", action="store_true",
+                            help="Use the configured backend instead of forcing the local store. "
+                                 "add_review then only runs when named in --endpoints.")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+        if not options["remote"]:
+            restapis.backend_mode = "local"
+
+        password = loadtest.new_password()
+        dealer_count = get_local_store().count("dealers")
+        scenarios = loadtest.default_scenarios(dealer_count, options["seed"], password)
+        if options["endpoints"]:
+            unknown = set(options["endpoints"]) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options["endpoints"]}
+        elif options["remote"]:
+            # Would write real reviews upstream
+            scenarios.pop("add_review")
+
+        with loadtest.isolated_environment():
+            result = loadtest.run(scenarios, options["requests"], options["concurrency"], options["seed"],
+                                  password=password)
+        result["dealers"] = dealer_count
+
+        self.stdout.write(f"{'endpoint':<22}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, stats in result["results"].items():
+            self.stdout.write(
+                f"{name:<22}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+            )
+        path = loadtest.save(result, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)
+            for name, change in loadtest.compare(result, baseline).items():
+                deltas = ", ".join(f"{metric} {value:+.1f}%" for metric, value in change.items())
+                self.stdout.write(f"{name}: {deltas}")
@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from djangoapp import microbench
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(microbench.__file__), "microbench_baseline.json")
+
+
+class Command(BaseCommand):
+    help = "Time the sentiment and parsing hot paths and fail on regressions against a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", nargs="*", help="Subset of case names (prefix match).")
+        parser.add_argument("--repeat", type=int, default=7)
+        parser.add_argument("--min-time", type=float, default=0.05,
+                            help="Minimum seconds per timing run.")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="Write the results as the new baseline instead of comparing.")
+        parser.add_argument("--time-tolerance", type=float, default=0.50,
+                            help="Allowed slowdown as a fraction of the baseline time.")
+        parser.add_argument("--memory-tolerance", type=float, default=0.10,
+                            help="Allowed growth as a fraction of the baseline peak memory.")
+        parser.add_argument("--footprint", action="store_true",
+                            help="Also report bytes per review for dict-backed, slotted and columnar records.")
+
+    def handle(self, *args, **options):
+        cases = microbench.build_cases()
+        if options["cases"]:
+            cases = {name: func for name, func in cases.items()
+                     if any(name.startswith(prefix) for prefix in options["cases"])}
+            if not cases:
+                raise CommandError("No benchmark cases match the given names")
+
+        result = microbench.run(cases, options["repeat"], options["min_time"])
+        self.stdout.write(f"{'case':<36}{'us/call':>12}{'peak KiB':>12}")
+        for name, stats in result["results"].items():
+            self.stdout.write(f"{name:<36}{stats['seconds'] * 1e6:>12.1f}{stats['peak_bytes'] / 1024:>12.1f}")
+        if options["footprint"]:
+            for kind, size in microbench.record_footprint().items():
+                self.stdout.write(f"{'review footprint[' + kind + ']':<36}{size:>12.1f} bytes/review")
+
+        if options["save_baseline"]:
+            microbench.save(result, options["baseline"])
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options["baseline"]):
+            self.stdout.write(self.style.WARNING("No baseline found; run with --save-baseline to record one."))
+            return
+
+        problems = microbench.find_regressions(
+            result, microbench.load(options["baseline"]),
+            options["time_tolerance"], options["memory_tolerance"],
+        )
+        if problems:
+            raise CommandError("Benchmark regressions:\n" + "\n".join(problems))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
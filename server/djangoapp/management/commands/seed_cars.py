@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from djangoapp.catalog_seed import import_catalog, iter_catalog_file, seed_records
+
+
+class Command(BaseCommand):
+    help = "Load car makes and models in bulk. Safe to re-run; existing rows are left alone."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", nargs="*", default=[],
+                            help="CSV, JSON array or NDJSON files of make/model rows. "
+                                 "Defaults to the built-in catalog.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows inserted per bulk_create.")
+
+    def handle(self, *args, **options):
+        sources = [iter_catalog_file(path) for path in options["file"]] or [seed_records()]
+        makes = models = 0
+        for records in sources:
+            try:
+                created = import_catalog(records, batch_size=max(options["batch_size"], 1))
+            except (KeyError, ValueError) as e:
+                raise CommandError(f"Invalid catalog record: {e}")
+            makes += created[0]
+            models += created[1]
+        self.stdout.write(self.style.SUCCESS(f"Created {makes} make(s) and {models} model(s)"))
@@ -0,0 +1,161 @@
+"""
+Micro-benchmarks for the sentiment, parsing and serialisation hot paths.
+Each case is timed with timeit and run once under tracemalloc to record
+peak allocated memory. Results can be checked against a stored baseline
+to catch regressions; times are compared relative to a fixed calibration
+loop so a baseline recorded on one machine stays usable on another.
+"""
+
+import json
+import platform
+import timeit
+import tracemalloc
+
+from sentiment_analyzer import sentiment_analyzer
+from . import restapis
+from .records import RecordColumns, dumps_records
+from .synthetic import generate_dealers, generate_reviews
+
+TEXT_LENGTHS = (50, 500, 5000)
+BATCH_SIZES = (10, 100, 1000)
+BASE_TEXT = ("The staff were friendly and helpful but the paperwork was slow and "
+             "the coffee was not good. Would still recommend this dealer overall. ")
+
+
+def _text(length):
+    return (BASE_TEXT * (length // len(BASE_TEXT) + 1))[:length]
+
+
+def build_cases():
+    """Return ``{name: zero-argument callable}`` for every benchmark case."""
+    cases = {}
+    for length in TEXT_LENGTHS:
+        text = _text(length)
+        cases[f"simple_sentiment[len={length}]"] = lambda t=text: restapis._simple_sentiment(t)
+        cases[f"analyze_sentiment[len={length}]"] = lambda t=text: sentiment_analyzer.analyze_sentiment(t)
+
+    for size in BATCH_SIZES:
+        texts = [doc["review"] for doc in generate_reviews(size, dealer_count=10)]
+        dealers = list(generate_dealers(size))
+        reviews = list(generate_reviews(size, dealer_count=10, with_sentiment=True))
+        sentiments = [doc["sentiment"] for doc in reviews]
+        cases[f"analyze_sentiment_many[batch={size}]"] = (
+            lambda t=texts: sentiment_analyzer.analyze_sentiment_many(t))
+        cases[f"parse_dealer_json[batch={size}]"] = (
+            lambda d=dealers: [restapis.parse_dealer_json(doc) for doc in d])
+        cases[f"build_reviews[batch={size}]"] = (
+            lambda r=reviews, s=sentiments: restapis._build_reviews(r, s))
+        built = restapis._build_reviews(reviews, sentiments)
+        # Reference for dumps_records: how the views serialised dict-backed reviews
+        plain = [_DictReview(**review.to_dict()) for review in built]
+        cases[f"dumps_dicts[batch={size}]"] = (
+            lambda p=plain: json.dumps([review.__dict__ for review in p]))
+        # What slotted records would cost through json.dumps
+        cases[f"dumps_to_dict[batch={size}]"] = (
+            lambda b=built: json.dumps([review.to_dict() for review in b]))
+        cases[f"dumps_records[batch={size}]"] = lambda b=built: dumps_records(b)
+    return cases
+
+
+class _DictReview:
+    """DealerReview as it was before slots, for footprint comparisons."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _allocated(build):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def record_footprint(count=1000):
+    """Bytes per review held as dict-backed objects, slotted records and columns.
+
+    Only the containers are counted; the field values are shared by all three.
+    """
+    docs = list(generate_reviews(count, dealer_count=10, with_sentiment=True))
+    reviews = restapis._build_reviews(docs, [doc["sentiment"] for doc in docs])
+    values = [review.to_dict() for review in reviews]
+    sizes = {
+        "dict": _allocated(lambda: [_DictReview(**fields) for fields in values]),
+        "slots": _allocated(lambda: restapis._build_reviews(docs, [doc["sentiment"] for doc in docs])),
+        "columns": _allocated(lambda: RecordColumns.from_records(reviews)),
+    }
+    return {name: size / count for name, size in sizes.items()}
+
+
+def measure(func, repeat=7, min_time=0.05):
+    """Return per-call time (best of ``repeat``) and peak allocation of ``func``."""
+    timer = timeit.Timer(func)
+    # Grow the loop count until one measurement takes at least min_time
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak, "loops": number}
+
+
+def _calibration_loop():
+    total = 0
+    for i in range(10000):
+        total += i % 7
+    return total
+
+
+def run(cases=None, repeat=7, min_time=0.05):
+    cases = cases if cases is not None else build_cases()
+    results = {}
+    for name, func in cases.items():
+        stats = measure(func, repeat, min_time)
+        # Re-measured next to each case so drifts in machine speed cancel out
+        stats["calibration"] = measure(_calibration_loop, repeat, min_time)["seconds"]
+        results[name] = stats
+    return {"python": platform.python_version(), "results": results}
+
+
+def _relative(stats):
+    return stats["seconds"] / stats["calibration"] if stats.get("calibration") else stats["seconds"]
+
+
+def find_regressions(current, baseline, time_tolerance=0.50, memory_tolerance=0.10):
+    """Return a list of messages for cases slower or larger than the baseline allows."""
+    problems = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if base["seconds"] and _relative(stats) > _relative(base) * (1 + time_tolerance):
+            problems.append(
+                f"{name}: {stats['seconds'] * 1e6:.1f}us vs baseline {base['seconds'] * 1e6:.1f}us"
+            )
+        if base["peak_bytes"] and stats["peak_bytes"] > base["peak_bytes"] * (1 + memory_tolerance):
+            problems.append(
+                f"{name}: peak {stats['peak_bytes']} bytes vs baseline {base['peak_bytes']} bytes"
+            )
+    return problems
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save(result, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2, sort_keys=True)
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:56
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarMake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('country_of_origin', models.CharField(blank=True, max_length=100)),
+                ('founded_year', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Car Make',
+                'verbose_name_plural': 'Car Makes',
+            },
+        ),
+        migrations.CreateModel(
+            name='CarModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('car_type', models.CharField(choices=[('SEDAN', 'Sedan'), ('SUV', 'SUV'), ('WAGON', 'Wagon'), ('COUPE', 'Coupe'), ('CONVERTIBLE', 'Convertible'), ('HATCHBACK', 'Hatchback'), ('TRUCK', 'Truck'), ('VAN', 'Van'), ('MINIVAN', 'Minivan')], default='SEDAN', max_length=20)),
+                ('year', models.IntegerField(default=2023, validators=[django.core.validators.MinValueValidator(2015), django.core.validators.MaxValueValidator(2023)])),
+                ('dealer_id', models.IntegerField(blank=True, null=True)),
+                ('car_make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='models', to='djangoapp.carmake')),
+            ],
+            options={
+                'verbose_name': 'Car Model',
+                'verbose_name_plural': 'Car Models',
+                'indexes': [models.Index(fields=['car_type'], name='carmodel_car_type_idx'), models.Index(fields=['year'], name='carmodel_year_idx'), models.Index(fields=['dealer_id'], name='carmodel_dealer_id_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='carmodel',
+            constraint=models.UniqueConstraint(fields=('car_make', 'name'), name='carmodel_make_name_unique'),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 
 
 class CarMake(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     country_of_origin = models.CharField(max_length=100, blank=True)
     founded_year = models.IntegerField(null=True, blank=True)
@@ -44,3 +44,12 @@ class CarModel(models.Model):
     class Meta:
         verbose_name = "Car Model"
         verbose_name_plural = "Car Models"
+        # car_make is indexed as a foreign key; these back the catalog filters
+        indexes = [
+            models.Index(fields=['car_type'], name='carmodel_car_type_idx'),
+            models.Index(fields=['year'], name='carmodel_year_idx'),
+            models.Index(fields=['dealer_id'], name='carmodel_dealer_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['car_make', 'name'], name='carmodel_make_name_unique'),
+        ]
@@ -0,0 +1,162 @@
+"""
+Compact record types and a column-wise JSON serialiser.
+Dealers and reviews are slotted objects with a fixed ``FIELDS`` tuple, so
+they carry no per-instance ``__dict__``. Large result sets are serialised
+by transposing a block of records into columns, encoding each column in
+one pass with the C string encoder from the json module, and filling a
+per-type row template, so no intermediate dict is built per record.
+"""
+
+import json
+import math
+from functools import lru_cache
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from operator import attrgetter
+
+SERIALIZE_CHUNK_SIZE = 256
+# Below this many records building dicts for json.dumps is no slower than columns
+SMALL_RECORD_COUNT = 32
+
+
+def _encode_float(value):
+    # json.dumps writes NaN/Infinity, which float.__repr__ does not
+    return float.__repr__(value) if math.isfinite(value) else json.dumps(value)
+
+
+VALUE_ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    bool: {True: "true", False: "false"}.__getitem__,
+    float: _encode_float,
+    type(None): lambda value: "null",
+}
+
+
+def encode_column(values):
+    """Return the JSON text of each value in ``values``."""
+    types = set(map(type, values))
+    if len(types) == 1:
+        encoder = VALUE_ENCODERS.get(types.pop(), json.dumps)
+        return list(map(encoder, values))
+    return [VALUE_ENCODERS.get(type(value), json.dumps)(value) for value in values]
+
+
+@lru_cache(maxsize=64)
+def _row_template(fields):
+    """A str.format template writing one JSON object with ``fields`` in order."""
+    members = ",".join(
+        encode_basestring_ascii(name).replace("{", "{{").replace("}", "}}") + ":{}" for name in fields
+    )
+    return "{{" + members + "}}"
+
+
+class Record:
+    """Base for slotted records; subclasses set ``__slots__ = FIELDS``."""
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class RecordColumns:
+    """Columnar store of records: one list per field instead of one object per row."""
+
+    def __init__(self, fields, columns):
+        self.fields = list(fields)
+        self.columns = [column if isinstance(column, list) else list(column) for column in columns]
+        if len(self.fields) != len(self.columns):
+            raise ValueError("fields and columns differ in length")
+        if len({len(column) for column in self.columns}) > 1:
+            raise ValueError("columns differ in length")
+
+    @classmethod
+    def from_records(cls, records, fields=None):
+        records = list(records)
+        if fields is None:
+            fields = type(records[0]).FIELDS if records else ()
+        return cls(fields, [list(map(attrgetter(name), records)) for name in fields])
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def column(self, name):
+        return self.columns[self.fields.index(name)]
+
+    def add_column(self, name, values):
+        values = list(values)
+        if self.columns and len(values) != len(self):
+            raise ValueError(f"column {name} has {len(values)} values for {len(self)} rows")
+        self.fields.append(name)
+        self.columns.append(values)
+
+    def rows(self):
+        """Return an iterator over the rows as JSON object text."""
+        if not self.fields:
+            return iter(())
+        encoded = [encode_column(column) for column in self.columns]
+        return map(_row_template(tuple(self.fields)).format, *encoded)
+
+    def to_json(self):
+        return "[" + ",".join(self.rows()) + "]"
+
+
+def iter_json_rows(records, fields=None, extra=None, chunk_size=SERIALIZE_CHUNK_SIZE):
+    """Yield one JSON object string per record, ``chunk_size`` records at a time.
+
+    ``extra`` maps additional field names to iterables with one value per
+    record, appended after the record's own fields.
+    """
+    records = iter(records)
+    extra = {name: iter(values) for name, values in (extra or {}).items()}
+    while True:
+        block = list(islice(records, chunk_size))
+        if not block:
+            return
+        columns = RecordColumns.from_records(block, fields)
+        for name, values in extra.items():
+            columns.add_column(name, islice(values, len(block)))
+        yield from columns.rows()
+
+
+def _record_dicts(records, fields=None, extra=None):
+    if fields is None:
+        fields = type(records[0]).FIELDS if records else ()
+    rows = [{name: getattr(record, name) for name in fields} for record in records]
+    for name, values in (extra or {}).items():
+        for row, value in zip(rows, values):
+            row[name] = value
+    return rows
+
+
+def dumps_records(records, fields=None, extra=None):
+    """Serialise ``records`` as a JSON array of objects.
+
+    Lists shorter than SMALL_RECORD_COUNT go through json.dumps, which is
+    as fast there; longer ones are encoded column-wise.
+    """
+    records = list(records)
+    if len(records) < SMALL_RECORD_COUNT:
+        return json.dumps(_record_dicts(records, fields, extra), separators=(",", ":"))
+    return "[" + ",".join(iter_json_rows(records, fields, extra)) + "]"
+
+
+def dumps_record(record):
+    """Serialise a single record as a JSON object."""
+    values = [getattr(record, name) for name in record.FIELDS]
+    return _row_template(tuple(record.FIELDS)).format(
+        *(VALUE_ENCODERS.get(type(value), json.dumps)(value) for value in values)
+    )
@@ -2,6 +2,24 @@ import requests
 import json
 import os
 import logging
+import threading
+import asyncio
+import contextvars
+import weakref
+from urllib.parse import quote
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sentiment_analyzer.lexicon import Lexicon
+from database.localstore import get_local_store
+from .sentiment_cache import SentimentCache
+from .dealer_directory import DealerDirectory
+from .review_queue import ReviewQueue
+from .review_search import ReviewSearchIndex
+from .review_stats import ReviewStats
+from .records import Record
+from . import instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -9,12 +27,80 @@ logger = logging.getLogger(__name__)
 cloudant_base_url = os.environ.get("CLOUDANT_URL", "")
 cf_base_url = os.environ.get("CF_BASE_URL", "https://us-south.functions.appdomain.cloud/api/v1/web/your-namespace")
 
+# "remote" calls Cloud Functions; "local" serves everything from the embedded store
+backend_mode = os.environ.get("BACKEND_MODE", "remote")
+
 # IBM NLU
 ibm_api_key = os.environ.get("IBM_API_KEY", "")
 ibm_nlu_url = os.environ.get("IBM_NLU_URL", "")
+ibm_nlu_warmup = os.environ.get("IBM_NLU_WARMUP", "False") == "True"
+NLU_VERSION = "2022-04-07"
+
+# Version tags stored next to persisted sentiment labels
+WATSON_SENTIMENT_VERSION = f"watson-{NLU_VERSION}"
+KEYWORD_SENTIMENT_VERSION = "keyword-2"
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+# Keyword fallback lexicon, compiled once at import
+POSITIVE_WORDS = {
+    "great": 1, "excellent": 2, "amazing": 2, "fantastic": 2, "wonderful": 2,
+    "good": 1, "best": 2, "love": 2, "loved": 2, "perfect": 2,
+    "outstanding": 2, "superb": 2, "awesome": 2, "happy": 1, "satisfied": 1,
+    "recommend": 1, "recommended": 1, "helpful": 1, "friendly": 1, "clean": 1,
+}
+NEGATIVE_WORDS = {
+    "bad": 1, "terrible": 2, "horrible": 2, "awful": 2, "worst": 2,
+    "hate": 2, "hated": 2, "poor": 1, "disappointing": 1, "disappointed": 1,
+    "unhappy": 1, "rude": 1, "dirty": 1, "slow": 1, "overpriced": 1,
+    "broken": 1, "failed": 1, "never": 1, "waste": 1, "problem": 1,
+    "problems": 1, "issue": 1, "issues": 1,
+}
+_keyword_lexicon = Lexicon(POSITIVE_WORDS, NEGATIVE_WORDS)
+
+_nlu_client = None
+_nlu_client_lock = threading.Lock()
+
+# Shared HTTP transport for Cloud Functions calls
+cf_timeout = float(os.environ.get("CF_TIMEOUT", "10"))
+cf_pool_connections = int(os.environ.get("CF_POOL_CONNECTIONS", "4"))
+cf_pool_maxsize = int(os.environ.get("CF_POOL_MAXSIZE", "20"))
+cf_max_retries = int(os.environ.get("CF_MAX_RETRIES", "2"))
+cf_backoff_factor = float(os.environ.get("CF_BACKOFF_FACTOR", "0.2"))
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+_review_queue = None
+_review_queue_lock = threading.Lock()
+
+# Local review indexes by class, see _get_review_index
+_review_indexes = {}
+_review_indexes_lock = threading.Lock()
+
+
+# Review pagination
+OFFSET_CURSOR_PREFIX = "offset:"
+
+# Concurrent sentiment scoring
+sentiment_max_workers = int(os.environ.get("SENTIMENT_MAX_WORKERS", "8"))
+sentiment_deadline = float(os.environ.get("SENTIMENT_DEADLINE", "5"))
+
+_sentiment_executor = None
+_sentiment_executor_lock = threading.Lock()
+
+# Sentiment result cache
+sentiment_cache = SentimentCache(
+    max_size=int(os.environ.get("SENTIMENT_CACHE_SIZE", "10000")),
+    ttl=int(os.environ.get("SENTIMENT_CACHE_TTL", "86400")),
+    shared_alias=os.environ.get("SENTIMENT_CACHE_ALIAS", ""),
+)
+
+
+class CarDealer(Record):
+    FIELDS = ("address", "city", "full_name", "id", "lat", "long", "short_name", "st", "state", "zip")
+    __slots__ = FIELDS
 
-
-class CarDealer:
     def __init__(self, address, city, full_name, id, lat, long, short_name, st, state, zip):
         self.address = address
         self.city = city
@@ -31,7 +117,11 @@ class CarDealer:
         return f"Dealer name: {self.full_name}"
 
 
-class DealerReview:
+class DealerReview(Record):
+    FIELDS = ("dealership", "name", "purchase", "review", "purchase_date",
+              "car_make", "car_model", "car_year", "sentiment", "id")
+    __slots__ = FIELDS
+
     def __init__(self, dealership, name, purchase, review, purchase_date, car_make, car_model, car_year, sentiment, id):
         self.dealership = dealership
         self.name = name
@@ -48,52 +138,182 @@ class DealerReview:
         return f"Review from {self.name}: {self.review}"
 
 
-def get_request(endpoint, **kwargs):
-    """Generic GET request to Cloud Functions."""
-    params = ""
-    if kwargs:
-        params = "&".join([f"{key}={value}" for key, value in kwargs.items()])
-    
+def get_session():
+    """Return the process-wide pooled session used for Cloud Functions calls.
+
+    Connections are kept alive and reused across requests, at most
+    ``cf_pool_maxsize`` per host, and idempotent GETs are retried with
+    exponential backoff on connection errors and 502/503/504 responses.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=cf_max_retries,
+                    backoff_factor=cf_backoff_factor,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=cf_pool_connections,
+                    pool_maxsize=cf_pool_maxsize,
+                    pool_block=True,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.headers.update({"Connection": "keep-alive"})
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def reset_session():
+    """Close the shared session so the next call builds a fresh pool."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_pool_stats():
+    """Return connection pool counters for the shared session.
+
+    ``hits`` counts requests served on an already open connection and
+    ``misses`` counts requests that had to open a new one.
+    """
+    stats = {"hosts": 0, "requests": 0, "hits": 0, "misses": 0}
+    if _session is None:
+        return stats
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["hosts"] += 1
+            stats["requests"] += pool.num_requests
+            stats["misses"] += pool.num_connections
+    stats["hits"] = max(stats["requests"] - stats["misses"], 0)
+    return stats
+
+
+def render_pool_metrics():
+    """Render get_pool_stats() in the Prometheus text format for /metrics."""
+    stats = get_pool_stats()
+    name = "djangoapp_upstream_pool"
+    return "\n".join([
+        f"# HELP {name}_requests_total Upstream requests by whether they reused a pooled connection.",
+        f"# TYPE {name}_requests_total counter",
+        f'{name}_requests_total{{result="hit"}} {stats["hits"]}',
+        f'{name}_requests_total{{result="miss"}} {stats["misses"]}',
+        f"# HELP {name}_hosts Hosts with an open connection pool.",
+        f"# TYPE {name}_hosts gauge",
+        f"{name}_hosts {stats['hosts']}",
+    ]) + "\n"
+
+
+def _build_url(endpoint, **kwargs):
+    """Build the full Cloud Functions URL for ``endpoint``."""
+    params = "&".join([f"{key}={quote(str(value), safe='')}" for key, value in kwargs.items()])
     request_url = f"{cf_base_url}{endpoint}"
     if params:
         request_url += f"?{params}"
-    
-    print(f"GET from {request_url}")
+    return request_url
+
+
+def get_request(endpoint, **kwargs):
+    """Generic GET request to Cloud Functions."""
+    if backend_mode == "local":
+        with instrumentation.timed("db", instrumentation.endpoint_label(endpoint)):
+            return get_local_store().get(endpoint, **kwargs)
+
+    request_url = _build_url(endpoint, **kwargs)
     try:
-        response = requests.get(request_url, timeout=10)
+        with instrumentation.upstream_call("GET", request_url) as call:
+            response = get_session().get(request_url, timeout=cf_timeout)
+            call["status"] = response.status_code
         return response.json()
     except Exception as e:
         logger.error(f"Network error: {e}")
-        return _get_mock_data(endpoint, **kwargs)
+        return get_local_store().get(endpoint, **kwargs)
 
 
 def post_request(endpoint, json_payload, **kwargs):
     """Generic POST request to Cloud Functions."""
-    params = "&".join([f"{key}={value}" for key, value in kwargs.items()])
-    request_url = f"{cf_base_url}{endpoint}"
-    if params:
-        request_url += f"?{params}"
-    
+    if backend_mode == "local":
+        with instrumentation.timed("db", instrumentation.endpoint_label(endpoint)):
+            return get_local_store().post(endpoint, json_payload)
+
+    request_url = _build_url(endpoint, **kwargs)
     try:
-        response = requests.post(request_url, json=json_payload, timeout=10)
+        with instrumentation.upstream_call("POST", request_url) as call:
+            response = get_session().post(request_url, json=json_payload, timeout=cf_timeout)
+            call["status"] = response.status_code
+        result = response.json()
+    except Exception as e:
+        logger.error(f"Network error: {e}")
+        return None
+    if isinstance(result, dict) and not 200 <= response.status_code < 300:
+        result = dict(result, status=response.status_code)
+    return result
+
+
+def get_async_client():
+    """Return the shared httpx.AsyncClient for the running event loop.
+
+    Async clients are bound to the loop they were created on, so one
+    client is kept per loop. Connection limits mirror the sync pool.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=cf_timeout,
+            limits=httpx.Limits(
+                max_connections=cf_pool_maxsize,
+                max_keepalive_connections=cf_pool_maxsize,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=cf_max_retries),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def async_get_request(endpoint, **kwargs):
+    """Async GET request to Cloud Functions."""
+    if backend_mode == "local":
+        with instrumentation.timed("db", instrumentation.endpoint_label(endpoint)):
+            return get_local_store().get(endpoint, **kwargs)
+
+    request_url = _build_url(endpoint, **kwargs)
+    try:
+        with instrumentation.upstream_call("GET", request_url) as call:
+            response = await get_async_client().get(request_url)
+            call["status"] = response.status_code
         return response.json()
     except Exception as e:
         logger.error(f"Network error: {e}")
-        return {"status": 200, "message": "Review submitted (mock)"}
+        return get_local_store().get(endpoint, **kwargs)
 
 
-def get_dealers_from_cf(endpoint, **kwargs):
-    """Get list of dealers from Cloud Functions."""
-    results = get_request(endpoint, **kwargs)
+def _parse_dealers(results):
     if isinstance(results, list):
         dealers = [parse_dealer_json(dealer) for dealer in results]
         return dealers
     return []
 
 
-def get_dealer_by_id_from_cf(endpoint, dealer_id=None):
-    """Get a single dealer by ID."""
-    results = get_request(endpoint)
+def _parse_dealer(results):
     if isinstance(results, list) and len(results) > 0:
         return parse_dealer_json(results[0])
     elif isinstance(results, dict):
@@ -101,96 +321,556 @@ def get_dealer_by_id_from_cf(endpoint, dealer_id=None):
     return None
 
 
-def get_dealer_reviews_from_cf(endpoint, dealer_id=None):
-    """Get reviews for a dealer."""
-    results = get_request(endpoint)
-    reviews = []
+def _review_docs(results):
     if isinstance(results, dict):
         results = results.get("data", {}).get("docs", [])
     if isinstance(results, list):
-        for review_data in results:
-            try:
-                sentiment = analyze_review_sentiments(review_data.get("review", ""))
-                review = DealerReview(
-                    dealership=review_data.get("dealership", ""),
-                    name=review_data.get("name", "Anonymous"),
-                    purchase=review_data.get("purchase", False),
-                    review=review_data.get("review", ""),
-                    purchase_date=review_data.get("purchase_date", ""),
-                    car_make=review_data.get("car_make", ""),
-                    car_model=review_data.get("car_model", ""),
-                    car_year=review_data.get("car_year", ""),
-                    sentiment=sentiment,
-                    id=review_data.get("id", review_data.get("_id", "")),
-                )
-                reviews.append(review)
-            except Exception as e:
-                logger.error(f"Error parsing review: {e}")
+        return [r for r in results if isinstance(r, dict)]
+    return []
+
+
+def _unscored(sentiments):
+    return [i for i, sentiment in enumerate(sentiments) if sentiment is None]
+
+
+def _build_reviews(review_docs, sentiments):
+    reviews = []
+    for review_data, sentiment in zip(review_docs, sentiments):
+        try:
+            review = DealerReview(
+                dealership=review_data.get("dealership", ""),
+                name=review_data.get("name", "Anonymous"),
+                purchase=review_data.get("purchase", False),
+                review=review_data.get("review", ""),
+                purchase_date=review_data.get("purchase_date", ""),
+                car_make=review_data.get("car_make", ""),
+                car_model=review_data.get("car_model", ""),
+                car_year=review_data.get("car_year", ""),
+                sentiment=sentiment,
+                id=review_data.get("id", review_data.get("_id", "")),
+            )
+            reviews.append(review)
+        except Exception as e:
+            logger.error(f"Error parsing review: {e}")
     return reviews
 
 
-def analyze_review_sentiments(text):
-    """Analyze sentiment of review text using IBM Watson NLU."""
-    if not text:
-        return "neutral"
-    
+def get_dealers_from_cf(endpoint, **kwargs):
+    """Get list of dealers from Cloud Functions."""
+    return _parse_dealers(get_request(endpoint, **kwargs))
+
+
+def get_dealer_by_id_from_cf(endpoint, dealer_id=None):
+    """Get a single dealer by ID."""
+    return _parse_dealer(get_request(endpoint))
+
+
+def _reviews_from_docs(review_docs):
+    sentiments = [stored_sentiment(review_data) for review_data in review_docs]
+    missing = _unscored(sentiments)
+    if missing:
+        scored = analyze_review_sentiments_many(
+            [review_docs[i].get("review", "") for i in missing]
+        )
+        for i, sentiment in zip(missing, scored):
+            sentiments[i] = sentiment
+    return _build_reviews(review_docs, sentiments)
+
+
+def get_dealer_reviews_from_cf(endpoint, dealer_id=None):
+    """Get reviews for a dealer."""
+    return _reviews_from_docs(_review_docs(get_request(endpoint)))
+
+
+def _review_page_kwargs(dealer_id, limit, cursor):
+    kwargs = {"id": dealer_id, "limit": limit}
+    if cursor and not cursor.startswith(OFFSET_CURSOR_PREFIX):
+        kwargs["bookmark"] = cursor
+    return kwargs
+
+
+def _review_bookmark(results):
+    if isinstance(results, dict):
+        return results.get("bookmark") or results.get("data", {}).get("bookmark")
+    return None
+
+
+def _review_page(results, limit, cursor):
+    """Split upstream results into ``(review_docs, next_cursor)``.
+
+    When upstream pages with Cloudant bookmarks the bookmark is the cursor.
+    Otherwise the full list was returned and is paged locally by offset.
+    """
+    bookmark = _review_bookmark(results)
+    review_docs = _review_docs(results)
+    if bookmark:
+        next_cursor = bookmark if len(review_docs) >= limit else None
+        return review_docs[:limit], next_cursor
+
+    offset = 0
+    if cursor and cursor.startswith(OFFSET_CURSOR_PREFIX):
+        try:
+            offset = max(int(cursor[len(OFFSET_CURSOR_PREFIX):]), 0)
+        except ValueError:
+            offset = 0
+    end = offset + limit
+    next_cursor = f"{OFFSET_CURSOR_PREFIX}{end}" if end < len(review_docs) else None
+    return review_docs[offset:end], next_cursor
+
+
+def get_dealer_reviews_page_from_cf(dealer_id, limit, cursor=None):
+    """Get one page of a dealer's reviews.
+
+    Returns ``(reviews, next_cursor)``; ``next_cursor`` is None on the last
+    page.
+    """
+    results = get_request("/api/review", **_review_page_kwargs(dealer_id, limit, cursor))
+    review_docs, next_cursor = _review_page(results, limit, cursor)
+    return _reviews_from_docs(review_docs), next_cursor
+
+
+def iter_dealer_reviews_from_cf(dealer_id, page_size=100):
+    """Yield every review for a dealer, fetching one page at a time.
+
+    If upstream ignores paging and returns the full list, that list is
+    fetched once and scored a page at a time rather than refetched per page.
+    """
+    cursor = None
+    while True:
+        results = get_request("/api/review", **_review_page_kwargs(dealer_id, page_size, cursor))
+        if not _review_bookmark(results):
+            review_docs = _review_docs(results)
+            for start in range(0, len(review_docs), page_size):
+                yield from _reviews_from_docs(review_docs[start:start + page_size])
+            return
+        review_docs, cursor = _review_page(results, page_size, cursor)
+        yield from _reviews_from_docs(review_docs)
+        if not cursor:
+            return
+
+
+async def async_get_dealers_from_cf(endpoint, **kwargs):
+    """Async variant of get_dealers_from_cf."""
+    return _parse_dealers(await async_get_request(endpoint, **kwargs))
+
+
+async def async_get_dealer_by_id_from_cf(endpoint, dealer_id=None):
+    """Async variant of get_dealer_by_id_from_cf."""
+    return _parse_dealer(await async_get_request(endpoint))
+
+
+async def _async_reviews_from_docs(review_docs):
+    sentiments = [stored_sentiment(review_data) for review_data in review_docs]
+    missing = _unscored(sentiments)
+    if missing:
+        scored = await sync_to_async(analyze_review_sentiments_many, thread_sensitive=False)(
+            [review_docs[i].get("review", "") for i in missing]
+        )
+        for i, sentiment in zip(missing, scored):
+            sentiments[i] = sentiment
+    return _build_reviews(review_docs, sentiments)
+
+
+async def async_get_dealer_reviews_from_cf(endpoint, dealer_id=None):
+    """Async variant of get_dealer_reviews_from_cf.
+
+    Sentiment scoring stays on the sync worker pool and is awaited in a
+    thread so the event loop is never blocked.
+    """
+    return await _async_reviews_from_docs(_review_docs(await async_get_request(endpoint)))
+
+
+async def async_get_dealer_reviews_page_from_cf(dealer_id, limit, cursor=None):
+    """Async variant of get_dealer_reviews_page_from_cf."""
+    results = await async_get_request("/api/review", **_review_page_kwargs(dealer_id, limit, cursor))
+    review_docs, next_cursor = _review_page(results, limit, cursor)
+    return await _async_reviews_from_docs(review_docs), next_cursor
+
+
+async def async_iter_dealer_reviews_from_cf(dealer_id, page_size=100):
+    """Async variant of iter_dealer_reviews_from_cf."""
+    cursor = None
+    while True:
+        results = await async_get_request("/api/review", **_review_page_kwargs(dealer_id, page_size, cursor))
+        if not _review_bookmark(results):
+            review_docs = _review_docs(results)
+            for start in range(0, len(review_docs), page_size):
+                for review in await _async_reviews_from_docs(review_docs[start:start + page_size]):
+                    yield review
+            return
+        review_docs, cursor = _review_page(results, page_size, cursor)
+        for review in await _async_reviews_from_docs(review_docs):
+            yield review
+        if not cursor:
+            return
+
+
+def stored_sentiment(review_data):
+    """Return the sentiment persisted on a review document, if any."""
+    sentiment = review_data.get("sentiment")
+    if sentiment in SENTIMENT_LABELS:
+        return sentiment
+    return None
+
+
+def current_sentiment_version():
+    """Return the version tag of the scorer analyze_review_sentiments uses."""
+    if get_nlu_client() is not None:
+        return WATSON_SENTIMENT_VERSION
+    return KEYWORD_SENTIMENT_VERSION
+
+
+def get_nlu_client():
+    """Return the process-wide Watson NLU client, creating it on first use.
+
+    The client and its IAMAuthenticator are built once and shared by all
+    threads. The authenticator's token manager caches the IAM access token
+    and refreshes it ahead of expiry, so analyze calls no longer pay for a
+    token exchange each time. Returns None when NLU is not configured or
+    the SDK is unavailable.
+    """
+    global _nlu_client
     if not ibm_api_key or not ibm_nlu_url:
-        return _simple_sentiment(text)
-    
+        return None
+    if _nlu_client is None:
+        with _nlu_client_lock:
+            if _nlu_client is None:
+                try:
+                    from ibm_watson import NaturalLanguageUnderstandingV1
+                    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+
+                    authenticator = IAMAuthenticator(ibm_api_key)
+                    nlu = NaturalLanguageUnderstandingV1(
+                        version=NLU_VERSION,
+                        authenticator=authenticator
+                    )
+                    nlu.set_service_url(ibm_nlu_url)
+                    _nlu_client = nlu
+                except Exception as e:
+                    logger.error(f"IBM Watson NLU client error: {e}")
+                    return None
+    return _nlu_client
+
+
+def reset_nlu_client():
+    """Drop the shared NLU client so the next call rebuilds it."""
+    global _nlu_client
+    with _nlu_client_lock:
+        _nlu_client = None
+
+
+def warm_up_nlu():
+    """Build the NLU client and fetch an IAM token ahead of the first request."""
+    nlu = get_nlu_client()
+    if nlu is None:
+        return False
     try:
-        from ibm_watson import NaturalLanguageUnderstandingV1
-        from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-        from ibm_watson.natural_language_understanding_v1 import Features, SentimentOptions
+        nlu.authenticator.token_manager.get_token()
+        return True
+    except Exception as e:
+        logger.error(f"IBM Watson NLU warm-up error: {e}")
+        return False
+
+
+def analyze_review_sentiments(text, with_version=False):
+    """Analyze sentiment of review text using IBM Watson NLU.
+
+    Results are cached by normalised text and backend, so repeated texts
+    are only scored once. With ``with_version`` a ``(sentiment, version)``
+    pair is returned, where version tags the scorer that actually produced
+    the label (keyword scoring when Watson fails).
+    """
+    nlu = get_nlu_client()
+    backend = WATSON_SENTIMENT_VERSION if nlu is not None else KEYWORD_SENTIMENT_VERSION
+    if not text:
+        scored = ("neutral", backend)
+    elif (cached := sentiment_cache.get(text, backend)) is not None:
+        scored = (cached, backend)
+    elif nlu is None:
+        with instrumentation.timed("sentiment", "keyword"):
+            sentiment = _simple_sentiment(text)
+        sentiment_cache.set(text, backend, sentiment)
+        scored = (sentiment, backend)
+    else:
+        scored = _watson_sentiment(nlu, text)
+    return scored if with_version else scored[0]
 
-        authenticator = IAMAuthenticator(ibm_api_key)
-        nlu = NaturalLanguageUnderstandingV1(
-            version='2022-04-07',
-            authenticator=authenticator
-        )
-        nlu.set_service_url(ibm_nlu_url)
 
-        response = nlu.analyze(
-            text=text,
-            features=Features(sentiment=SentimentOptions(targets=[text]))
-        ).get_result()
+def _watson_sentiment(nlu, text):
+    """Score ``text`` with Watson NLU, caching successes only.
+
+    Returns ``(sentiment, version)``; version is the keyword scorer's when
+    the NLU call failed and the fallback produced the label.
+    """
+    try:
+        from ibm_watson.natural_language_understanding_v1 import Features, SentimentOptions
+
+        with instrumentation.timed("nlu", "analyze"):
+            response = nlu.analyze(
+                text=text,
+                features=Features(sentiment=SentimentOptions(targets=[text]))
+            ).get_result()
 
         sentiment = response["sentiment"]["document"]["label"]
-        return sentiment
+        sentiment_cache.set(text, WATSON_SENTIMENT_VERSION, sentiment)
+        return sentiment, WATSON_SENTIMENT_VERSION
     except Exception as e:
         logger.error(f"IBM Watson NLU error: {e}")
-        return _simple_sentiment(text)
+        return _simple_sentiment(text), KEYWORD_SENTIMENT_VERSION
+
+
+def _get_sentiment_executor():
+    """Return the shared worker pool used for concurrent NLU calls."""
+    global _sentiment_executor
+    if _sentiment_executor is None:
+        with _sentiment_executor_lock:
+            if _sentiment_executor is None:
+                _sentiment_executor = ThreadPoolExecutor(
+                    max_workers=sentiment_max_workers,
+                    thread_name_prefix="sentiment",
+                )
+    return _sentiment_executor
+
+
+def analyze_review_sentiments_many(texts, deadline=None, with_version=False):
+    """Analyze sentiment for a list of texts, preserving order.
+
+    When Watson NLU is configured the texts are scored concurrently on a
+    bounded worker pool. Any text not scored within ``deadline`` seconds
+    falls back to the keyword analyzer, so the total wait is bounded by
+    the deadline rather than by the number of texts. With ``with_version``
+    each item is a ``(sentiment, version)`` pair naming the scorer used.
+    """
+    texts = list(texts)
+    nlu = get_nlu_client()
+    if nlu is None or len(texts) <= 1:
+        scored = [analyze_review_sentiments(text, with_version=True) for text in texts]
+    else:
+        scored = _watson_sentiments_many(nlu, texts, sentiment_deadline if deadline is None else deadline)
+    if with_version:
+        return scored
+    return [sentiment for sentiment, _ in scored]
+
+
+def _watson_sentiments_many(nlu, texts, deadline):
+    scored = []
+    for text in texts:
+        cached = sentiment_cache.get(text, WATSON_SENTIMENT_VERSION) if text else "neutral"
+        scored.append((cached, WATSON_SENTIMENT_VERSION) if cached is not None else None)
+    pending = [i for i, item in enumerate(scored) if item is None]
+    if not pending:
+        return scored
+
+    executor = _get_sentiment_executor()
+    # Run each call in a copy of this context so NLU time counts towards the request
+    futures = {
+        i: executor.submit(contextvars.copy_context().run, _watson_sentiment, nlu, texts[i])
+        for i in pending
+    }
+    wait(futures.values(), timeout=deadline)
+
+    timed_out = 0
+    for i, future in futures.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            scored[i] = future.result()
+        else:
+            future.cancel()
+            timed_out += 1
+            scored[i] = (_simple_sentiment(texts[i]), KEYWORD_SENTIMENT_VERSION)
+    if timed_out:
+        logger.warning(f"Sentiment deadline reached, {timed_out} review(s) scored by fallback")
+    return scored
 
 
 def _simple_sentiment(text):
     """Simple keyword-based sentiment analysis as fallback."""
-    positive_words = [
-        "great", "excellent", "amazing", "fantastic", "wonderful", "good", 
-        "best", "love", "perfect", "outstanding", "superb", "awesome",
-        "happy", "satisfied", "recommend", "helpful", "friendly", "clean"
-    ]
-    negative_words = [
-        "bad", "terrible", "horrible", "awful", "worst", "hate", "poor",
-        "disappointing", "unhappy", "rude", "dirty", "slow", "overpriced",
-        "broken", "failed", "never", "waste", "problem", "issue"
-    ]
-    
-    text_lower = text.lower()
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
-    
-    if positive_count > negative_count:
-        return "positive"
-    elif negative_count > positive_count:
-        return "negative"
-    else:
-        return "neutral"
+    return _keyword_lexicon.label(text)
 
 
 def post_review(endpoint, payload):
-    """Post a review to Cloudant."""
+    """Post a review to Cloudant. Returns None if the request failed."""
     return post_request(endpoint, json_payload=payload)
 
 
+def written_review_id(result):
+    """Return the stored review id from a post_review result, or None if nothing was written."""
+    if not isinstance(result, dict) or result.get("ok") is False:
+        return None
+    status = result.get("status", 200)
+    if not isinstance(status, int) or not 200 <= status < 300:
+        return None
+    return result.get("id") or None
+
+
+def score_review_docs(review_docs):
+    """Fill in sentiment and its version tag on reviews that lack one."""
+    missing = [doc for doc in review_docs if stored_sentiment(doc) is None]
+    if not missing:
+        return
+    scored = analyze_review_sentiments_many([doc.get("review", "") for doc in missing], with_version=True)
+    for doc, (sentiment, version) in zip(missing, scored):
+        doc["sentiment"] = sentiment
+        doc["sentiment_version"] = version
+
+
+def flush_reviews(review_docs):
+    """Write queued reviews upstream.
+
+    Uses one Cloudant ``_bulk_docs`` request when Cloudant is configured,
+    otherwise posts each review to Cloud Functions.
+    """
+    from database import cloudantdb
+
+    if cloudantdb.is_configured():
+        results = cloudantdb.save_reviews(review_docs)
+    else:
+        results = []
+        for doc in review_docs:
+            response = post_review("/api/review", doc)
+            if isinstance(response, dict) and response.get("status") == 409:
+                # The idempotency key was already stored by an earlier flush
+                results.append({"id": doc.get("_id"), "error": "conflict"})
+            else:
+                results.append({"id": doc.get("_id"), "ok": written_review_id(response) is not None})
+    if results:
+        written = {r.get("id") for r in results if r.get("ok") or r.get("rev") or r.get("error") == "conflict"}
+        record_reviews([doc for doc in review_docs if doc.get("_id") in written])
+    return results
+
+
+def get_review_queue(start_worker=True):
+    """Return the process-wide review ingestion queue.
+
+    The background flush worker is started unless ``start_worker`` is False.
+    """
+    global _review_queue
+    if _review_queue is None:
+        with _review_queue_lock:
+            if _review_queue is None:
+                from django.conf import settings
+
+                _review_queue = ReviewQueue(
+                    settings.REVIEW_QUEUE_PATH,
+                    sink=flush_reviews,
+                    scorer=score_review_docs,
+                    batch_size=settings.REVIEW_QUEUE_BATCH_SIZE,
+                    flush_interval=settings.REVIEW_QUEUE_FLUSH_INTERVAL,
+                    lease_timeout=settings.REVIEW_QUEUE_LEASE_TIMEOUT,
+                    done_retention=settings.REVIEW_QUEUE_DONE_RETENTION,
+                )
+    if start_worker:
+        _review_queue.start()
+    return _review_queue
+
+
+def start_review_queue():
+    """Start the review queue worker when the queue is enabled."""
+    from django.conf import settings
+
+    if settings.REVIEW_QUEUE_ENABLED:
+        get_review_queue()
+
+
+def _populate_review_index(index):
+    """Fill an empty index from every stored review; errors are logged."""
+    try:
+        # Another worker sharing the file may have filled it meanwhile
+        if index.count() != 0:
+            return
+        docs = all_review_docs()
+        if docs is None:
+            logger.warning(f"{type(index).__name__} left empty: no review backend answered, run a rebuild")
+            return
+        index.rebuild(docs)
+    except Exception as e:
+        logger.error(f"Populating {type(index).__name__} failed: {e}")
+
+
+def _get_review_index(index_class, path):
+    """Return the process-wide ``index_class`` instance stored at ``path``.
+
+    An empty index is filled from the review backend: inline for the
+    embedded store, in the background for Cloudant.
+    """
+    index = _review_indexes.get(index_class)
+    if index is None:
+        with _review_indexes_lock:
+            index = _review_indexes.get(index_class)
+            if index is None:
+                index = index_class(path)
+                if backend_mode == "local":
+                    _populate_review_index(index)
+                else:
+                    if index.path == ":memory:":
+                        logger.warning(
+                            f"{index_class.__name__} is in memory: each worker keeps its own "
+                            f"copy, built from a full scan of the review backend"
+                        )
+                    if index.count() == 0:
+                        threading.Thread(
+                            target=_populate_review_index, args=(index,),
+                            name=f"{index_class.__name__}-populate", daemon=True,
+                        ).start()
+                _review_indexes[index_class] = index
+    return index
+
+
+def get_review_search():
+    """Return the process-wide full-text review search index."""
+    from django.conf import settings
+
+    return _get_review_index(ReviewSearchIndex, settings.REVIEW_SEARCH_PATH)
+
+
+def index_reviews(review_docs):
+    """Add reviews to the search index; failures are logged, never raised."""
+    try:
+        get_review_search().add(review_docs)
+    except Exception as e:
+        logger.error(f"Review search indexing failed: {e}")
+
+
+def get_review_stats():
+    """Return the process-wide per-dealer review aggregates."""
+    from django.conf import settings
+
+    return _get_review_index(ReviewStats, settings.REVIEW_STATS_PATH)
+
+
+def record_reviews(review_docs):
+    """Feed newly stored reviews to the search index and dealer aggregates."""
+    index_reviews(review_docs)
+    try:
+        get_review_stats().record(review_docs)
+    except Exception as e:
+        logger.error(f"Review aggregate update failed: {e}")
+
+
+def all_review_docs():
+    """Return every stored review from the configured backend.
+
+    Remote mode reads Cloudant when it is configured and the Cloud
+    Functions review endpoint otherwise. Returns None when that backend
+    cannot be read; the development reviews are never substituted.
+    """
+    if backend_mode == "local":
+        return get_local_store().reviews_for_dealer()[0]
+    from database import cloudantdb
+
+    if cloudantdb.is_configured():
+        return cloudantdb.get_all_reviews(mock_fallback=False)
+    request_url = _build_url("/api/review")
+    try:
+        with instrumentation.upstream_call("GET", request_url) as call:
+            response = get_session().get(request_url, timeout=cf_timeout)
+            call["status"] = response.status_code
+        response.raise_for_status()
+        return _review_docs(response.json())
+    except Exception as e:
+        logger.error(f"Network error: {e}")
+        return None
+
+
 def parse_dealer_json(dealer_doc):
     """Parse dealer JSON into CarDealer object."""
     try:
@@ -211,53 +891,14 @@ def parse_dealer_json(dealer_doc):
         return None
 
 
-def _get_mock_data(endpoint, **kwargs):
-    """Return mock data when Cloud Functions are not available."""
-    
-    dealers = [
-        {"id": 1, "full_name": "Sunshine Toyota", "short_name": "Sunshine", "city": "Wichita", "state": "Kansas", "st": "KS", "address": "123 Main St", "zip": "67201", "lat": 37.69, "long": -97.34},
-        {"id": 2, "full_name": "Prairie Ford", "short_name": "Prairie", "city": "Topeka", "state": "Kansas", "st": "KS", "address": "456 Elm Ave", "zip": "66601", "lat": 39.05, "long": -95.68},
-        {"id": 3, "full_name": "Lakeside Honda", "short_name": "Lakeside", "city": "Austin", "state": "Texas", "st": "TX", "address": "789 Oak Blvd", "zip": "73301", "lat": 30.27, "long": -97.74},
-        {"id": 4, "full_name": "Metro Chevrolet", "short_name": "Metro", "city": "Houston", "state": "Texas", "st": "TX", "address": "321 Pine Rd", "zip": "77001", "lat": 29.76, "long": -95.37},
-        {"id": 5, "full_name": "Coastal BMW", "short_name": "Coastal", "city": "Los Angeles", "state": "California", "st": "CA", "address": "654 Sunset Blvd", "zip": "90001", "lat": 34.05, "long": -118.24},
-        {"id": 6, "full_name": "Empire Mercedes", "short_name": "Empire", "city": "New York", "state": "New York", "st": "NY", "address": "987 Fifth Ave", "zip": "10001", "lat": 40.71, "long": -74.01},
-        {"id": 7, "full_name": "Bluegrass Hyundai", "short_name": "Bluegrass", "city": "Overland Park", "state": "Kansas", "st": "KS", "address": "147 West St", "zip": "66204", "lat": 38.98, "long": -94.67},
-        {"id": 8, "full_name": "Gateway VW", "short_name": "Gateway", "city": "Chicago", "state": "Illinois", "st": "IL", "address": "258 Michigan Ave", "zip": "60601", "lat": 41.88, "long": -87.63},
-    ]
-    
-    reviews = [
-        {"id": "r1", "dealership": 1, "name": "John Smith", "purchase": True, "review": "Fantastic services and very friendly staff!", "purchase_date": "2023-10-15", "car_make": "Toyota", "car_model": "Camry", "car_year": 2023},
-        {"id": "r2", "dealership": 1, "name": "Jane Doe", "purchase": False, "review": "Great experience overall. Would recommend!", "purchase_date": "", "car_make": "Toyota", "car_model": "RAV4", "car_year": 2022},
-        {"id": "r3", "dealership": 2, "name": "Bob Johnson", "purchase": True, "review": "Excellent service and fair pricing.", "purchase_date": "2023-09-20", "car_make": "Ford", "car_model": "F-150", "car_year": 2023},
-        {"id": "r4", "dealership": 3, "name": "Alice Williams", "purchase": True, "review": "Amazing dealership! Very helpful team.", "purchase_date": "2023-11-01", "car_make": "Honda", "car_model": "Civic", "car_year": 2023},
-    ]
-    
-    state_filter = kwargs.get("state")
-    
-    if "review" in endpoint or "review" in str(kwargs):
-        # Extract dealer id from URL or kwargs
-        dealer_id = kwargs.get("id", "")
-        if "id=" in endpoint:
-            try:
-                dealer_id = int(endpoint.split("id=")[-1].split("&")[0])
-            except:
-                dealer_id = None
-        filtered_reviews = [r for r in reviews if not dealer_id or r["dealership"] == dealer_id]
-        return filtered_reviews
-    
-    elif "dealership" in endpoint:
-        # Check if filtering by id
-        if "id=" in endpoint:
-            try:
-                dealer_id = int(endpoint.split("id=")[-1].split("&")[0])
-                return [d for d in dealers if d["id"] == dealer_id]
-            except:
-                pass
-        
-        # Filter by state if provided
-        if state_filter:
-            return [d for d in dealers if d["state"].lower() == state_filter.lower() or d["st"].lower() == state_filter.lower()]
-        
-        return dealers
-    
-    return []
+def _load_dealer_directory():
+    return get_request("/api/dealership?list")
+
+
+# Dealer directory served from memory and refreshed in the background
+dealer_directory = DealerDirectory(
+    loader=_load_dealer_directory,
+    parser=parse_dealer_json,
+    ttl=int(os.environ.get("DEALER_DIRECTORY_TTL", "300")),
+    shared_alias=os.environ.get("DEALER_DIRECTORY_CACHE_ALIAS", ""),
+)
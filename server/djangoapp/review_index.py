@@ -0,0 +1,79 @@
+"""
+Shared plumbing for the local SQLite review indexes.
+ReviewSearchIndex and ReviewStats each keep one row per review in a table
+whose triggers maintain derived tables. This base owns the connection,
+the upsert path and the bulk rebuild, which drops the triggers, reloads
+the rows, lets the subclass recompute its derived tables and recreates
+the triggers, all in one transaction so a failed rebuild changes nothing.
+"""
+
+import sqlite3
+import threading
+
+
+def review_doc_id(doc):
+    """Return the stored id of a review document, or None if it has none."""
+    doc_id = doc.get("_id") or doc.get("id")
+    return str(doc_id) if doc_id else None
+
+
+class ReviewIndex:
+    TABLES = ""
+    # Table holding one row per review, and the {name: CREATE TRIGGER} keeping the rest in step
+    TABLE = ""
+    TRIGGERS = {}
+    UPSERT = ""
+
+    def __init__(self, path=":memory:"):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.TABLES + "".join(f"{sql};\n" for sql in self.TRIGGERS.values()))
+
+    @staticmethod
+    def _row(doc):
+        """Return the UPSERT parameters for ``doc``, or None to skip it."""
+        raise NotImplementedError
+
+    def _reindex(self):
+        """Recompute derived tables after a bulk load, inside the rebuild transaction."""
+
+    def upsert(self, docs):
+        """Insert or replace ``docs``; triggers update the derived tables."""
+        rows = [row for row in map(self._row, docs) if row is not None]
+        with self._lock, self._conn:
+            self._conn.executemany(self.UPSERT, rows)
+        return len(rows)
+
+    def rebuild(self, docs, chunk_size=10000):
+        """Replace every row with ``docs``. Returns the count loaded."""
+        count = 0
+        with self._lock, self._conn:
+            # One transaction: a failed rebuild rolls back to the old state,
+            # triggers included (executescript would commit the drop first)
+            self._conn.execute("BEGIN")
+            for name in self.TRIGGERS:
+                self._conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            chunk = []
+            for doc in docs:
+                row = self._row(doc)
+                if row is not None:
+                    chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    self._conn.executemany(self.UPSERT, chunk)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                self._conn.executemany(self.UPSERT, chunk)
+                count += len(chunk)
+            self._reindex()
+            for sql in self.TRIGGERS.values():
+                self._conn.execute(sql)
+        return count
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
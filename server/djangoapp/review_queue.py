@@ -0,0 +1,266 @@
+"""
+Write-behind queue for submitted reviews.
+Reviews are journalled to a local SQLite file and acknowledged right away.
+A background worker scores their sentiment in batches and flushes them
+upstream in bulk, retrying failed writes with backoff. Each review carries
+an idempotency key that is also used as its document id, so a review is
+never stored twice even if it is enqueued or flushed more than once.
+Batches are claimed with a lease in a single UPDATE, so several processes
+sharing one journal never post the same review concurrently; a lease that
+expires (its worker died mid-flush) is claimed again.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+INFLIGHT = "inflight"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_journal (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    created REAL NOT NULL,
+    last_error TEXT,
+    lease_until REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS review_journal_pending
+    ON review_journal (status, next_attempt);
+"""
+
+# Journals created before leasing lack these columns
+LEASE_COLUMNS = {"lease_until": "REAL", "updated": "REAL"}
+
+CLAIM = """
+UPDATE review_journal SET status = ?, lease_until = ?
+WHERE key IN (
+    SELECT key FROM review_journal
+    WHERE (status = ? AND next_attempt <= ?) OR (status = ? AND lease_until <= ?)
+    ORDER BY created LIMIT ?
+)
+RETURNING key, payload, attempts, created
+"""
+
+
+# Client-supplied idempotency keys; anything else is rejected before it reaches a document id
+IDEMPOTENCY_KEY = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+def new_idempotency_key():
+    return f"review-{uuid.uuid4().hex}"
+
+
+def scoped_idempotency_key(key, scope):
+    """Return the document id for a client idempotency ``key`` sent by ``scope``.
+
+    Hashing the key with its sender keeps ids inside the ``review-``
+    namespace and stops one user's key from colliding with another's.
+    Raises ValueError for an empty, overlong or non-alphanumeric key.
+    """
+    if not isinstance(key, str) or not IDEMPOTENCY_KEY.fullmatch(key):
+        raise ValueError("Idempotency key must be 1-128 letters, digits, '.', '_', ':' or '-'")
+    digest = hashlib.sha256(f"{scope}:{key}".encode("utf-8")).hexdigest()
+    return f"review-{digest}"
+
+
+class ReviewQueue:
+    def __init__(self, path, sink, scorer=None, batch_size=50, flush_interval=1.0,
+                 max_attempts=5, retry_backoff=2.0, lease_timeout=300.0, done_retention=86400.0):
+        self.path = str(path)
+        self.sink = sink
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_timeout = lease_timeout
+        self.done_retention = done_retention
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(review_journal)")}
+        for name, kind in LEASE_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE review_journal ADD COLUMN {name} {kind}")
+        self._conn.commit()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+    def enqueue(self, review, key=None):
+        """Journal ``review`` for delivery and return its idempotency key.
+
+        Enqueuing the same key twice keeps the first submission. Keys
+        starting with ``_`` are reserved Cloudant ids and raise ValueError.
+        """
+        key = key or new_idempotency_key()
+        if key.startswith("_"):
+            raise ValueError(f"Reserved document id {key!r}")
+        review = dict(review, _id=key)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO review_journal (key, payload, status, next_attempt, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(review), PENDING, now, now),
+            )
+        self._wakeup.set()
+        return key
+
+    def _claim(self):
+        """Lease up to ``batch_size`` ready reviews to this worker."""
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                CLAIM, (INFLIGHT, now + self.lease_timeout, PENDING, now, INFLIGHT, now, self.batch_size)
+            ).fetchall()
+        # RETURNING does not follow the subquery's ORDER BY
+        rows.sort(key=lambda row: row[3])
+        return [(key, json.loads(payload), attempts) for key, payload, attempts, _ in rows]
+
+    def _mark_done(self, keys):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE review_journal SET status = ?, last_error = NULL, lease_until = NULL, updated = ? "
+                "WHERE key = ?",
+                [(DONE, now, key) for key in keys],
+            )
+
+    def _mark_retry(self, entries, error):
+        now = time.time()
+        updates = []
+        for key, _, attempts in entries:
+            attempts += 1
+            status = FAILED if attempts >= self.max_attempts else PENDING
+            delay = self.retry_backoff * (2 ** (attempts - 1))
+            updates.append((status, attempts, now + delay, str(error), now, key))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE review_journal SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, "
+                "lease_until = NULL, updated = ? WHERE key = ?",
+                updates,
+            )
+
+    def prune(self, older_than=None):
+        """Delete delivered reviews finished more than ``older_than`` seconds ago.
+
+        Defaults to ``done_retention``; until then a re-submitted key is
+        still recognised as a duplicate. Returns the count deleted.
+        """
+        older_than = self.done_retention if older_than is None else older_than
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM review_journal WHERE status = ? AND updated <= ?",
+                (DONE, time.time() - older_than),
+            )
+        return cursor.rowcount
+
+    def process_batch(self):
+        """Score and flush one batch. Returns the number of reviews handled."""
+        entries = self._claim()
+        if not entries:
+            return 0
+
+        docs = [doc for _, doc, _ in entries]
+        if self.scorer is not None:
+            try:
+                self.scorer(docs)
+            except Exception as e:
+                logger.error(f"Review scoring failed, flushing unscored: {e}")
+
+        try:
+            results = self.sink(docs)
+        except Exception as e:
+            logger.error(f"Review flush failed: {e}")
+            results = None
+        if results is None:
+            self._mark_retry(entries, "flush failed")
+            return len(entries)
+
+        by_key = {result.get("id"): result for result in results if isinstance(result, dict)}
+        done, retry = [], []
+        for entry in entries:
+            result = by_key.get(entry[0], {})
+            # A conflict means this key was already written by an earlier flush
+            if result.get("ok") or result.get("rev") or result.get("error") == "conflict":
+                done.append(entry[0])
+            else:
+                retry.append(entry)
+        if done:
+            self._mark_done(done)
+        if retry:
+            self._mark_retry(retry, "write rejected")
+        return len(entries)
+
+    def drain(self):
+        """Process batches until nothing is ready. Returns the count handled."""
+        handled = 0
+        while True:
+            count = self.process_batch()
+            if not count:
+                return handled
+            handled += count
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM review_journal GROUP BY status"
+            ).fetchall()
+        counts = {PENDING: 0, INFLIGHT: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def start(self):
+        """Start the background flush worker if it is not running."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="review-queue", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                handled = self.process_batch()
+            except Exception as e:
+                logger.error(f"Review queue worker error: {e}")
+                handled = 0
+            if not handled:
+                self._prune_periodically()
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+
+    def _prune_periodically(self):
+        now = time.time()
+        if now - self._last_prune < min(self.done_retention, 3600):
+            return
+        self._last_prune = now
+        try:
+            self.prune()
+        except Exception as e:
+            logger.error(f"Review queue prune failed: {e}")
@@ -0,0 +1,148 @@
+"""
+Full-text review search on a local SQLite FTS5 index.
+Review documents are stored in a plain table that carries the filter
+columns, and an external-content FTS5 table indexes the review text, car
+make, model and year. Triggers keep the two in step for incremental
+updates; a rebuild loads documents without triggers and reindexes once.
+"""
+
+import re
+import sqlite3
+
+from .review_index import ReviewIndex, review_doc_id
+
+DOC_COLUMNS = ["doc_id", "dealership", "sentiment", "name", "purchase", "purchase_date",
+               "review", "car_make", "car_model", "car_year"]
+TEXT_COLUMNS = ["review", "car_make", "car_model", "car_year"]
+# bm25 weights for TEXT_COLUMNS; make and model hits rank above body text
+COLUMN_WEIGHTS = (1.0, 2.0, 2.0, 1.5)
+
+TABLES = f"""
+CREATE TABLE IF NOT EXISTS review_docs (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT UNIQUE NOT NULL,
+    dealership INTEGER,
+    sentiment TEXT,
+    name TEXT,
+    purchase INTEGER,
+    purchase_date TEXT,
+    review TEXT,
+    car_make TEXT,
+    car_model TEXT,
+    car_year TEXT
+);
+CREATE INDEX IF NOT EXISTS review_docs_filters ON review_docs (dealership, sentiment);
+CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(
+    {", ".join(TEXT_COLUMNS)}, content='review_docs', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+_old = ", ".join(f"old.{c}" for c in TEXT_COLUMNS)
+_new = ", ".join(f"new.{c}" for c in TEXT_COLUMNS)
+TRIGGERS = {
+    "review_docs_ai": f"""CREATE TRIGGER IF NOT EXISTS review_docs_ai AFTER INSERT ON review_docs BEGIN
+    INSERT INTO review_fts (rowid, {", ".join(TEXT_COLUMNS)}) VALUES (new.id, {_new});
+END""",
+    "review_docs_ad": f"""CREATE TRIGGER IF NOT EXISTS review_docs_ad AFTER DELETE ON review_docs BEGIN
+    INSERT INTO review_fts (review_fts, rowid, {", ".join(TEXT_COLUMNS)}) VALUES ('delete', old.id, {_old});
+END""",
+    "review_docs_au": f"""CREATE TRIGGER IF NOT EXISTS review_docs_au AFTER UPDATE ON review_docs BEGIN
+    INSERT INTO review_fts (review_fts, rowid, {", ".join(TEXT_COLUMNS)}) VALUES ('delete', old.id, {_old});
+    INSERT INTO review_fts (rowid, {", ".join(TEXT_COLUMNS)}) VALUES (new.id, {_new});
+END""",
+}
+
+UPSERT = (
+    f"INSERT INTO review_docs ({', '.join(DOC_COLUMNS)}) VALUES ({', '.join('?' * len(DOC_COLUMNS))}) "
+    "ON CONFLICT (doc_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in DOC_COLUMNS[1:])
+)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query matching every term.
+
+    Terms are quoted so user input cannot inject FTS5 syntax, and the last
+    term matches as a prefix unless the query ends in whitespace.
+    """
+    terms = _TERM.findall(query or "")
+    if not terms:
+        return None
+    parts = [f'"{term}"' for term in terms]
+    if not query[-1].isspace():
+        parts[-1] += "*"
+    return " ".join(parts)
+
+
+def _row(doc):
+    doc_id = review_doc_id(doc)
+    if doc_id is None:
+        return None
+    try:
+        dealership = int(doc.get("dealership"))
+    except (TypeError, ValueError):
+        dealership = None
+    sentiment = doc.get("sentiment") or None
+    return (
+        doc_id, dealership, sentiment, doc.get("name", ""), 1 if doc.get("purchase") else 0,
+        doc.get("purchase_date", ""), doc.get("review", ""), doc.get("car_make", ""),
+        doc.get("car_model", ""), str(doc.get("car_year", "") or ""),
+    )
+
+
+class ReviewSearchIndex(ReviewIndex):
+    TABLES = TABLES
+    TABLE = "review_docs"
+    TRIGGERS = TRIGGERS
+    UPSERT = UPSERT
+    _row = staticmethod(_row)
+
+    def __init__(self, path=":memory:"):
+        super().__init__(path)
+        self._conn.row_factory = sqlite3.Row
+
+    def add(self, docs):
+        """Index or reindex ``docs``, keyed by their ``_id``/``id``; docs without one are skipped."""
+        return self.upsert(docs)
+
+    def _reindex(self):
+        self._conn.execute("INSERT INTO review_fts (review_fts) VALUES ('rebuild')")
+
+    def search(self, query, sentiment=None, dealer_id=None, limit=20, offset=0):
+        """Return ``(results, next_offset)`` ranked best match first.
+
+        ``next_offset`` is None on the last page.
+        """
+        match = match_expression(query)
+        if match is None:
+            return [], None
+        weights = ", ".join(str(w) for w in COLUMN_WEIGHTS)
+        sql = (
+            f"SELECT d.doc_id, d.dealership, d.sentiment, d.name, d.purchase, d.purchase_date, "
+            f"d.review, d.car_make, d.car_model, d.car_year, bm25(review_fts, {weights}) AS rank, "
+            f"snippet(review_fts, 0, '[', ']', '...', 12) AS snippet "
+            f"FROM review_fts JOIN review_docs d ON d.id = review_fts.rowid "
+            f"WHERE review_fts MATCH ?"
+        )
+        params = [match]
+        if sentiment:
+            sql += " AND d.sentiment = ?"
+            params.append(sentiment)
+        if dealer_id is not None:
+            sql += " AND d.dealership = ?"
+            params.append(int(dealer_id))
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit + 1, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = []
+        for row in rows[:limit]:
+            result = dict(row)
+            result["id"] = result.pop("doc_id")
+            result["purchase"] = bool(result["purchase"])
+            result["score"] = round(-result.pop("rank"), 6)
+            results.append(result)
+        return results, (offset + limit if len(rows) > limit else None)
@@ -0,0 +1,181 @@
+"""
+Maintained per-dealer review aggregates.
+Each stored review contributes one row of facts (dealer, sentiment,
+purchase, make, year). Triggers on that table keep the per-dealer totals
+and make/year counts current, so recording a review is a constant-time
+upsert and recording it again with new values replaces its contribution
+instead of counting it twice. ``rebuild`` recomputes everything in bulk.
+"""
+
+from .review_index import ReviewIndex, review_doc_id
+
+SENTIMENTS = ("positive", "negative", "neutral")
+FACETS = ("car_make", "car_year")
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS review_facts (
+    doc_id TEXT PRIMARY KEY,
+    dealership INTEGER NOT NULL,
+    sentiment TEXT,
+    purchase INTEGER NOT NULL,
+    car_make TEXT NOT NULL,
+    car_year TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dealer_review_stats (
+    dealership INTEGER PRIMARY KEY,
+    reviews INTEGER NOT NULL,
+    purchases INTEGER NOT NULL,
+    positive INTEGER NOT NULL,
+    negative INTEGER NOT NULL,
+    neutral INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dealer_review_facets (
+    dealership INTEGER NOT NULL,
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dealership, facet, value)
+);
+"""
+
+
+def _add(row):
+    """Trigger statements adding the contribution of ``row`` (new or old)."""
+    sentiments = ", ".join(f"IFNULL({row}.sentiment = '{s}', 0)" for s in SENTIMENTS)
+    facets = "".join(
+        f"""
+    INSERT INTO dealer_review_facets (dealership, facet, value, count)
+        SELECT {row}.dealership, '{facet}', {row}.{facet}, 1 WHERE {row}.{facet} <> ''
+        ON CONFLICT (dealership, facet, value) DO UPDATE SET count = count + 1;"""
+        for facet in FACETS
+    )
+    return f"""
+    INSERT INTO dealer_review_stats (dealership, reviews, purchases, {", ".join(SENTIMENTS)})
+        VALUES ({row}.dealership, 1, {row}.purchase, {sentiments})
+        ON CONFLICT (dealership) DO UPDATE SET
+            reviews = reviews + 1, purchases = purchases + excluded.purchases,
+            {", ".join(f"{s} = {s} + excluded.{s}" for s in SENTIMENTS)};{facets}"""
+
+
+def _remove(row):
+    """Trigger statements removing the contribution of ``row``."""
+    sentiments = ", ".join(f"{s} = {s} - IFNULL({row}.sentiment = '{s}', 0)" for s in SENTIMENTS)
+    return f"""
+    UPDATE dealer_review_stats SET reviews = reviews - 1, purchases = purchases - {row}.purchase, {sentiments}
+        WHERE dealership = {row}.dealership;
+    DELETE FROM dealer_review_stats WHERE dealership = {row}.dealership AND reviews <= 0;
+    UPDATE dealer_review_facets SET count = count - 1
+        WHERE dealership = {row}.dealership AND (
+            (facet = 'car_make' AND value = {row}.car_make) OR (facet = 'car_year' AND value = {row}.car_year));
+    DELETE FROM dealer_review_facets WHERE dealership = {row}.dealership AND count <= 0;"""
+
+
+TRIGGERS = {
+    "review_facts_ai": f"""CREATE TRIGGER IF NOT EXISTS review_facts_ai AFTER INSERT ON review_facts BEGIN{_add("new")}
+END""",
+    "review_facts_ad": f"""CREATE TRIGGER IF NOT EXISTS review_facts_ad AFTER DELETE ON review_facts BEGIN{_remove("old")}
+END""",
+    "review_facts_au": f"""CREATE TRIGGER IF NOT EXISTS review_facts_au AFTER UPDATE ON review_facts BEGIN{_remove("old")}{_add("new")}
+END""",
+}
+
+UPSERT = (
+    "INSERT INTO review_facts (doc_id, dealership, sentiment, purchase, car_make, car_year) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (doc_id) DO UPDATE SET dealership = excluded.dealership, sentiment = excluded.sentiment, "
+    "purchase = excluded.purchase, car_make = excluded.car_make, car_year = excluded.car_year"
+)
+
+RECOMPUTE = f"""
+DELETE FROM dealer_review_stats;
+DELETE FROM dealer_review_facets;
+INSERT INTO dealer_review_stats (dealership, reviews, purchases, {", ".join(SENTIMENTS)})
+    SELECT dealership, COUNT(*), SUM(purchase), {", ".join(f"SUM(IFNULL(sentiment = '{s}', 0))" for s in SENTIMENTS)}
+    FROM review_facts GROUP BY dealership;
+""" + "".join(
+    f"""
+INSERT INTO dealer_review_facets (dealership, facet, value, count)
+    SELECT dealership, '{facet}', {facet}, COUNT(*) FROM review_facts WHERE {facet} <> ''
+    GROUP BY dealership, {facet};"""
+    for facet in FACETS
+)
+
+
+def _row(doc):
+    """Return the facts tuple for ``doc``, or None if it has no review or dealer id."""
+    doc_id = review_doc_id(doc)
+    if doc_id is None:
+        return None
+    try:
+        dealership = int(doc.get("dealership"))
+    except (TypeError, ValueError):
+        return None
+    sentiment = doc.get("sentiment")
+    return (
+        doc_id,
+        dealership,
+        sentiment if sentiment in SENTIMENTS else None,
+        1 if doc.get("purchase") else 0,
+        str(doc.get("car_make") or ""),
+        str(doc.get("car_year") or ""),
+    )
+
+
+def _empty(dealer_id):
+    return {
+        "dealer_id": dealer_id,
+        "reviews": 0,
+        "sentiment": dict.fromkeys(SENTIMENTS + ("unscored",), 0),
+        "purchase_ratio": 0.0,
+        "car_makes": {},
+        "car_years": {},
+    }
+
+
+class ReviewStats(ReviewIndex):
+    TABLES = TABLES
+    TABLE = "review_facts"
+    TRIGGERS = TRIGGERS
+    UPSERT = UPSERT
+    _row = staticmethod(_row)
+
+    def record(self, docs):
+        """Add or replace the contribution of each review in ``docs``."""
+        return self.upsert(docs)
+
+    def _reindex(self):
+        for statement in RECOMPUTE.split(";"):
+            if statement.strip():
+                self._conn.execute(statement)
+
+    def is_empty(self):
+        return self.count() == 0
+
+    def get_many(self, dealer_ids):
+        """Return ``{dealer_id: aggregate}`` for every id in ``dealer_ids``."""
+        ids = [int(dealer_id) for dealer_id in dealer_ids]
+        result = {dealer_id: _empty(dealer_id) for dealer_id in ids}
+        if not ids:
+            return result
+        placeholders = ", ".join("?" * len(ids))
+        with self._lock:
+            totals = self._conn.execute(
+                f"SELECT dealership, reviews, purchases, {', '.join(SENTIMENTS)} "
+                f"FROM dealer_review_stats WHERE dealership IN ({placeholders})", ids
+            ).fetchall()
+            facets = self._conn.execute(
+                f"SELECT dealership, facet, value, count FROM dealer_review_facets "
+                f"WHERE dealership IN ({placeholders}) ORDER BY count DESC, value", ids
+            ).fetchall()
+
+        for dealership, reviews, purchases, *counts in totals:
+            stats = result[dealership]
+            stats["reviews"] = reviews
+            stats["sentiment"] = dict(zip(SENTIMENTS, counts), unscored=reviews - sum(counts))
+            stats["purchase_ratio"] = round(purchases / reviews, 4) if reviews else 0.0
+        for dealership, facet, value, count in facets:
+            result[dealership]["car_makes" if facet == "car_make" else "car_years"][value] = count
+        return result
+
+    def get(self, dealer_id):
+        return self.get_many([dealer_id])[int(dealer_id)]
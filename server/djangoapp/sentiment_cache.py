@@ -0,0 +1,113 @@
+"""
+Content-addressed cache for review sentiment results.
+Entries are keyed by a hash of the normalised text and the backend that
+produced them, kept in a bounded in-process LRU with a TTL and optionally
+mirrored to a Django cache so all workers share results.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(text, backend):
+    """Build the cache key for ``text`` scored by ``backend``."""
+    normalised = " ".join(text.lower().split())
+    digest = hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+    return f"sentiment:{backend}:{digest}"
+
+
+class SentimentCache:
+    def __init__(self, max_size=10000, ttl=86400, shared_alias=""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def _shared(self):
+        if not self.shared_alias:
+            return None
+        try:
+            from django.core.cache import caches
+            return caches[self.shared_alias]
+        except Exception as e:
+            logger.error(f"Shared sentiment cache unavailable: {e}")
+            return None
+
+    def get(self, text, backend):
+        """Return the cached sentiment for ``text`` or None."""
+        key = make_key(text, backend)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        shared = self._shared()
+        if shared is not None:
+            try:
+                value = shared.get(key)
+            except Exception as e:
+                logger.error(f"Shared sentiment cache error: {e}")
+                value = None
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text, backend, value):
+        """Store ``value`` as the sentiment of ``text`` under ``backend``."""
+        key = make_key(text, backend)
+        self._store(key, value)
+        shared = self._shared()
+        if shared is not None:
+            try:
+                shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.error(f"Shared sentiment cache error: {e}")
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared_hits = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,138 @@
+"""
+Deterministic synthetic data for load testing.
+Every generator yields records lazily so millions of rows can be streamed
+into a store without holding them in memory.
+"""
+
+import random
+
+from .car_catalog import car_catalog
+from .models import CarMake, CarModel
+
+STATES = [
+    ("Alabama", "AL"), ("Arizona", "AZ"), ("California", "CA"), ("Colorado", "CO"),
+    ("Florida", "FL"), ("Georgia", "GA"), ("Illinois", "IL"), ("Kansas", "KS"),
+    ("Michigan", "MI"), ("Minnesota", "MN"), ("Missouri", "MO"), ("Nevada", "NV"),
+    ("New York", "NY"), ("North Carolina", "NC"), ("Ohio", "OH"), ("Oregon", "OR"),
+    ("Pennsylvania", "PA"), ("Tennessee", "TN"), ("Texas", "TX"), ("Washington", "WA"),
+]
+CITY_PARTS = ["Spring", "Lake", "River", "Oak", "Pine", "Maple", "Cedar", "Fair", "Green", "Mill"]
+CITY_SUFFIXES = ["field", "ville", "ton", "wood", "view", "dale", "port", " City", " Falls", " Park"]
+STREETS = ["Main St", "Oak Ave", "Elm St", "Park Blvd", "Sunset Blvd", "Pine Rd", "Lake Dr", "Hill Rd"]
+FIRST_NAMES = ["Alex", "Maria", "James", "Priya", "Chen", "Fatima", "Lucas", "Emma", "Noah", "Aisha"]
+LAST_NAMES = ["Smith", "Garcia", "Johnson", "Patel", "Wang", "Okafor", "Brown", "Martin", "Lee", "Khan"]
+OPENERS = ["The staff were", "Overall the visit was", "Service was", "My salesperson was", "The whole process was"]
+POSITIVE = ["great", "excellent", "friendly", "helpful", "professional", "fast", "honest", "smooth"]
+NEGATIVE = ["slow", "rude", "disappointing", "overpriced", "poor", "terrible", "frustrating", "dirty"]
+FILLER = [
+    "and the car was ready on time.", "but the paperwork took a while.", "and I would come back.",
+    "although parking was hard to find.", "and financing was explained clearly.",
+]
+CAR_TYPES = [code for code, _ in CarModel.CAR_TYPES]
+MIN_YEAR, MAX_YEAR = 2015, 2023
+
+
+def generate_dealers(count, seed=0, start_id=1):
+    """Yield ``count`` dealer documents."""
+    rng = random.Random(seed)
+    for dealer_id in range(start_id, start_id + count):
+        state, st = rng.choice(STATES)
+        city = rng.choice(CITY_PARTS) + rng.choice(CITY_SUFFIXES)
+        name = f"{city} {rng.choice(LAST_NAMES)} Motors"
+        yield {
+            "id": dealer_id,
+            "full_name": name,
+            "short_name": city,
+            "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+            "city": city,
+            "state": state,
+            "st": st,
+            "zip": f"{rng.randint(10000, 99999)}",
+            "lat": round(rng.uniform(25.0, 49.0), 5),
+            "long": round(rng.uniform(-124.0, -67.0), 5),
+        }
+
+
+def review_text(rng, sentences=1):
+    parts = []
+    for _ in range(sentences):
+        words = POSITIVE if rng.random() < 0.7 else NEGATIVE
+        parts.append(f"{rng.choice(OPENERS)} {rng.choice(words)} {rng.choice(FILLER)}")
+    return " ".join(parts)
+
+
+def generate_reviews(count, dealer_count, makes=None, seed=0, with_sentiment=False):
+    """Yield ``count`` review documents spread over ``dealer_count`` dealers.
+
+    ``makes`` maps make names to lists of model names. Reviews are left
+    without sentiment unless ``with_sentiment`` is set, so the read path
+    exercises scoring.
+    """
+    rng = random.Random(seed)
+    makes = makes or {"Toyota": ["Camry"], "Ford": ["F-150"], "Honda": ["Civic"]}
+    make_names = list(makes)
+    for i in range(count):
+        make = rng.choice(make_names)
+        purchase = rng.random() < 0.6
+        doc = {
+            "id": f"syn-{seed}-{i}",
+            "dealership": rng.randint(1, max(dealer_count, 1)),
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "purchase": purchase,
+            "review": review_text(rng, sentences=rng.randint(1, 4)),
+            "purchase_date": f"{rng.randint(MIN_YEAR, MAX_YEAR)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" if purchase else "",
+            "car_make": make,
+            "car_model": rng.choice(makes[make]),
+            "car_year": rng.randint(MIN_YEAR, MAX_YEAR),
+        }
+        if with_sentiment:
+            doc["sentiment"] = "positive" if any(w in doc["review"] for w in POSITIVE) else "negative"
+        yield doc
+
+
+def generate_catalog(make_count, models_per_make, seed=0):
+    """Return ``{make name: [model names]}`` for a synthetic catalog."""
+    rng = random.Random(seed)
+    catalog = {}
+    for m in range(make_count):
+        make = f"Make{m:05d}"
+        catalog[make] = [f"{make}-M{rng.randint(100, 999)}-{n}" for n in range(models_per_make)]
+    return catalog
+
+
+def load_catalog(catalog, seed=0, dealer_count=0, batch_size=1000):
+    """Insert a synthetic catalog into the Django database in bulk.
+
+    Returns ``(makes created, models created)``.
+    """
+    rng = random.Random(seed)
+    existing = set(CarMake.objects.filter(name__in=list(catalog)).values_list("name", flat=True))
+    CarMake.objects.bulk_create(
+        [CarMake(name=name, description="Synthetic make") for name in catalog if name not in existing],
+        batch_size=batch_size,
+    )
+    make_ids = dict(CarMake.objects.filter(name__in=list(catalog)).values_list("name", "id"))
+
+    created = 0
+    batch = []
+    for make, models in catalog.items():
+        if make in existing:
+            continue
+        for name in models:
+            batch.append(CarModel(
+                car_make_id=make_ids[make],
+                name=name,
+                car_type=rng.choice(CAR_TYPES),
+                year=rng.randint(MIN_YEAR, MAX_YEAR),
+                dealer_id=rng.randint(1, dealer_count) if dealer_count else None,
+            ))
+            if len(batch) >= batch_size:
+                CarModel.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+    if batch:
+        CarModel.objects.bulk_create(batch)
+        created += len(batch)
+    # bulk_create sends no post_save signals
+    car_catalog.invalidate()
+    return len(catalog) - len(existing), created
@@ -1,8 +1,36 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+import asyncio
 import json
+import pickle
+import threading
+import requests
+import time
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from contextlib import contextmanager
+from unittest import mock, skipUnless
 from .models import CarMake, CarModel
+from . import restapis, views
+from database import cloudantdb
+from database.localstore import LocalStore, _iter_json_array, iter_json_records
+import os
+import tempfile
+from .sentiment_cache import SentimentCache, make_key
+from .dealer_directory import DealerDirectory
+from .geo_index import GeoIndex, haversine_km
+from .review_queue import ReviewQueue, scoped_idempotency_key
+from .review_search import ReviewSearchIndex, match_expression
+from .review_stats import ReviewStats
+from .records import RecordColumns, dumps_record, dumps_records, iter_json_rows
+from . import instrumentation, loadtest, microbench, records, synthetic
+from .car_catalog import car_catalog
+from .catalog_seed import import_catalog, seed_records
+from sentiment_analyzer.lexicon import Lexicon, tokenize
+from sentiment_analyzer import sentiment_analyzer
 
 
 class CarMakeModelTest(TestCase):
@@ -137,3 +165,1310 @@ class DealerViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.content)
         self.assertEqual(data['status'], 400)
+
+
+class RestApisTest(TestCase):
+    def test_session_is_shared(self):
+        self.assertIs(restapis.get_session(), restapis.get_session())
+
+    def test_reset_session(self):
+        first = restapis.get_session()
+        restapis.reset_session()
+        self.assertIsNot(first, restapis.get_session())
+
+    def test_pool_stats(self):
+        restapis.get_session()
+        stats = restapis.get_pool_stats()
+        for key in ('hosts', 'requests', 'hits', 'misses'):
+            self.assertIn(key, stats)
+
+    def test_pool_stats_are_exported(self):
+        stats = {'hosts': 1, 'requests': 5, 'hits': 3, 'misses': 2}
+        with mock.patch.object(restapis, 'get_pool_stats', return_value=stats):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('djangoapp_upstream_pool_requests_total{result="hit"} 3', body)
+        self.assertIn('djangoapp_upstream_pool_requests_total{result="miss"} 2', body)
+        self.assertIn('djangoapp_upstream_pool_hosts 1', body)
+
+
+class SentimentBatchTest(TestCase):
+    def setUp(self):
+        restapis.sentiment_cache.clear()
+
+    def test_many_without_nlu_uses_keywords(self):
+        result = restapis.analyze_review_sentiments_many(['Great staff', 'Rude and slow', ''])
+        self.assertEqual(result, ['positive', 'negative', 'neutral'])
+
+    def test_many_falls_back_after_deadline(self):
+        def slow(text):
+            time.sleep(0.5)
+            return 'neutral'
+
+        with mock.patch.object(restapis, 'get_nlu_client', return_value=object()), \
+                mock.patch.object(restapis, '_watson_sentiment',
+                                  side_effect=lambda nlu, text: (slow(text), restapis.WATSON_SENTIMENT_VERSION)):
+            result = restapis.analyze_review_sentiments_many(['Great staff', 'Rude staff'], deadline=0.05,
+                                                              with_version=True)
+        self.assertEqual(result, [('positive', restapis.KEYWORD_SENTIMENT_VERSION),
+                                  ('negative', restapis.KEYWORD_SENTIMENT_VERSION)])
+
+    def test_watson_failure_is_tagged_as_keyword(self):
+        nlu = mock.Mock()
+        nlu.analyze.side_effect = RuntimeError('quota exceeded')
+        docs = [{'review': 'Great staff'}, {'review': 'Rude staff'}]
+        with mock.patch.object(restapis, 'get_nlu_client', return_value=nlu):
+            restapis.score_review_docs(docs)
+        self.assertEqual([d['sentiment'] for d in docs], ['positive', 'negative'])
+        self.assertEqual({d['sentiment_version'] for d in docs}, {restapis.KEYWORD_SENTIMENT_VERSION})
+
+    def test_add_review_tags_the_scorer_used(self):
+        nlu = mock.Mock()
+        nlu.analyze.side_effect = RuntimeError('quota exceeded')
+        User.objects.create_user(username='rater', password='pw')
+        self.client.login(username='rater', password='pw')
+        with mock.patch.object(restapis, 'get_nlu_client', return_value=nlu), \
+                mock.patch.object(views, 'post_review', return_value={'status': 200, 'id': 'r1'}) as post, \
+                mock.patch.object(views, 'record_reviews'):
+            self.client.post('/djangoapp/add_review', data=json.dumps({'dealership': 1, 'review': 'Great staff'}),
+                             content_type='application/json')
+        self.assertEqual(post.call_args[0][1]['sentiment_version'], restapis.KEYWORD_SENTIMENT_VERSION)
+
+
+class NluClientTest(TestCase):
+    def test_no_client_without_credentials(self):
+        with mock.patch.object(restapis, 'ibm_api_key', ''):
+            self.assertIsNone(restapis.get_nlu_client())
+            self.assertFalse(restapis.warm_up_nlu())
+
+    def test_client_is_reused(self):
+        sentinel = object()
+        with mock.patch.object(restapis, 'ibm_api_key', 'key'), \
+                mock.patch.object(restapis, 'ibm_nlu_url', 'http://nlu'), \
+                mock.patch.object(restapis, '_nlu_client', sentinel):
+            self.assertIs(restapis.get_nlu_client(), sentinel)
+            self.assertIs(restapis.get_nlu_client(), sentinel)
+
+
+class SentimentCacheTest(TestCase):
+    def test_key_normalises_text(self):
+        self.assertEqual(make_key('Great  Staff ', 'keyword'), make_key('great staff', 'keyword'))
+        self.assertNotEqual(make_key('great staff', 'keyword'), make_key('great staff', 'watson'))
+
+    def test_hit_and_miss(self):
+        cache = SentimentCache(max_size=10, ttl=60)
+        self.assertIsNone(cache.get('good', 'keyword'))
+        cache.set('good', 'keyword', 'positive')
+        self.assertEqual(cache.get('good', 'keyword'), 'positive')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_lru_eviction(self):
+        cache = SentimentCache(max_size=2, ttl=60)
+        cache.set('a', 'keyword', 'neutral')
+        cache.set('b', 'keyword', 'neutral')
+        cache.get('a', 'keyword')
+        cache.set('c', 'keyword', 'neutral')
+        self.assertIsNone(cache.get('b', 'keyword'))
+        self.assertEqual(cache.get('a', 'keyword'), 'neutral')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        cache = SentimentCache(max_size=10, ttl=0)
+        cache.set('good', 'keyword', 'positive')
+        self.assertIsNone(cache.get('good', 'keyword'))
+
+    def test_shared_backend(self):
+        cache = SentimentCache(max_size=10, ttl=60, shared_alias='default')
+        cache.set('good', 'keyword', 'positive')
+        other = SentimentCache(max_size=10, ttl=60, shared_alias='default')
+        self.assertEqual(other.get('good', 'keyword'), 'positive')
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+
+class StoredSentimentTest(TestCase):
+    def test_read_trusts_stored_sentiment(self):
+        docs = [
+            {'id': 'a', 'dealership': 1, 'review': 'Great staff', 'sentiment': 'negative'},
+            {'id': 'b', 'dealership': 1, 'review': 'Great staff'},
+        ]
+        with mock.patch.object(restapis, 'get_request', return_value=docs), \
+                mock.patch.object(restapis, 'analyze_review_sentiments_many',
+                                  return_value=['positive']) as scorer:
+            reviews = restapis.get_dealer_reviews_from_cf('/api/review?id=1')
+        scorer.assert_called_once_with(['Great staff'])
+        self.assertEqual([r.sentiment for r in reviews], ['negative', 'positive'])
+
+    def test_backfill_scores_missing_reviews(self):
+        docs = [
+            {'_id': 'a', 'review': 'Rude staff'},
+            {'_id': 'b', 'review': 'Great staff', 'sentiment': 'positive'},
+        ]
+        out = StringIO()
+        with mock.patch('database.cloudantdb.get_all_reviews', return_value=docs), \
+                mock.patch('database.cloudantdb.update_reviews', return_value=[]) as update:
+            call_command('backfill_sentiment', stdout=out)
+        written = update.call_args[0][0]
+        self.assertEqual(len(written), 1)
+        self.assertEqual(written[0]['sentiment'], 'negative')
+        self.assertEqual(written[0]['sentiment_version'], restapis.KEYWORD_SENTIMENT_VERSION)
+        self.assertIn('1 review(s)', out.getvalue())
+
+
+class LexiconTest(TestCase):
+    def setUp(self):
+        self.lexicon = Lexicon({'good': 1, 'excellent': 2}, {'bad': 1, 'never': 1})
+
+    def test_tokenize_keeps_contractions(self):
+        self.assertEqual(tokenize("Wasn’t GOOD, at-all"), ["wasn't", 'good', 'at', 'all'])
+
+    def test_matches_whole_words_only(self):
+        self.assertEqual(self.lexicon.label('Goodbye and thanks'), 'neutral')
+
+    def test_negation_flips_polarity(self):
+        score = self.lexicon.score('The service was not good')
+        self.assertEqual(score.label, 'negative')
+        self.assertEqual(score.negative_hits, 1)
+
+    def test_weighted_terms(self):
+        self.assertEqual(self.lexicon.label('Excellent car but bad coffee'), 'positive')
+
+    def test_score_many_preserves_order(self):
+        labels = [s.label for s in self.lexicon.score_many(['good', 'bad', '', None])]
+        self.assertEqual(labels, ['positive', 'negative', 'neutral', 'neutral'])
+
+    def test_simple_sentiment_uses_lexicon(self):
+        self.assertEqual(restapis._simple_sentiment('Not helpful, never again'), 'negative')
+
+    def test_microservice_analyzer(self):
+        result = sentiment_analyzer.analyze_sentiment('Honest and professional team')
+        self.assertEqual(result['sentiment'], 'positive')
+        self.assertEqual(result['positive_signals'], 2)
+        many = sentiment_analyzer.analyze_sentiment_many(['Scam!', ' '])
+        self.assertEqual([r['sentiment'] for r in many], ['negative', 'neutral'])
+
+    def test_cloud_function_batch_mode(self):
+        result = sentiment_analyzer.main({'texts': ['Great staff', 'Rude staff']})
+        self.assertEqual(result['statusCode'], 200)
+        self.assertEqual([r['sentiment'] for r in result['body']['results']], ['positive', 'negative'])
+
+    def test_cloud_function_rejects_non_string_texts(self):
+        result = sentiment_analyzer.main({'texts': ['ok', 5]})
+        self.assertEqual(result, {'statusCode': 400, 'body': {'error': 'texts[1] must be a string'}})
+        self.assertEqual(sentiment_analyzer.main({'text': 5})['statusCode'], 400)
+
+
+# The service's Flask app only exists when flask and flask-cors are installed
+@skipUnless(hasattr(sentiment_analyzer, 'app'), 'flask and flask-cors are not installed')
+class SentimentBatchServiceTest(TestCase):
+    def setUp(self):
+        self.client = sentiment_analyzer.app.test_client()
+
+    def test_batch_json(self):
+        response = self.client.post('/analyze/batch', json={'texts': ['Great staff', 'Rude staff', '']})
+        self.assertEqual(response.status_code, 200)
+        labels = [r['sentiment'] for r in response.get_json()['results']]
+        self.assertEqual(labels, ['positive', 'negative', 'neutral'])
+
+    def test_batch_ndjson(self):
+        body = '"Great staff"\n{"text": "Rude staff"}\n'
+        response = self.client.post('/analyze/batch', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['sentiment'] for r in lines], ['positive', 'negative'])
+
+    def test_batch_rejects_non_list(self):
+        response = self.client.post('/analyze/batch', json={'texts': 'Great staff'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_rejects_non_string_entries(self):
+        response = self.client.post('/analyze/batch', json={'texts': ['ok', None]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], 'texts[1] must be a string')
+        response = self.client.post('/analyze/batch', data='"ok"\n{"text": 5}\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/analyze', json={'text': 5}).status_code, 400)
+
+    def test_wsgi_entry_point_imports_as_package(self):
+        from sentiment_analyzer import wsgi
+        self.assertIs(wsgi.app, sentiment_analyzer.app)
+
+    def test_metrics_endpoint(self):
+        sentiment_analyzer.metrics.reset()
+        self.client.get('/health')
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('sentiment_requests_total{endpoint="health",method="GET",status="200"} 1', body)
+        self.assertIn('sentiment_request_duration_seconds_count{endpoint="health",method="GET"} 1', body)
+
+
+class AsyncDealerViewsTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        restapis.dealer_directory.clear()
+        patcher = mock.patch.object(restapis.dealer_directory, 'refresh_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_get_dealerships_async(self):
+        docs = [{'id': 1, 'full_name': 'Sunshine Toyota', 'state': 'Kansas', 'st': 'KS'}]
+        with mock.patch.object(restapis, 'async_get_request', mock.AsyncMock(return_value=docs)) as fetch:
+            response = await views.get_dealerships_async(self.factory.get('/'), state='Kansas')
+        fetch.assert_awaited_once_with('/api/dealership?list&state=Kansas')
+        data = json.loads(response.content)
+        self.assertEqual(data['dealers'][0]['full_name'], 'Sunshine Toyota')
+
+    async def test_get_dealer_details_async_not_found(self):
+        with mock.patch.object(restapis, 'async_get_request', mock.AsyncMock(return_value=[])):
+            response = await views.get_dealer_details_async(self.factory.get('/'), dealer_id=99)
+        self.assertEqual(json.loads(response.content)['status'], 404)
+
+    async def test_get_dealer_reviews_async_scores_missing(self):
+        docs = [{'id': 'a', 'dealership': 1, 'review': 'Rude staff'}]
+        with mock.patch.object(restapis, 'async_get_request', mock.AsyncMock(return_value=docs)):
+            response = await views.get_dealer_reviews_async(self.factory.get('/'), dealer_id=1)
+        data = json.loads(response.content)
+        self.assertEqual(data['reviews'][0]['sentiment'], 'negative')
+
+    async def test_async_get_request_falls_back_to_mock(self):
+        with mock.patch.object(restapis, 'cf_base_url', 'http://127.0.0.1:9'):
+            results = await restapis.async_get_request('/api/dealership?list')
+        self.assertTrue(len(results) > 0)
+
+
+class DealerDirectoryTest(TestCase):
+    DOCS = [
+        {'id': 1, 'full_name': 'Sunshine Toyota', 'state': 'Kansas', 'st': 'KS'},
+        {'id': 2, 'full_name': 'Lakeside Honda', 'state': 'Texas', 'st': 'TX'},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.loader = mock.Mock(return_value=self.DOCS)
+        self.directory = DealerDirectory(self.loader, restapis.parse_dealer_json, ttl=60)
+
+    def test_loads_once_and_indexes(self):
+        self.assertEqual(len(self.directory.all()), 2)
+        self.assertEqual(self.directory.get(2).full_name, 'Lakeside Honda')
+        self.assertEqual([d.id for d in self.directory.by_state('kansas')], [1])
+        self.assertEqual([d.id for d in self.directory.by_state('TX')], [2])
+        self.assertIsNone(self.directory.get(99))
+        self.loader.assert_called_once()
+
+    def test_stale_served_while_refreshing(self):
+        self.directory.all()
+        self.directory.ttl = 0
+        with mock.patch.object(self.directory, 'refresh_in_background') as refresh:
+            self.assertEqual(len(self.directory.all()), 2)
+        refresh.assert_called_once()
+        self.loader.assert_called_once()
+
+    def test_shared_backend(self):
+        shared = DealerDirectory(self.loader, restapis.parse_dealer_json, ttl=60, shared_alias='default')
+        shared.all()
+        other_loader = mock.Mock(return_value=[])
+        other = DealerDirectory(other_loader, restapis.parse_dealer_json, ttl=60, shared_alias='default')
+        self.assertEqual(len(other.all()), 2)
+        other_loader.assert_not_called()
+
+    def test_get_dealerships_view_uses_directory(self):
+        restapis.dealer_directory.clear()
+        with mock.patch.object(restapis, 'get_request', return_value=self.DOCS) as fetch:
+            self.client.get('/djangoapp/get_dealers')
+            response = self.client.get('/djangoapp/get_dealers/TX')
+        fetch.assert_called_once_with('/api/dealership?list')
+        data = json.loads(response.content)
+        self.assertEqual([d['full_name'] for d in data['dealers']], ['Lakeside Honda'])
+        restapis.dealer_directory.clear()
+
+
+class CloudantClientPoolTest(TestCase):
+    def make_pool(self, **kwargs):
+        self.created = []
+
+        def factory():
+            client = mock.Mock()
+            self.created.append(client)
+            return client
+
+        pool = cloudantdb.ClientPool(factory, renew_interval=0, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_clients_are_reused(self):
+        pool = self.make_pool(max_size=2)
+        with pool.client() as first:
+            pass
+        with pool.client() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.created), 1)
+
+    def test_grows_up_to_max_size(self):
+        pool = self.make_pool(max_size=2, checkout_timeout=0.01)
+        a = pool.checkout()
+        b = pool.checkout()
+        self.assertIsNot(a, b)
+        self.assertIsNone(pool.checkout())
+        pool.checkin(a)
+        self.assertIs(pool.checkout(), a)
+
+    def test_concurrent_checkouts_respect_max_size(self):
+        created = []
+
+        def slow_factory():
+            time.sleep(0.05)
+            client = mock.Mock()
+            created.append(client)
+            return client
+
+        pool = cloudantdb.ClientPool(slow_factory, max_size=2, renew_interval=0, checkout_timeout=0.01)
+        self.addCleanup(pool.close)
+        threads = [threading.Thread(target=pool.checkout) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(created), 2)
+        self.assertEqual(pool.size(), 2)
+
+    def test_failed_create_releases_its_slot(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('auth failed')
+            return mock.Mock()
+
+        pool = cloudantdb.ClientPool(factory, max_size=1, renew_interval=0, checkout_timeout=0.01)
+        self.addCleanup(pool.close)
+        with self.assertRaises(RuntimeError):
+            pool.checkout()
+        self.assertIsNotNone(pool.checkout())
+
+    def test_waiter_wakes_when_a_slot_is_freed(self):
+        pool = cloudantdb.ClientPool(mock.Mock, max_size=1, renew_interval=0, checkout_timeout=5)
+        self.addCleanup(pool.close)
+        held = pool.checkout()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout()))
+        started = time.monotonic()
+        waiter.start()
+        time.sleep(0.05)
+        pool._discard(held)
+        waiter.join(5)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIsNotNone(got[0])
+        self.assertIsNot(got[0], held)
+
+    def test_unhealthy_client_is_replaced(self):
+        pool = self.make_pool(max_size=1, health_check_interval=0)
+        with pool.client() as first:
+            first.session.side_effect = Exception('session expired')
+        with pool.client() as second:
+            pass
+        self.assertIsNot(first, second)
+        first.disconnect.assert_called_once()
+        self.assertEqual(pool.size(), 1)
+
+    def test_renew_logs_in_again(self):
+        pool = self.make_pool()
+        with pool.client() as client:
+            pass
+        pool.renew()
+        client.session_login.assert_called_once()
+
+    def test_mock_data_without_credentials(self):
+        self.assertEqual(len(cloudantdb.get_all_dealers()), 8)
+
+
+class CloudantQueryTest(TestCase):
+    def patch_client(self, dbs):
+        client = mock.MagicMock()
+        client.__getitem__.side_effect = dbs.__getitem__
+
+        @contextmanager
+        def fake_client():
+            yield client
+
+        patcher = mock.patch.object(cloudantdb, 'database_client', fake_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dealers_by_state_uses_indexed_queries(self):
+        db = mock.Mock()
+        db.get_query_result.side_effect = [
+            [{'id': 1, 'state': 'Kansas'}],
+            [{'id': 1, 'st': 'KS'}, {'id': 7, 'st': 'KS'}],
+        ]
+        self.patch_client({cloudantdb.DEALERS_DB: db})
+        dealers = cloudantdb.get_dealers_by_state('kansas')
+        self.assertEqual(sorted(d['id'] for d in dealers), [1, 7])
+        selector, = db.get_query_result.call_args_list[0][0]
+        self.assertIn('Kansas', selector['state']['$in'])
+        self.assertEqual(db.get_query_result.call_args_list[0][1]['fields'], cloudantdb.DEALER_FIELDS)
+
+    def test_dealers_by_state_falls_back_on_query_error(self):
+        db = mock.Mock()
+        db.get_query_result.side_effect = RuntimeError('index missing')
+        self.patch_client({cloudantdb.DEALERS_DB: db})
+        with self.assertLogs('database.cloudantdb', 'ERROR'):
+            dealers = cloudantdb.get_dealers_by_state('kansas')
+        self.assertEqual(dealers, cloudantdb._mock_dealers('kansas'))
+
+    def test_dealer_by_id_fetches_one_document(self):
+        db = mock.Mock()
+        db.get_query_result.return_value = {'docs': [{'id': 3}]}
+        self.patch_client({cloudantdb.DEALERS_DB: db})
+        self.assertEqual(cloudantdb.get_dealer_by_id('3'), {'id': 3})
+        kwargs = db.get_query_result.call_args[1]
+        self.assertEqual(kwargs['limit'], 1)
+        self.assertEqual(db.get_query_result.call_args[0][0], {'id': {'$in': [3, '3']}})
+
+    def test_create_indexes_is_idempotent(self):
+        dealers = mock.Mock()
+        dealers.get_query_indexes.return_value = {'indexes': [{'name': 'dealer-id'}]}
+        reviews = mock.Mock()
+        reviews.get_query_indexes.return_value = {'indexes': []}
+        self.patch_client({cloudantdb.DEALERS_DB: dealers, cloudantdb.REVIEWS_DB: reviews})
+        out = StringIO()
+        call_command('create_cloudant_indexes', stdout=out)
+        self.assertEqual(dealers.create_query_index.call_count, 2)
+        self.assertEqual(reviews.create_query_index.call_count, 1)
+        self.assertIn('dealer-state', out.getvalue())
+
+    def test_mock_dealers_by_state_code(self):
+        self.assertEqual(len(cloudantdb.get_dealers_by_state('ks')), 3)
+
+
+class ReviewPaginationTest(TestCase):
+    DOCS = [
+        {'id': f'r{i}', 'dealership': 1, 'review': 'Great staff', 'sentiment': 'positive'}
+        for i in range(5)
+    ]
+
+    def test_local_offset_paging(self):
+        with mock.patch.object(restapis, 'get_request', return_value=self.DOCS):
+            first, cursor = restapis.get_dealer_reviews_page_from_cf(1, 2)
+            second, cursor = restapis.get_dealer_reviews_page_from_cf(1, 2, cursor)
+            third, last = restapis.get_dealer_reviews_page_from_cf(1, 2, cursor)
+        self.assertEqual([r.id for r in first + second + third], ['r0', 'r1', 'r2', 'r3', 'r4'])
+        self.assertIsNone(last)
+
+    def test_upstream_bookmark_is_cursor(self):
+        page = {'data': {'docs': self.DOCS[:2], 'bookmark': 'g1AAAA'}}
+        with mock.patch.object(restapis, 'get_request', return_value=page) as fetch:
+            reviews, cursor = restapis.get_dealer_reviews_page_from_cf(1, 2, 'g0')
+        fetch.assert_called_once_with('/api/review', id=1, limit=2, bookmark='g0')
+        self.assertEqual(cursor, 'g1AAAA')
+        self.assertEqual(len(reviews), 2)
+
+    def test_view_page(self):
+        with mock.patch.object(restapis, 'get_request', return_value=self.DOCS):
+            response = self.client.get('/djangoapp/reviews/dealer/1?limit=3')
+        data = json.loads(response.content)
+        self.assertEqual(len(data['reviews']), 3)
+        self.assertEqual(data['next_cursor'], 'offset:3')
+
+    def test_view_invalid_limit(self):
+        response = self.client.get('/djangoapp/reviews/dealer/1?limit=abc')
+        self.assertEqual(json.loads(response.content)['status'], 400)
+
+    def test_view_ndjson_stream(self):
+        with mock.patch.object(restapis, 'get_request', return_value=self.DOCS) as fetch:
+            response = self.client.get('/djangoapp/reviews/dealer/1?format=ndjson&limit=2')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        # A full upstream list is fetched once and sliced locally
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in lines], ['r0', 'r1', 'r2', 'r3', 'r4'])
+
+    def test_iterator_follows_bookmarks(self):
+        pages = [
+            {'data': {'docs': self.DOCS[:2], 'bookmark': 'b1'}},
+            {'data': {'docs': self.DOCS[2:4], 'bookmark': 'b2'}},
+            {'data': {'docs': self.DOCS[4:], 'bookmark': 'b3'}},
+        ]
+        with mock.patch.object(restapis, 'get_request', side_effect=pages) as fetch:
+            ids = [r.id for r in restapis.iter_dealer_reviews_from_cf(1, page_size=2)]
+        self.assertEqual(ids, ['r0', 'r1', 'r2', 'r3', 'r4'])
+        self.assertEqual([c[1].get('bookmark') for c in fetch.call_args_list], [None, 'b1', 'b2'])
+
+    def test_async_iterator_fetches_full_list_once(self):
+        async def collect():
+            return [r.id async for r in restapis.async_iter_dealer_reviews_from_cf(1, page_size=2)]
+
+        with mock.patch.object(restapis, 'async_get_request', mock.AsyncMock(return_value=self.DOCS)) as fetch:
+            ids = asyncio.run(collect())
+        self.assertEqual(ids, ['r0', 'r1', 'r2', 'r3', 'r4'])
+        self.assertEqual(fetch.await_count, 1)
+
+    def test_cloudant_mock_pages(self):
+        page = cloudantdb.get_reviews_page(1, limit=1)
+        self.assertEqual(len(page['docs']), 1)
+        self.assertEqual(len(list(cloudantdb.iter_reviews_for_dealer(1, page_size=1))), 2)
+
+
+@override_settings(REVIEW_SEARCH_PATH=':memory:', REVIEW_STATS_PATH=':memory:')
+class ReviewQueueTest(TestCase):
+    def make_queue(self, sink, **kwargs):
+        queue = ReviewQueue(':memory:', sink=sink, scorer=restapis.score_review_docs,
+                            retry_backoff=0, **kwargs)
+        self.addCleanup(queue.stop)
+        return queue
+
+    def test_enqueue_is_idempotent(self):
+        sink = mock.Mock(side_effect=lambda docs: [{'id': d['_id'], 'ok': True} for d in docs])
+        queue = self.make_queue(sink)
+        queue.enqueue({'dealership': 1, 'review': 'Great staff'}, key='k1')
+        queue.enqueue({'dealership': 1, 'review': 'Great staff'}, key='k1')
+        self.assertEqual(queue.drain(), 1)
+        docs = sink.call_args[0][0]
+        self.assertEqual(docs[0]['_id'], 'k1')
+        self.assertEqual(docs[0]['sentiment'], 'positive')
+        self.assertEqual(queue.stats()['done'], 1)
+
+    def test_flushes_in_batches(self):
+        sink = mock.Mock(side_effect=lambda docs: [{'id': d['_id'], 'rev': '1-a'} for d in docs])
+        queue = self.make_queue(sink, batch_size=2)
+        for i in range(5):
+            queue.enqueue({'dealership': 1, 'review': 'Rude staff'})
+        queue.drain()
+        self.assertEqual([len(c[0][0]) for c in sink.call_args_list], [2, 2, 1])
+
+    def test_conflict_counts_as_delivered(self):
+        queue = self.make_queue(lambda docs: [{'id': d['_id'], 'error': 'conflict'} for d in docs])
+        queue.enqueue({'dealership': 1, 'review': 'ok'})
+        queue.drain()
+        self.assertEqual(queue.stats()['done'], 1)
+
+    def test_failed_writes_retry_then_give_up(self):
+        sink = mock.Mock(return_value=None)
+        queue = self.make_queue(sink, max_attempts=3)
+        queue.enqueue({'dealership': 1, 'review': 'ok'})
+        queue.drain()
+        self.assertEqual(sink.call_count, 3)
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_claims_are_leased_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'journal.sqlite3')
+            first = ReviewQueue(path, sink=None, lease_timeout=60)
+            second = ReviewQueue(path, sink=None, lease_timeout=60)
+            for i in range(3):
+                first.enqueue({'dealership': 1, 'review': 'ok'}, key=f'k{i}')
+            claimed = first._claim()
+            self.assertEqual([key for key, _, _ in claimed], ['k0', 'k1', 'k2'])
+            self.assertEqual(second._claim(), [])
+            self.assertEqual(second.stats()['inflight'], 3)
+            # An expired lease (worker died mid-flush) is claimed again
+            first._conn.execute("UPDATE review_journal SET lease_until = 0 WHERE key = 'k1'")
+            first._conn.commit()
+            self.assertEqual([key for key, _, _ in second._claim()], ['k1'])
+
+    def test_prune_removes_old_done_rows(self):
+        queue = self.make_queue(lambda docs: [{'id': d['_id'], 'ok': True} for d in docs])
+        queue.enqueue({'dealership': 1, 'review': 'ok'})
+        queue.enqueue({'dealership': 1, 'review': 'ok'})
+        queue.drain()
+        self.assertEqual(queue.prune(older_than=3600), 0)
+        self.assertEqual(queue.prune(older_than=-1), 2)
+        self.assertEqual(queue.stats()['done'], 0)
+
+    def test_network_error_keeps_review_pending(self):
+        queue = self.make_queue(restapis.flush_reviews)
+        queue.enqueue({'dealership': 1, 'review': 'ok'}, key='k1')
+        with mock.patch.object(cloudantdb, 'is_configured', return_value=False), \
+                mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.object(restapis, 'get_session') as session:
+            session.return_value.post.side_effect = requests.ConnectionError('down')
+            queue.process_batch()
+        self.assertEqual(queue.stats()['pending'], 1)
+        self.assertEqual(queue.stats()['done'], 0)
+
+    def test_error_status_is_not_a_write(self):
+        response = mock.Mock(status_code=500)
+        response.json.return_value = {'message': 'boom', 'id': 'k1'}
+        with mock.patch.object(cloudantdb, 'is_configured', return_value=False), \
+                mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.object(restapis, 'get_session') as session:
+            session.return_value.post.return_value = response
+            results = restapis.flush_reviews([{'_id': 'k1', 'dealership': 1, 'review': 'ok'}])
+        self.assertEqual(results, [{'id': 'k1', 'ok': False}])
+        self.assertIsNone(restapis.written_review_id({'status': 200}))
+        self.assertEqual(restapis.written_review_id({'status': 200, 'id': 'k1'}), 'k1')
+
+    @override_settings(REVIEW_QUEUE_ENABLED=True)
+    def test_add_review_enqueues(self):
+        User.objects.create_user(username='poster', password='pass12345')
+        self.client.login(username='poster', password='pass12345')
+        queue = mock.Mock()
+        queue.enqueue.return_value = 'abc'
+        with mock.patch.object(views, 'get_review_queue', return_value=queue):
+            response = self.client.post(
+                '/djangoapp/add_review',
+                data=json.dumps({'dealership': 1, 'review': 'Great staff'}),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='abc',
+            )
+        data = json.loads(response.content)
+        self.assertEqual(data['status'], 200)
+        self.assertTrue(data['queued'])
+        key = queue.enqueue.call_args[1]['key']
+        self.assertEqual(key, scoped_idempotency_key('abc', User.objects.get(username='poster').pk))
+        self.assertRegex(key, r'^review-[0-9a-f]{64}$')
+
+    @override_settings(REVIEW_QUEUE_ENABLED=True)
+    def test_add_review_rejects_unsafe_idempotency_keys(self):
+        User.objects.create_user(username='poster', password='pass12345')
+        self.client.login(username='poster', password='pass12345')
+        queue = mock.Mock()
+        with mock.patch.object(views, 'get_review_queue', return_value=queue):
+            for key in ('_design/x', 'x' * 129, 'a b'):
+                response = self.client.post(
+                    '/djangoapp/add_review',
+                    data=json.dumps({'dealership': 1, 'review': 'Great staff', 'idempotency_key': key}),
+                    content_type='application/json',
+                )
+                self.assertEqual(json.loads(response.content)['status'], 400)
+        queue.enqueue.assert_not_called()
+
+    def test_scoped_keys_differ_per_user(self):
+        self.assertNotEqual(scoped_idempotency_key('abc', 1), scoped_idempotency_key('abc', 2))
+        with self.assertRaises(ValueError):
+            ReviewQueue(':memory:', sink=mock.Mock()).enqueue({'review': 'ok'}, key='_local/x')
+
+    def test_add_review_requires_text(self):
+        User.objects.create_user(username='poster', password='pass12345')
+        self.client.login(username='poster', password='pass12345')
+        response = self.client.post('/djangoapp/add_review', data=json.dumps({'dealership': 1}),
+                                    content_type='application/json')
+        self.assertEqual(json.loads(response.content)['status'], 400)
+
+
+class LocalStoreTest(TestCase):
+    def setUp(self):
+        self.store = LocalStore()
+        self.store.seed()
+
+    def test_dealer_endpoints(self):
+        self.assertEqual(len(self.store.get('/api/dealership?list')), 8)
+        self.assertEqual(len(self.store.get('/api/dealership?list&state=kansas')), 3)
+        self.assertEqual(len(self.store.get('/api/dealership?list', state='TX')), 2)
+        self.assertEqual(self.store.get('/api/dealership?id=5')[0]['full_name'], 'Coastal BMW')
+        self.assertEqual(self.store.get('/api/dealership?id=99'), [])
+
+    def test_review_endpoint_pages_with_bookmarks(self):
+        first = self.store.get('/api/review', id=1, limit=1)['data']
+        second = self.store.get('/api/review', id=1, limit=1, bookmark=first['bookmark'])['data']
+        self.assertEqual([r['id'] for r in first['docs'] + second['docs']], ['r1', 'r2'])
+        self.assertTrue(first['docs'][0]['purchase'])
+
+    def test_review_endpoint_rejects_non_integer_id(self):
+        self.assertEqual(self.store.get('/api/review?id=abc'), [])
+        self.assertEqual(self.store.get('/api/review', id='1; x', limit=5)['data'], {'docs': [], 'bookmark': None})
+        self.assertTrue(self.store.get('/api/review'))
+
+    def test_post_review_is_idempotent(self):
+        payload = {'_id': 'k1', 'dealership': 2, 'review': 'Great staff'}
+        self.assertEqual(self.store.post('/api/review', payload)['status'], 200)
+        self.assertEqual(self.store.post('/api/review', payload)['status'], 409)
+        self.assertEqual(len(self.store.get('/api/review?id=2')), 2)
+
+    def test_bulk_load_from_ndjson(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as fh:
+            for i in range(100, 130):
+                fh.write(json.dumps({'id': i, 'full_name': f'Dealer {i}', 'state': 'Ohio', 'st': 'OH'}) + '\n')
+        self.addCleanup(os.remove, fh.name)
+        self.assertEqual(self.store.load_dealers(iter_json_records(fh.name), chunk_size=7), 30)
+        self.assertEqual(len(self.store.list_dealers('oh')), 30)
+
+    def test_json_array_is_streamed(self):
+        records = [{'id': i, 'lat': i * 1.25e-3, 'full_name': f'Dealer "{i}" ]'} for i in range(50)]
+        fh = StringIO(json.dumps(records, indent=1))
+        items = _iter_json_array(fh, read_size=7)
+        self.assertEqual(next(items), records[0])
+        self.assertLess(fh.tell(), 100)
+        self.assertEqual([records[0]] + list(items), records)
+        with self.assertRaises(ValueError):
+            list(_iter_json_array(StringIO('[1 2]'), read_size=2))
+
+    def test_local_backend_mode(self):
+        with mock.patch.object(restapis, 'backend_mode', 'local'), \
+                mock.patch.object(restapis, 'get_session') as session:
+            dealers = restapis.get_dealers_from_cf('/api/dealership?list&state=Texas')
+        session.assert_not_called()
+        self.assertEqual(len(dealers), 2)
+
+
+class SyntheticDataTest(TestCase):
+    def test_generators_are_deterministic(self):
+        first = list(synthetic.generate_dealers(5, seed=3))
+        self.assertEqual(first, list(synthetic.generate_dealers(5, seed=3)))
+        self.assertEqual([d['id'] for d in first], [1, 2, 3, 4, 5])
+        reviews = list(synthetic.generate_reviews(20, dealer_count=5, seed=3))
+        self.assertTrue(all(1 <= r['dealership'] <= 5 for r in reviews))
+        self.assertEqual(len({r['id'] for r in reviews}), 20)
+
+    def test_stream_into_local_store(self):
+        store = LocalStore()
+        store.load_dealers(synthetic.generate_dealers(50), chunk_size=16)
+        store.load_reviews(synthetic.generate_reviews(200, dealer_count=50), chunk_size=16)
+        self.assertEqual(store.count('dealers'), 50)
+        self.assertEqual(store.count('reviews'), 200)
+
+    def test_load_catalog_is_idempotent(self):
+        catalog = synthetic.generate_catalog(3, 4)
+        self.assertEqual(synthetic.load_catalog(catalog, batch_size=5), (3, 12))
+        self.assertEqual(synthetic.load_catalog(catalog), (0, 0))
+        self.assertEqual(CarModel.objects.filter(car_make__name__startswith='Make').count(), 12)
+
+
+class LoadTestHarnessTest(TestCase):
+    def test_percentile(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(loadtest.percentile(values, 50), 0.05)
+        self.assertEqual(loadtest.percentile(values, 99), 0.099)
+        self.assertEqual(loadtest.percentile([], 95), 0.0)
+
+    def test_run_scenario_reports_latencies(self):
+        stats = loadtest.run_scenario(lambda c, rng: c.get('/djangoapp/analyze_review?text=good'), 6, 2)
+        self.assertEqual(stats['requests'], 6)
+        for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            self.assertIn(key, stats)
+
+    def test_run_uses_a_random_password_and_removes_the_user(self):
+        seen = []
+        result = loadtest.run({'me': lambda c, rng: seen.append(c.session.get('_auth_user_id'))}, 2, 1, warmup=0)
+        self.assertEqual(result['results']['me']['requests'], 2)
+        self.assertTrue(all(seen))
+        self.assertFalse(User.objects.filter(username=loadtest.LOADTEST_USER).exists())
+        self.assertNotEqual(loadtest.new_password(), loadtest.new_password())
+
+    def test_compare(self):
+        base = {'results': {'x': {'throughput_rps': 100, 'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 40}}}
+        current = {'results': {'x': {'throughput_rps': 50, 'p50_ms': 20, 'p95_ms': 20, 'p99_ms': 40}}}
+        change = loadtest.compare(current, base)['x']
+        self.assertEqual(change['throughput_rps'], -50.0)
+        self.assertEqual(change['p50_ms'], 100.0)
+
+
+class MicroBenchmarkTest(TestCase):
+    def test_cases_cover_hot_paths(self):
+        names = microbench.build_cases()
+        for prefix in ('simple_sentiment', 'analyze_sentiment[', 'analyze_sentiment_many',
+                       'parse_dealer_json', 'build_reviews', 'dumps_records'):
+            self.assertTrue(any(name.startswith(prefix) for name in names), prefix)
+
+    def test_run_records_time_and_memory(self):
+        result = microbench.run({'alloc': lambda: [0] * 10000}, repeat=1, min_time=0)
+        stats = result['results']['alloc']
+        self.assertGreater(stats['seconds'], 0)
+        self.assertGreaterEqual(stats['peak_bytes'], 10000 * 8)
+
+    def test_record_footprint(self):
+        footprint = microbench.record_footprint(200)
+        self.assertLess(footprint['slots'], footprint['dict'])
+        self.assertLess(footprint['columns'], footprint['dict'])
+
+    def test_find_regressions(self):
+        base = {'results': {'x': {'seconds': 1.0, 'calibration': 1.0, 'peak_bytes': 1000}}}
+        ok = {'results': {'x': {'seconds': 2.2, 'calibration': 2.0, 'peak_bytes': 1050}}}
+        slow = {'results': {'x': {'seconds': 2.0, 'calibration': 1.0, 'peak_bytes': 2000}}}
+        self.assertEqual(microbench.find_regressions(ok, base), [])
+        self.assertEqual(len(microbench.find_regressions(slow, base)), 2)
+
+    def test_command_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            args = ['--cases', 'simple_sentiment[len=50]', '--repeat', '1', '--min-time', '0',
+                    '--baseline', path]
+            call_command('run_microbenchmarks', *args, '--save-baseline', stdout=StringIO())
+            baseline = microbench.load(path)
+            baseline['results']['simple_sentiment[len=50]']['peak_bytes'] = 1
+            microbench.save(baseline, path)
+            with self.assertRaises(CommandError):
+                call_command('run_microbenchmarks', *args, stdout=StringIO())
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        instrumentation.view_metrics.reset()
+        instrumentation.upstream_metrics.reset()
+
+    def test_server_timing_reports_components(self):
+        with mock.patch.object(restapis, 'get_nlu_client', return_value=None):
+            response = self.client.get('/djangoapp/analyze_review', {'text': 'great service'})
+        header = response['Server-Timing']
+        self.assertIn('sentiment;dur=', header)
+        self.assertIn('total;dur=', header)
+
+    def test_metrics_endpoint_renders_view_and_upstream_histograms(self):
+        with mock.patch.object(restapis, 'backend_mode', 'local'):
+            self.client.get('/djangoapp/get_dealers')
+            restapis.get_request('/api/dealership?list')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('djangoapp_request_duration_seconds_bucket{method="GET",view="djangoapp:get_dealers"', body)
+        self.assertIn('djangoapp_upstream_requests_total{component="db"', body)
+
+    def test_cloudant_queries_are_timed(self):
+        cloudantdb.get_all_dealers()
+        body = instrumentation.render_metrics()
+        self.assertIn('component="db",status="ok",target="get_all_dealers"', body)
+
+    def test_upstream_call_records_failures_and_logs(self):
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=503, json=lambda: [])
+        with mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.object(restapis, 'get_session', return_value=session), \
+                self.assertLogs('djangoapp.instrumentation', level='WARNING') as logs:
+            restapis.get_request('/api/dealership', id=1)
+        self.assertIn('status=503', logs.output[0])
+        self.assertIn('status="error"', instrumentation.upstream_metrics.render())
+
+    def test_successful_calls_are_sampled(self):
+        with mock.patch.object(instrumentation, 'log_sample_rate', 0.0), \
+                mock.patch.object(instrumentation.logger, 'log') as log:
+            instrumentation.log_call('GET', 'http://x/api', 200, 0.01)
+        log.assert_not_called()
+
+
+class CarCatalogTest(TestCase):
+    def setUp(self):
+        car_catalog.invalidate()
+        self.make = CarMake.objects.create(name='Toyota')
+        CarModel.objects.create(car_make=self.make, name='Camry', car_type='SEDAN', year=2022, dealer_id=3)
+
+    def tearDown(self):
+        car_catalog.invalidate()
+
+    def test_serves_catalog_without_queries_once_warm(self):
+        self.client.get('/djangoapp/get_cars')
+        with self.assertNumQueries(0):
+            response = self.client.get('/djangoapp/get_cars')
+        self.assertEqual(json.loads(response.content), {'CarModels': [{
+            'CarModel': 'Camry', 'CarMake': 'Toyota', 'CarType': 'Sedan', 'ModelYear': 2022, 'DealerId': 3,
+        }]})
+
+    def test_conditional_requests_get_304(self):
+        first = self.client.get('/djangoapp/get_cars')
+        self.assertTrue(first['ETag'])
+        self.assertEqual(self.client.get('/djangoapp/get_cars', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get('/djangoapp/get_cars', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304
+        )
+
+    def test_model_changes_invalidate_catalog(self):
+        etag = self.client.get('/djangoapp/get_cars')['ETag']
+        CarModel.objects.create(car_make=self.make, name='Corolla', car_type='SEDAN', year=2021)
+        response = self.client.get('/djangoapp/get_cars', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['CarModels']), 2)
+
+        ford = CarMake.objects.create(name='Ford')
+        CarModel.objects.create(car_make=ford, name='F-150', car_type='TRUCK', year=2020)
+        self.make.delete()
+        cars = json.loads(self.client.get('/djangoapp/get_cars').content)['CarModels']
+        self.assertEqual([car['CarModel'] for car in cars], ['F-150'])
+
+
+class CarCatalogQueryTest(TestCase):
+    def setUp(self):
+        car_catalog.invalidate()
+        toyota = CarMake.objects.create(name='Toyota')
+        ford = CarMake.objects.create(name='Ford')
+        CarModel.objects.create(car_make=toyota, name='Camry', car_type='SEDAN', year=2018, dealer_id=1)
+        CarModel.objects.create(car_make=toyota, name='RAV4', car_type='SUV', year=2021, dealer_id=2)
+        CarModel.objects.create(car_make=ford, name='F-150', car_type='TRUCK', year=2022, dealer_id=1)
+        CarModel.objects.create(car_make=ford, name='Explorer', car_type='SUV', year=2020, dealer_id=2)
+
+    def cars(self, **params):
+        return json.loads(self.client.get('/djangoapp/get_cars', params).content)
+
+    def test_filters(self):
+        names = lambda data: sorted(car['CarModel'] for car in data['CarModels'])
+        self.assertEqual(names(self.cars(make='Toyota')), ['Camry', 'RAV4'])
+        self.assertEqual(names(self.cars(car_type='suv')), ['Explorer', 'RAV4'])
+        self.assertEqual(names(self.cars(year_min=2020, year_max=2021)), ['Explorer', 'RAV4'])
+        self.assertEqual(names(self.cars(dealer_id=1, make='Ford')), ['F-150'])
+
+    def test_field_selection(self):
+        data = self.cars(make='Ford', fields='CarModel,CarType')
+        self.assertEqual(data['CarModels'][0], {'CarModel': 'F-150', 'CarType': 'Truck'})
+        self.assertEqual(self.cars(fields='Price')['status'], 400)
+
+    def test_keyset_pagination(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 3, 'fields': 'CarModel'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.cars(**params)
+            seen += [car['CarModel'] for car in data['CarModels']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, ['Camry', 'RAV4', 'F-150', 'Explorer'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.cars(year_min='soon')['status'], 400)
+        self.assertEqual(self.cars(car_type='Spaceship')['status'], 400)
+
+
+class CatalogSeedTest(TestCase):
+    def tearDown(self):
+        car_catalog.invalidate()
+
+    def test_seed_is_idempotent(self):
+        self.assertEqual(import_catalog(seed_records(), batch_size=5), (8, 19))
+        # Savepoint, counts, one insert per table and one id lookup, regardless of row count
+        with self.assertNumQueries(9):
+            self.assertEqual(import_catalog(seed_records(), batch_size=100), (0, 0))
+        self.assertEqual(CarModel.objects.filter(car_make__name='Toyota').count(), 3)
+
+    def test_get_cars_does_not_seed(self):
+        data = json.loads(self.client.get('/djangoapp/get_cars').content)
+        self.assertEqual(data['CarModels'], [])
+        self.assertEqual(CarMake.objects.count(), 0)
+
+    def test_command_imports_csv_and_ndjson(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'catalog.csv')
+            with open(csv_path, 'w') as fh:
+                fh.write('make,model,car_type,year,dealer_id\nKia,Soul,Hatchback,2020,4\nKia,Telluride,SUV,2023,\n')
+            json_path = os.path.join(tmp, 'catalog.ndjson')
+            with open(json_path, 'w') as fh:
+                fh.write(json.dumps({'make': 'Mazda', 'model': 'MX-5', 'car_type': 'CONVERTIBLE', 'year': 2019}) + '\n')
+            out = StringIO()
+            call_command('seed_cars', '--file', csv_path, json_path, stdout=out)
+        self.assertIn('Created 2 make(s) and 3 model(s)', out.getvalue())
+        soul = CarModel.objects.get(name='Soul')
+        self.assertEqual((soul.car_type, soul.year, soul.dealer_id), ('HATCHBACK', 2020, 4))
+
+    def test_command_rejects_bad_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('make,model,car_type\nKia,Soul,Hovercraft\n')
+        try:
+            with self.assertRaises(CommandError):
+                call_command('seed_cars', '--file', fh.name, stdout=StringIO())
+        finally:
+            os.unlink(fh.name)
+        self.assertFalse(CarMake.objects.filter(name='Kia').exists())
+
+
+class GeoIndexTest(TestCase):
+    def setUp(self):
+        self.dealers = [restapis.parse_dealer_json(doc) for doc in synthetic.generate_dealers(2000, seed=7)]
+        self.dealers.append(restapis.parse_dealer_json({'id': 'nowhere', 'full_name': 'No coordinates'}))
+        self.index = GeoIndex(self.dealers)
+
+    def brute_force(self, lat, lon):
+        return sorted(
+            (haversine_km(lat, lon, d.lat, d.long), d.id) for d in self.dealers if d.id != 'nowhere'
+        )
+
+    def test_k_nearest_matches_brute_force(self):
+        for lat, lon in ((39.1, -94.6), (47.6, -122.3), (25.8, -80.2), (60.0, -150.0), (0.0, 179.9)):
+            expected = [dealer_id for _, dealer_id in self.brute_force(lat, lon)[:7]]
+            self.assertEqual([d.id for _, d in self.index.nearest(lat, lon, k=7)], expected)
+
+    def test_radius_matches_brute_force(self):
+        expected = [dealer_id for distance, dealer_id in self.brute_force(39.1, -94.6) if distance <= 250]
+        found = self.index.nearest(39.1, -94.6, radius_km=250)
+        self.assertEqual([d.id for _, d in found], expected)
+        self.assertTrue(all(distance <= 250 for distance, _ in found))
+
+    def test_skips_dealers_without_coordinates(self):
+        self.assertEqual(len(self.index), 2000)
+        self.assertEqual(GeoIndex([]).nearest(0, 0, k=3), [])
+
+
+class DealersNearViewTest(TestCase):
+    def setUp(self):
+        restapis.dealer_directory.clear()
+
+    def tearDown(self):
+        restapis.dealer_directory.clear()
+
+    def test_nearest_dealers(self):
+        with mock.patch.object(restapis, 'backend_mode', 'local'):
+            data = json.loads(self.client.get('/djangoapp/dealers/near', {'lat': 37.7, 'long': -97.3, 'k': 2}).content)
+        self.assertEqual(data['status'], 200)
+        self.assertEqual(data['dealers'][0]['full_name'], 'Sunshine Toyota')
+        self.assertEqual(len(data['dealers']), 2)
+        self.assertLess(data['dealers'][0]['distance_km'], data['dealers'][1]['distance_km'])
+
+    def test_radius_and_validation(self):
+        with mock.patch.object(restapis, 'backend_mode', 'local'):
+            within = json.loads(self.client.get('/djangoapp/dealers/near', {'lat': 37.7, 'long': -97.3, 'radius': 5}).content)
+            missing = json.loads(self.client.get('/djangoapp/dealers/near', {'lat': 37.7}).content)
+            bad = json.loads(self.client.get('/djangoapp/dealers/near', {'lat': 137.7, 'long': 0}).content)
+        self.assertEqual([d['full_name'] for d in within['dealers']], ['Sunshine Toyota'])
+        self.assertEqual(missing['status'], 400)
+        self.assertEqual(bad['status'], 400)
+
+
+@override_settings(REVIEW_SEARCH_PATH=':memory:', REVIEW_STATS_PATH=':memory:')
+class ReviewSearchTest(TestCase):
+    DOCS = [
+        {'id': 'r1', 'dealership': 1, 'review': 'Friendly staff and a smooth sale', 'car_make': 'Toyota',
+         'car_model': 'Camry', 'car_year': 2021, 'sentiment': 'positive'},
+        {'id': 'r2', 'dealership': 2, 'review': 'Slow service, the Toyota was not ready', 'car_make': 'Honda',
+         'car_model': 'Civic', 'car_year': 2019, 'sentiment': 'negative'},
+        {'id': 'r3', 'dealership': 1, 'review': 'Staff were rude', 'car_make': 'Ford',
+         'car_model': 'F-150', 'car_year': 2020, 'sentiment': 'negative'},
+    ]
+
+    def setUp(self):
+        self.index = ReviewSearchIndex()
+        self.index.rebuild(self.DOCS)
+
+    def ids(self, *args, **kwargs):
+        return [r['id'] for r in self.index.search(*args, **kwargs)[0]]
+
+    def test_ranked_search_and_filters(self):
+        # A make match outranks a mention in the review text
+        self.assertEqual(self.ids('toyota'), ['r1', 'r2'])
+        self.assertEqual(self.ids('staff', sentiment='negative'), ['r3'])
+        self.assertEqual(sorted(self.ids('staff', dealer_id=1)), ['r1', 'r3'])
+        self.assertEqual(self.ids('staff', dealer_id=2), [])
+        self.assertEqual(self.ids('2019'), ['r2'])
+        self.assertEqual(self.ids('civ'), ['r2'])
+
+    def test_failed_rebuild_keeps_index_and_triggers(self):
+        def docs():
+            yield {'id': 'x1', 'dealership': 1, 'review': 'Partial'}
+            raise RuntimeError('export interrupted')
+
+        with self.assertRaises(RuntimeError):
+            self.index.rebuild(docs(), chunk_size=1)
+        self.assertEqual(self.index.count(), 3)
+        self.assertEqual(self.ids('partial'), [])
+        self.index.add([{'id': 'r4', 'dealership': 3, 'review': 'Bought a tiguan'}])
+        self.assertEqual(self.ids('tiguan'), ['r4'])
+
+    def test_incremental_updates(self):
+        self.index.add([{'id': 'r3', 'dealership': 1, 'review': 'Staff apologised, great fix', 'sentiment': 'positive'}])
+        self.index.add([{'id': 'r4', 'dealership': 3, 'review': 'Great financing'}])
+        self.assertEqual(self.index.count(), 4)
+        self.assertEqual(sorted(self.ids('great')), ['r3', 'r4'])
+        self.assertEqual(self.ids('rude'), [])
+
+    def test_pagination(self):
+        page, next_offset = self.index.search('staff', limit=1)
+        self.assertEqual(next_offset, 1)
+        rest, last = self.index.search('staff', limit=1, offset=next_offset)
+        self.assertIsNone(last)
+        self.assertNotEqual(page[0]['id'], rest[0]['id'])
+
+    def test_match_expression_quotes_terms(self):
+        self.assertEqual(match_expression('"toyota" OR NEAR(x'), '"toyota" "OR" "NEAR" "x"*')
+        self.assertEqual(match_expression('rav4 '), '"rav4"')
+        self.assertIsNone(match_expression('  ?! '))
+
+    def test_remote_search_index_ignores_mock_reviews(self):
+        with mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.dict(restapis._review_indexes, clear=True), \
+                mock.patch('database.cloudantdb.is_configured', return_value=False), \
+                mock.patch.object(restapis, 'get_session') as session:
+            session.return_value.get.return_value.raise_for_status.side_effect = requests.HTTPError('502')
+            index = restapis.get_review_search()
+            for thread in threading.enumerate():
+                if thread.name == 'ReviewSearchIndex-populate':
+                    thread.join(5)
+        self.assertEqual(index.count(), 0)
+        with mock.patch.object(restapis, 'all_review_docs', return_value=None), \
+                self.assertRaises(CommandError):
+            call_command('rebuild_review_search', stdout=StringIO(), stderr=StringIO())
+
+    def test_endpoint_and_add_review_indexing(self):
+        User.objects.create_user(username='searcher', password='pw')
+        self.client.login(username='searcher', password='pw')
+        with mock.patch.object(restapis, 'backend_mode', 'local'), \
+                mock.patch.dict(restapis._review_indexes, {ReviewSearchIndex: self.index}), \
+                mock.patch.object(restapis, 'get_nlu_client', return_value=None):
+            self.client.post('/djangoapp/add_review', data=json.dumps({
+                'dealership': 5, 'review': 'Excellent Mazda handover', 'car_make': 'Mazda',
+            }), content_type='application/json')
+            found = json.loads(self.client.get('/djangoapp/reviews/search', {'q': 'mazda'}).content)
+            filtered = json.loads(self.client.get(
+                '/djangoapp/reviews/search', {'q': 'staff', 'sentiment': 'negative', 'limit': 5}
+            ).content)
+            invalid = json.loads(self.client.get('/djangoapp/reviews/search', {'q': 'x', 'sentiment': 'meh'}).content)
+        self.assertEqual([r['dealership'] for r in found['reviews']], [5])
+        self.assertEqual(found['reviews'][0]['sentiment'], 'positive')
+        self.assertEqual([r['id'] for r in filtered['reviews']], ['r3'])
+        self.assertIsNone(filtered['next_cursor'])
+        self.assertEqual(invalid['status'], 400)
+
+
+@override_settings(REVIEW_SEARCH_PATH=':memory:', REVIEW_STATS_PATH=':memory:')
+class ReviewStatsTest(TestCase):
+    DOCS = [
+        {'id': 's1', 'dealership': 1, 'sentiment': 'positive', 'purchase': True, 'car_make': 'Toyota', 'car_year': 2021},
+        {'id': 's2', 'dealership': 1, 'sentiment': 'negative', 'purchase': False, 'car_make': 'Toyota', 'car_year': 2020},
+        {'id': 's3', 'dealership': 2, 'purchase': True, 'car_make': 'Ford'},
+    ]
+
+    def test_incremental_aggregates(self):
+        stats = ReviewStats()
+        stats.record(self.DOCS)
+        dealer = stats.get(1)
+        self.assertEqual(dealer['reviews'], 2)
+        self.assertEqual(dealer['sentiment'], {'positive': 1, 'negative': 1, 'neutral': 0, 'unscored': 0})
+        self.assertEqual(dealer['purchase_ratio'], 0.5)
+        self.assertEqual(dealer['car_makes'], {'Toyota': 2})
+        self.assertEqual(dealer['car_years'], {'2020': 1, '2021': 1})
+        self.assertEqual(stats.get(2)['sentiment']['unscored'], 1)
+        self.assertEqual(stats.get(99)['reviews'], 0)
+
+    def test_rerecording_replaces_contribution(self):
+        stats = ReviewStats()
+        stats.record(self.DOCS)
+        stats.record(self.DOCS[:1])
+        stats.record([dict(self.DOCS[1], dealership=2, sentiment='neutral')])
+        self.assertEqual(stats.get(1)['reviews'], 1)
+        self.assertEqual(stats.get(1)['car_years'], {'2021': 1})
+        self.assertEqual(stats.get(2)['sentiment']['neutral'], 1)
+        self.assertEqual(stats.get(2)['car_makes'], {'Ford': 1, 'Toyota': 1})
+
+    def test_failed_rebuild_keeps_aggregates_and_triggers(self):
+        stats = ReviewStats()
+        stats.record(self.DOCS)
+
+        def docs():
+            yield self.DOCS[0]
+            raise RuntimeError('export interrupted')
+
+        with self.assertRaises(RuntimeError):
+            stats.rebuild(docs(), chunk_size=1)
+        self.assertEqual(stats.get(1)['reviews'], 2)
+        stats.record([{'id': 's4', 'dealership': 1, 'sentiment': 'neutral'}])
+        self.assertEqual(stats.get(1)['reviews'], 3)
+        self.assertEqual(stats.get(1)['sentiment']['neutral'], 1)
+
+    def test_empty_index_is_populated_from_upstream(self):
+        with mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.dict(restapis._review_indexes, clear=True), \
+                mock.patch.object(restapis, 'all_review_docs', return_value=self.DOCS):
+            stats = restapis.get_review_stats()
+            for thread in threading.enumerate():
+                if thread.name == 'ReviewStats-populate':
+                    thread.join(5)
+        self.assertEqual(stats.get(1)['reviews'], 2)
+
+    def test_remote_populate_never_uses_mock_reviews(self):
+        with mock.patch.object(restapis, 'backend_mode', 'remote'), \
+                mock.patch.dict(restapis._review_indexes, clear=True), \
+                mock.patch('database.cloudantdb.is_configured', return_value=False), \
+                mock.patch.object(restapis, 'get_session') as session:
+            session.return_value.get.side_effect = requests.ConnectionError('down')
+            stats = restapis.get_review_stats()
+            for thread in threading.enumerate():
+                if thread.name == 'ReviewStats-populate':
+                    thread.join(5)
+        self.assertTrue(stats.is_empty())
+        with mock.patch.object(restapis, 'all_review_docs', return_value=None), \
+                self.assertRaises(CommandError):
+            call_command('rebuild_review_stats', stdout=StringIO())
+
+    def test_add_review_records_only_stored_reviews(self):
+        User.objects.create_user(username='rater', password='pw')
+        self.client.login(username='rater', password='pw')
+        payload = json.dumps({'dealership': 2, 'review': 'Great and helpful'})
+        for result in (None, {'status': 200, 'message': 'accepted'}, {'status': 500, 'id': 'x'}):
+            with mock.patch.object(views, 'post_review', return_value=result), \
+                    mock.patch.object(views, 'record_reviews') as record, \
+                    mock.patch.object(restapis, 'get_nlu_client', return_value=None):
+                self.client.post('/djangoapp/add_review', data=payload, content_type='application/json')
+            record.assert_not_called()
+        with mock.patch.object(views, 'post_review', return_value={'status': 200, 'id': 'r9'}), \
+                mock.patch.object(views, 'record_reviews') as record, \
+                mock.patch.object(restapis, 'get_nlu_client', return_value=None):
+            self.client.post('/djangoapp/add_review', data=payload, content_type='application/json')
+        self.assertEqual(record.call_args[0][0][0]['_id'], 'r9')
+
+    def test_docs_without_id_are_skipped(self):
+        stats = ReviewStats()
+        self.assertEqual(stats.record([{'dealership': 1, 'sentiment': 'positive'}]), 0)
+        self.assertTrue(stats.is_empty())
+
+    def test_rebuild_matches_incremental(self):
+        docs = list(synthetic.generate_reviews(500, dealer_count=20, with_sentiment=True))
+        incremental = ReviewStats()
+        for start in range(0, 500, 50):
+            incremental.record(docs[start:start + 50])
+        rebuilt = ReviewStats()
+        self.assertEqual(rebuilt.rebuild(docs), 500)
+        self.assertEqual(incremental.get_many(range(1, 21)), rebuilt.get_many(range(1, 21)))
+
+    def test_endpoint_and_add_review(self):
+        stats = ReviewStats()
+        stats.record(self.DOCS)
+        User.objects.create_user(username='rater', password='pw')
+        self.client.login(username='rater', password='pw')
+        with mock.patch.object(restapis, 'backend_mode', 'local'), \
+                mock.patch.dict(restapis._review_indexes, {ReviewStats: stats}), \
+                mock.patch.object(restapis, 'get_nlu_client', return_value=None):
+            self.client.post('/djangoapp/add_review', data=json.dumps({
+                'dealership': 2, 'review': 'Great and helpful', 'purchase': True, 'car_make': 'Ford',
+            }), content_type='application/json')
+            data = json.loads(self.client.get('/djangoapp/reviews/stats', {'dealer_id': '2,1'}).content)
+            invalid = json.loads(self.client.get('/djangoapp/reviews/stats', {'dealer_id': 'x'}).content)
+        self.assertEqual([s['dealer_id'] for s in data['stats']], [2, 1])
+        self.assertEqual(data['stats'][0]['reviews'], 2)
+        self.assertEqual(data['stats'][0]['sentiment']['positive'], 1)
+        self.assertEqual(data['stats'][0]['car_makes'], {'Ford': 2})
+        self.assertEqual(invalid['status'], 400)
+
+
+class RecordsTest(TestCase):
+    def setUp(self):
+        self.dealer = restapis.parse_dealer_json({
+            'id': 7, 'full_name': 'Caf\u00e9 "Cars" {Ltd}', 'city': 'El Paso', 'state': 'Texas',
+            'lat': 31.7, 'long': -106.4, 'zip': None,
+        })
+        self.review = self._review()
+
+    def _review(self):
+        doc = {'id': 'r1', 'dealership': 7, 'review': 'Line\nbreak \u2713', 'purchase': True, 'car_year': 2021}
+        return restapis._build_reviews([doc], ['positive'])[0]
+
+    def test_records_are_slotted(self):
+        self.assertFalse(hasattr(self.dealer, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.review.extra = 1
+        self.assertEqual(list(self.dealer.to_dict()), list(restapis.CarDealer.FIELDS))
+        self.assertEqual(self.review, self._review())
+
+    def test_dumps_matches_json_dumps(self):
+        dealers = [self.dealer, restapis.parse_dealer_json({'id': '8', 'lat': 0, 'long': float('nan')})]
+        self.assertEqual(json.loads(dumps_records(dealers)), json.loads(json.dumps([d.to_dict() for d in dealers])))
+        self.assertEqual(dumps_record(self.review), json.dumps(self.review.to_dict(), separators=(',', ':')))
+        self.assertEqual(dumps_records([]), '[]')
+        many = [self.review] * records.SMALL_RECORD_COUNT
+        self.assertEqual(dumps_records(many), json.dumps([r.to_dict() for r in many], separators=(',', ':')))
+
+    def test_records_response_escapes_key(self):
+        response = views._records_response('a "key"', [self.dealer], note='x}')
+        self.assertEqual(json.loads(response.content),
+                         {'status': 200, 'note': 'x}', 'a "key"': [self.dealer.to_dict()]})
+
+    def test_extra_columns_and_chunking(self):
+        dealers = [restapis.parse_dealer_json({'id': i}) for i in range(5)]
+        rows = list(iter_json_rows(dealers, fields=('id',), extra={'distance_km': [0.5] * 5}, chunk_size=2))
+        self.assertEqual([json.loads(row) for row in rows], [{'id': i, 'distance_km': 0.5} for i in range(5)])
+        columns = RecordColumns.from_records(dealers)
+        self.assertEqual(len(columns), 5)
+        self.assertEqual(columns.column('id'), [0, 1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            columns.add_column('x', [1])
+
+    def test_pickle_roundtrip(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.dealer)), self.dealer)
+
+    def test_views_serialise_records(self):
+        with mock.patch.object(restapis.dealer_directory, 'all', return_value=[self.dealer]):
+            data = json.loads(self.client.get('/djangoapp/get_dealers').content)
+        self.assertEqual(data, {'status': 200, 'dealers': [self.dealer.to_dict()]})
@@ -1,14 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'djangoapp'
 
+# Upstream proxy views; the async variants only pay off when served over ASGI
+if settings.ASYNC_VIEWS:
+    dealers_view = views.get_dealerships_async
+    dealer_details_view = views.get_dealer_details_async
+    dealer_reviews_view = views.get_dealer_reviews_async
+else:
+    dealers_view = views.get_dealerships
+    dealer_details_view = views.get_dealer_details
+    dealer_reviews_view = views.get_dealer_reviews
+
 urlpatterns = [
     # Dealer endpoints
-    path('get_dealers', views.get_dealerships, name='get_dealers'),
-    path('get_dealers/<str:state>', views.get_dealerships, name='get_dealers_by_state'),
-    path('dealer/<int:dealer_id>', views.get_dealer_details, name='dealer_details'),
-    path('reviews/dealer/<int:dealer_id>', views.get_dealer_reviews, name='dealer_reviews'),
+    path('get_dealers', dealers_view, name='get_dealers'),
+    path('get_dealers/<str:state>', dealers_view, name='get_dealers_by_state'),
+    path('dealers/near', views.get_dealers_near, name='dealers_near'),
+    path('dealer/<int:dealer_id>', dealer_details_view, name='dealer_details'),
+    path('reviews/dealer/<int:dealer_id>', dealer_reviews_view, name='dealer_reviews'),
+    path('reviews/search', views.search_reviews, name='search_reviews'),
+    path('reviews/stats', views.get_dealer_review_stats, name='review_stats'),
     path('add_review', views.add_review, name='add_review'),
     
     # Car endpoints
@@ -1,54 +1,218 @@
 import json
 import logging
 import requests
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
-from .models import CarMake, CarModel
+from .instrumentation import render_metrics
+from .records import dumps_record, dumps_records, iter_json_rows
+from .car_catalog import CAR_TYPE_LABELS, CATALOG_FIELDS, car_catalog, query_catalog
+from .review_queue import scoped_idempotency_key
 from .restapis import (
-    get_dealers_from_cf,
     get_dealer_by_id_from_cf,
     get_dealer_reviews_from_cf,
+    async_get_dealers_from_cf,
+    async_get_dealer_by_id_from_cf,
+    async_get_dealer_reviews_from_cf,
+    get_dealer_reviews_page_from_cf,
+    iter_dealer_reviews_from_cf,
+    async_get_dealer_reviews_page_from_cf,
+    async_iter_dealer_reviews_from_cf,
     post_review,
     analyze_review_sentiments,
+    dealer_directory,
+    get_review_queue,
+    get_review_search,
+    get_review_stats,
+    record_reviews,
+    written_review_id,
+    SENTIMENT_LABELS,
 )
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_REVIEWS_PAGE_SIZE = 50
+MAX_REVIEWS_PAGE_SIZE = 200
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_STATS_DEALERS = 200
+DEFAULT_NEAR_DEALERS = 5
+MAX_NEAR_DEALERS = 100
+DEFAULT_CARS_PAGE_SIZE = 100
+MAX_CARS_PAGE_SIZE = 500
+CARS_QUERY_PARAMS = ("make", "car_type", "year_min", "year_max", "dealer_id", "fields", "limit", "cursor")
+
+
+def _dealers_endpoint(state):
+    if state == "All":
+        return "/api/dealership?list"
+    return f"/api/dealership?list&state={state}"
+
+
+def _records_response(key, records, extra=None, **fields):
+    """Like JsonResponse for ``{"status": 200, key: records, **fields}``.
+
+    The records are serialised column-wise by dumps_records instead of
+    through one dict per record.
+    """
+    members = [f"{json.dumps(name)}: {json.dumps(value)}" for name, value in dict({"status": 200}, **fields).items()]
+    members.append(f"{json.dumps(key)}: {dumps_records(records, extra=extra)}")
+    return HttpResponse("{" + ", ".join(members) + "}", content_type="application/json")
+
+
+def _directory_dealers(state):
+    if state == "All":
+        return dealer_directory.all()
+    return dealer_directory.by_state(state)
+
 
 def get_dealerships(request, state="All"):
     """Get all dealerships or filter by state."""
-    if state == "All":
-        endpoint = "/api/dealership?list"
-    else:
-        endpoint = f"/api/dealership?list&state={state}"
-    
-    dealerships = get_dealers_from_cf(endpoint)
-    dealers_json = [dealer.__dict__ for dealer in dealerships]
-    return JsonResponse({"status": 200, "dealers": dealers_json})
+    return _records_response("dealers", _directory_dealers(state))
+
+
+def _near_query(request):
+    """Parse ``lat``, ``long``, ``radius`` (km) and ``k`` for get_dealers_near."""
+    try:
+        lat = float(request.GET["lat"])
+        lon = float(request.GET["long"])
+        radius = float(request.GET["radius"]) if request.GET.get("radius") else None
+        k = int(request.GET["k"]) if request.GET.get("k") else None
+    except (KeyError, ValueError):
+        raise ValueError("lat and long are required; radius and k must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat or long out of range")
+    if radius is not None and radius <= 0:
+        raise ValueError("radius must be positive")
+    if k is None and radius is None:
+        k = DEFAULT_NEAR_DEALERS
+    if k is not None:
+        k = min(max(k, 1), MAX_NEAR_DEALERS)
+    return lat, lon, k, radius
+
+
+def get_dealers_near(request):
+    """Get the ``k`` dealers nearest ``lat``/``long``, or all within ``radius`` km."""
+    try:
+        lat, lon, k, radius = _near_query(request)
+    except ValueError as e:
+        return JsonResponse({"status": 400, "message": str(e)})
+    nearest = dealer_directory.near(lat, lon, k=k, radius_km=radius)
+    distances = [round(distance, 3) for distance, _ in nearest]
+    return _records_response("dealers", [dealer for _, dealer in nearest], extra={"distance_km": distances})
 
 
 def get_dealer_details(request, dealer_id):
     """Get dealer details by ID."""
     if dealer_id:
-        endpoint = f"/api/dealership?id={dealer_id}"
-        dealership = get_dealer_by_id_from_cf(endpoint)
+        dealership = dealer_directory.get(dealer_id)
+        if dealership is None:
+            endpoint = f"/api/dealership?id={dealer_id}"
+            dealership = get_dealer_by_id_from_cf(endpoint)
         if dealership:
             return JsonResponse({
                 "status": 200,
-                "dealer": dealership.__dict__
+                "dealer": dealership.to_dict()
             })
     return JsonResponse({"status": 404, "message": "Dealer not found"})
 
 
+def _reviews_page_size(request):
+    """Return the requested page size, or None if it is not a valid number."""
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_REVIEWS_PAGE_SIZE))
+    except ValueError:
+        return None
+    return min(max(limit, 1), MAX_REVIEWS_PAGE_SIZE)
+
+
+def _wants_reviews_page(request):
+    return "limit" in request.GET or "cursor" in request.GET
+
+
+def _ndjson_reviews(reviews):
+    for row in iter_json_rows(reviews):
+        yield row + "\n"
+
+
 def get_dealer_reviews(request, dealer_id):
-    """Get reviews for a specific dealer."""
+    """Get reviews for a specific dealer.
+
+    Pass ``limit`` and/or ``cursor`` for one page of results with a
+    ``next_cursor``, or ``format=ndjson`` to stream every review one line
+    at a time.
+    """
     if dealer_id:
+        limit = _reviews_page_size(request)
+        if limit is None:
+            return JsonResponse({"status": 400, "message": "Invalid limit"})
+        if request.GET.get("format") == "ndjson":
+            reviews = iter_dealer_reviews_from_cf(dealer_id, page_size=limit)
+            return StreamingHttpResponse(_ndjson_reviews(reviews), content_type="application/x-ndjson")
+        if _wants_reviews_page(request):
+            reviews, next_cursor = get_dealer_reviews_page_from_cf(
+                dealer_id, limit, request.GET.get("cursor")
+            )
+            return _records_response("reviews", reviews, next_cursor=next_cursor)
+
         endpoint = f"/api/review?id={dealer_id}"
         reviews = get_dealer_reviews_from_cf(endpoint)
-        reviews_json = [review.__dict__ for review in reviews]
-        return JsonResponse({"status": 200, "reviews": reviews_json})
+        return _records_response("reviews", reviews)
+    return JsonResponse({"status": 400, "message": "Dealer ID required"})
+
+
+async def get_dealerships_async(request, state="All"):
+    """Async variant of get_dealerships for ASGI deployments."""
+    if dealer_directory.is_warm():
+        dealerships = _directory_dealers(state)
+    else:
+        dealer_directory.refresh_in_background()
+        dealerships = await async_get_dealers_from_cf(_dealers_endpoint(state))
+    return _records_response("dealers", dealerships)
+
+
+async def get_dealer_details_async(request, dealer_id):
+    """Async variant of get_dealer_details for ASGI deployments."""
+    if dealer_id:
+        dealership = dealer_directory.get(dealer_id) if dealer_directory.is_warm() else None
+        if dealership is None:
+            endpoint = f"/api/dealership?id={dealer_id}"
+            dealership = await async_get_dealer_by_id_from_cf(endpoint)
+        if dealership:
+            return JsonResponse({
+                "status": 200,
+                "dealer": dealership.to_dict()
+            })
+    return JsonResponse({"status": 404, "message": "Dealer not found"})
+
+
+async def _async_ndjson_reviews(reviews):
+    async for review in reviews:
+        yield dumps_record(review) + "\n"
+
+
+async def get_dealer_reviews_async(request, dealer_id):
+    """Async variant of get_dealer_reviews for ASGI deployments."""
+    if dealer_id:
+        limit = _reviews_page_size(request)
+        if limit is None:
+            return JsonResponse({"status": 400, "message": "Invalid limit"})
+        if request.GET.get("format") == "ndjson":
+            reviews = async_iter_dealer_reviews_from_cf(dealer_id, page_size=limit)
+            return StreamingHttpResponse(_async_ndjson_reviews(reviews), content_type="application/x-ndjson")
+        if _wants_reviews_page(request):
+            reviews, next_cursor = await async_get_dealer_reviews_page_from_cf(
+                dealer_id, limit, request.GET.get("cursor")
+            )
+            return _records_response("reviews", reviews, next_cursor=next_cursor)
+
+        endpoint = f"/api/review?id={dealer_id}"
+        reviews = await async_get_dealer_reviews_from_cf(endpoint)
+        return _records_response("reviews", reviews)
     return JsonResponse({"status": 400, "message": "Dealer ID required"})
 
 
@@ -61,6 +225,8 @@ def add_review(request):
         
         try:
             data = json.loads(request.body)
+            if not data.get("dealership") or not data.get("review"):
+                return JsonResponse({"status": 400, "message": "dealership and review are required"})
             review = {
                 "name": f"{request.user.first_name} {request.user.last_name}",
                 "dealership": data.get("dealership"),
@@ -71,13 +237,29 @@ def add_review(request):
                 "car_model": data.get("car_model", ""),
                 "car_year": data.get("car_year", ""),
             }
+
+            if settings.REVIEW_QUEUE_ENABLED:
+                key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+                if key is not None:
+                    try:
+                        key = scoped_idempotency_key(key, request.user.pk)
+                    except ValueError as e:
+                        return JsonResponse({"status": 400, "message": str(e)})
+                key = get_review_queue().enqueue(review, key=key)
+                return JsonResponse({"status": 200, "queued": True, "id": key})
             
             # Analyze sentiment
-            sentiment = analyze_review_sentiments(review["review"])
+            sentiment, version = analyze_review_sentiments(review["review"], with_version=True)
             review["sentiment"] = sentiment
+            review["sentiment_version"] = version
             
             endpoint = "/api/review"
             result = post_review(endpoint, review)
+            if result is None:
+                return JsonResponse({"status": 503, "message": "Review service unavailable"})
+            review_id = written_review_id(result)
+            if review_id is not None:
+                record_reviews([dict(review, _id=review_id)])
             return JsonResponse({"status": 200, "result": result})
         except Exception as e:
             logger.error(f"Error adding review: {e}")
@@ -86,6 +268,48 @@ def add_review(request):
     return JsonResponse({"status": 405, "message": "Method not allowed"})
 
 
+def search_reviews(request):
+    """Full-text search over reviews, best match first.
+
+    ``q`` is required; ``sentiment`` and ``dealer_id`` filter the matches,
+    and ``limit``/``cursor`` page through them.
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"status": 400, "message": "q is required"})
+    sentiment = request.GET.get("sentiment") or None
+    if sentiment is not None and sentiment not in SENTIMENT_LABELS:
+        return JsonResponse({"status": 400, "message": "Invalid sentiment"})
+    try:
+        dealer_id = _int_param(request, "dealer_id")
+        limit = _int_param(request, "limit") or DEFAULT_SEARCH_PAGE_SIZE
+        offset = max(_int_param(request, "cursor") or 0, 0)
+    except ValueError as e:
+        return JsonResponse({"status": 400, "message": str(e)})
+
+    reviews, next_offset = get_review_search().search(
+        query, sentiment=sentiment, dealer_id=dealer_id,
+        limit=min(max(limit, 1), MAX_SEARCH_PAGE_SIZE), offset=offset,
+    )
+    next_cursor = str(next_offset) if next_offset is not None else None
+    return JsonResponse({"status": 200, "reviews": reviews, "next_cursor": next_cursor})
+
+
+def get_dealer_review_stats(request):
+    """Review aggregates for the dealers in ``dealer_id`` (comma separated or repeated)."""
+    values = [v for param in request.GET.getlist("dealer_id") for v in param.split(",") if v.strip()]
+    if not values:
+        return JsonResponse({"status": 400, "message": "dealer_id is required"})
+    if len(values) > MAX_STATS_DEALERS:
+        return JsonResponse({"status": 400, "message": f"At most {MAX_STATS_DEALERS} dealers per request"})
+    try:
+        dealer_ids = list(dict.fromkeys(int(v) for v in values))
+    except ValueError:
+        return JsonResponse({"status": 400, "message": "Invalid dealer_id"})
+    stats = get_review_stats().get_many(dealer_ids)
+    return JsonResponse({"status": 200, "stats": [stats[dealer_id] for dealer_id in dealer_ids]})
+
+
 @csrf_exempt
 def login_request(request):
     """Handle user login."""
@@ -162,22 +386,67 @@ def registration(request):
     return JsonResponse({"status": 405, "message": "Method not allowed"})
 
 
+def _int_param(request, name):
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}")
+
+
+def _cars_query(request):
+    """Translate get_cars query parameters into ``query_catalog`` arguments."""
+    filters = {}
+    if request.GET.get("make"):
+        filters["car_make__name"] = request.GET["make"]
+    if request.GET.get("car_type"):
+        car_type = request.GET["car_type"]
+        codes = {label.upper(): code for code, label in CAR_TYPE_LABELS.items()}
+        code = codes.get(car_type.upper())
+        if code is None:
+            raise ValueError("Invalid car_type")
+        filters["car_type"] = code
+    for param, lookup in (("year_min", "year__gte"), ("year_max", "year__lte"), ("dealer_id", "dealer_id")):
+        value = _int_param(request, param)
+        if value is not None:
+            filters[lookup] = value
+
+    fields = [f for f in request.GET.get("fields", "").split(",") if f]
+    unknown = [f for f in fields if f not in CATALOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    limit = _int_param(request, "limit") or DEFAULT_CARS_PAGE_SIZE
+    return filters, fields, min(max(limit, 1), MAX_CARS_PAGE_SIZE), _int_param(request, "cursor")
+
+
 def get_cars(request):
-    """Get all car makes and models."""
-    count = CarMake.objects.count()
-    if count == 0:
-        _initiate_cars()
-    
-    car_models = CarModel.objects.select_related('car_make')
-    cars = [{
-        "CarModel": cm.name,
-        "CarMake": cm.car_make.name,
-        "CarType": cm.get_car_type_display(),
-        "ModelYear": cm.year,
-        "DealerId": cm.dealer_id,
-    } for cm in car_models]
-    
-    return JsonResponse({"CarModels": cars})
+    """Get all car makes and models.
+
+    Without query parameters the body is served from the precomputed
+    catalog, with an ETag and Last-Modified so unchanged catalogs are
+    answered with a 304. ``make``, ``car_type``, ``year_min``,
+    ``year_max``, ``dealer_id``, ``fields``, ``limit`` and ``cursor``
+    select one indexed page instead, returned with a ``next_cursor``.
+    """
+    if any(param in request.GET for param in CARS_QUERY_PARAMS):
+        try:
+            filters, fields, limit, after = _cars_query(request)
+        except ValueError as e:
+            return JsonResponse({"status": 400, "message": str(e)})
+        cars, next_cursor = query_catalog(filters, fields, limit, after)
+        return JsonResponse({"CarModels": cars, "next_cursor": next_cursor})
+
+    entry = car_catalog.get()
+    last_modified = int(entry.built_at)
+    response = get_conditional_response(request, etag=entry.etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(entry.body, content_type="application/json")
+    response["ETag"] = entry.etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
 
 
 def analyze_review(request):
@@ -193,58 +462,6 @@ def analyze_review(request):
     return JsonResponse({"status": 405, "message": "Method not allowed"})
 
 
-def _initiate_cars():
-    """Populate initial car data."""
-    makes_data = [
-        {"name": "Toyota", "description": "Japanese automobile manufacturer", "country_of_origin": "Japan", "founded_year": 1937},
-        {"name": "Ford", "description": "American automobile manufacturer", "country_of_origin": "USA", "founded_year": 1903},
-        {"name": "Honda", "description": "Japanese automobile manufacturer", "country_of_origin": "Japan", "founded_year": 1948},
-        {"name": "Chevrolet", "description": "American automobile manufacturer", "country_of_origin": "USA", "founded_year": 1911},
-        {"name": "BMW", "description": "German luxury automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1916},
-        {"name": "Mercedes-Benz", "description": "German luxury automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1926},
-        {"name": "Hyundai", "description": "South Korean automobile manufacturer", "country_of_origin": "South Korea", "founded_year": 1967},
-        {"name": "Volkswagen", "description": "German automobile manufacturer", "country_of_origin": "Germany", "founded_year": 1937},
-    ]
-    
-    models_data = [
-        {"make": "Toyota", "name": "Camry", "type": "SEDAN", "year": 2023},
-        {"make": "Toyota", "name": "RAV4", "type": "SUV", "year": 2022},
-        {"make": "Toyota", "name": "Corolla", "type": "SEDAN", "year": 2021},
-        {"make": "Ford", "name": "F-150", "type": "TRUCK", "year": 2023},
-        {"make": "Ford", "name": "Explorer", "type": "SUV", "year": 2022},
-        {"make": "Ford", "name": "Mustang", "type": "COUPE", "year": 2023},
-        {"make": "Honda", "name": "Civic", "type": "SEDAN", "year": 2023},
-        {"make": "Honda", "name": "CR-V", "type": "SUV", "year": 2022},
-        {"make": "Honda", "name": "Accord", "type": "SEDAN", "year": 2021},
-        {"make": "Chevrolet", "name": "Silverado", "type": "TRUCK", "year": 2023},
-        {"make": "Chevrolet", "name": "Equinox", "type": "SUV", "year": 2022},
-        {"make": "BMW", "name": "3 Series", "type": "SEDAN", "year": 2023},
-        {"make": "BMW", "name": "X5", "type": "SUV", "year": 2022},
-        {"make": "Mercedes-Benz", "name": "C-Class", "type": "SEDAN", "year": 2023},
-        {"make": "Mercedes-Benz", "name": "GLE", "type": "SUV", "year": 2022},
-        {"make": "Hyundai", "name": "Elantra", "type": "SEDAN", "year": 2023},
-        {"make": "Hyundai", "name": "Tucson", "type": "SUV", "year": 2022},
-        {"make": "Volkswagen", "name": "Jetta", "type": "SEDAN", "year": 2023},
-        {"make": "Volkswagen", "name": "Tiguan", "type": "SUV", "year": 2022},
-    ]
-    
-    make_objects = {}
-    for make_data in makes_data:
-        make, _ = CarMake.objects.get_or_create(
-            name=make_data["name"],
-            defaults=make_data
-        )
-        make_objects[make_data["name"]] = make
-    
-    for model_data in models_data:
-        make = make_objects.get(model_data["make"])
-        if make:
-            CarModel.objects.get_or_create(
-                car_make=make,
-                name=model_data["name"],
-                defaults={
-                    "car_type": model_data["type"],
-                    "year": model_data["year"],
-                    "dealer_id": None,
-                }
-            )
+def metrics(request):
+    """Expose request and upstream-call metrics in the Prometheus text format."""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4")
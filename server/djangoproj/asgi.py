@@ -0,0 +1,10 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoproj.settings')
+application = get_asgi_application()
+
+# Flush reviews journalled before a restart without waiting for a new one
+from djangoapp.restapis import start_review_queue  # noqa: E402
+
+start_review_queue()
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'djangoapp.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -60,6 +61,31 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'djangoproj.wsgi.application'
+ASGI_APPLICATION = 'djangoproj.asgi.application'
+
+# Serve the dealer/review proxy views as async views (use with asgi.py)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+
+# Write-behind review ingestion (see djangoapp/review_queue.py)
+REVIEW_QUEUE_ENABLED = os.environ.get('REVIEW_QUEUE_ENABLED', 'False') == 'True'
+REVIEW_QUEUE_PATH = os.environ.get('REVIEW_QUEUE_PATH', str(BASE_DIR / 'review_queue.sqlite3'))
+REVIEW_QUEUE_BATCH_SIZE = int(os.environ.get('REVIEW_QUEUE_BATCH_SIZE', '50'))
+REVIEW_QUEUE_FLUSH_INTERVAL = float(os.environ.get('REVIEW_QUEUE_FLUSH_INTERVAL', '1.0'))
+REVIEW_QUEUE_LEASE_TIMEOUT = float(os.environ.get('REVIEW_QUEUE_LEASE_TIMEOUT', '300'))
+REVIEW_QUEUE_DONE_RETENTION = float(os.environ.get('REVIEW_QUEUE_DONE_RETENTION', '86400'))
+
+# SQLite FTS5 file for review search; rebuild with manage.py rebuild_review_search.
+# Shared by every worker on the host; ':memory:' keeps a private index per process.
+REVIEW_SEARCH_PATH = os.environ.get('REVIEW_SEARCH_PATH', str(BASE_DIR / 'review_search.sqlite3'))
+
+# SQLite file for per-dealer review aggregates; rebuild with manage.py rebuild_review_stats
+REVIEW_STATS_PATH = os.environ.get('REVIEW_STATS_PATH', str(BASE_DIR / 'review_stats.sqlite3'))
+
+# Seconds the serialised car catalog may be served before it is rebuilt
+CAR_CATALOG_TTL = int(os.environ.get('CAR_CATALOG_TTL', '300'))
+
+# Load the built-in car catalog after every migrate (see also manage.py seed_cars)
+SEED_CARS_ON_MIGRATE = os.environ.get('SEED_CARS_ON_MIGRATE', 'False') == 'True'
 
 DATABASES = {
     'default': {
@@ -3,3 +3,8 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoproj.settings')
 application = get_wsgi_application()
+
+# Flush reviews journalled before a restart without waiting for a new one
+from djangoapp.restapis import start_review_queue  # noqa: E402
+
+start_review_queue()
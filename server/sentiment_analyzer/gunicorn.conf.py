@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for the sentiment service.
+The app and its lexicon are loaded in the master before forking so workers
+share them copy-on-write. SIGTERM drains in-flight requests for up to
+``graceful_timeout`` seconds before workers exit.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 20))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = '-'
+errorlog = '-'
+
+
+def worker_int(worker):
+    worker.log.info(f"Worker {worker.pid} interrupted, shutting down")
+
+
+def on_exit(server):
+    server.log.info("Sentiment service stopped")
@@ -0,0 +1,85 @@
+"""
+Compiled keyword lexicon shared by the sentiment analyzers.
+Text is tokenised once and every token is looked up in a prebuilt hash
+table, so scoring is a single linear pass regardless of lexicon size.
+"""
+
+import re
+from collections import namedtuple
+
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+NEGATORS = frozenset([
+    "not", "no", "isn't", "wasn't", "aren't", "weren't", "don't", "didn't",
+    "doesn't", "won't", "wouldn't", "can't", "cannot", "couldn't", "hardly",
+    "without", "nothing", "neither", "nor",
+])
+
+Score = namedtuple("Score", "label score positive negative positive_hits negative_hits")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens, keeping contractions whole."""
+    return TOKEN_RE.findall(text.lower().replace("’", "'"))
+
+
+class Lexicon:
+    """Weighted positive/negative term table with simple negation.
+
+    ``positive`` and ``negative`` are iterables of terms (weight 1) or
+    mappings of term to weight. A negator flips the polarity of the next
+    lexicon term found within ``negation_window`` tokens.
+    """
+
+    def __init__(self, positive, negative, negators=NEGATORS, negation_window=3):
+        self.weights = {}
+        for terms, sign in ((positive, 1.0), (negative, -1.0)):
+            if not hasattr(terms, "items"):
+                terms = dict.fromkeys(terms, 1.0)
+            for term, weight in terms.items():
+                self.weights[term.lower()] = sign * float(weight)
+        self.negators = frozenset(negators)
+        self.negation_window = negation_window
+
+    def __contains__(self, term):
+        return term in self.weights
+
+    def score(self, text):
+        """Score ``text`` and return a :class:`Score`."""
+        weights = self.weights
+        negators = self.negators
+        positive = negative = 0.0
+        positive_hits = negative_hits = 0
+        negate_until = -1
+
+        for i, token in enumerate(tokenize(text or "")):
+            weight = weights.get(token)
+            if weight is None:
+                if token in negators:
+                    negate_until = i + self.negation_window
+                continue
+            if i <= negate_until:
+                weight = -weight
+                negate_until = -1
+            if weight > 0:
+                positive += weight
+                positive_hits += 1
+            else:
+                negative -= weight
+                negative_hits += 1
+
+        total = positive + negative
+        if positive > negative:
+            return Score("positive", positive / total, positive, negative, positive_hits, negative_hits)
+        if negative > positive:
+            return Score("negative", -negative / total, positive, negative, positive_hits, negative_hits)
+        return Score("neutral", 0, positive, negative, positive_hits, negative_hits)
+
+    def label(self, text):
+        """Return only the sentiment label for ``text``."""
+        return self.score(text).label
+
+    def score_many(self, texts):
+        """Score a sequence of texts, preserving order."""
+        score = self.score
+        return [score(text) for text in texts]
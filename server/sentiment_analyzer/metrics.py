@@ -0,0 +1,72 @@
+"""
+Minimal in-process request metrics rendered in the Prometheus text format.
+Each worker process keeps its own counters.
+"""
+
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class RequestMetrics:
+    """Request counters and latency histograms keyed by label tuples."""
+
+    def __init__(self, prefix, buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._histograms = {}
+
+    def observe(self, duration, **labels):
+        """Record one request that took ``duration`` seconds."""
+        count_key = tuple(sorted(labels.items()))
+        histogram_key = tuple((k, v) for k, v in count_key if k != "status")
+        index = bisect_left(self.buckets, duration)
+        with self._lock:
+            self._counts[count_key] = self._counts.get(count_key, 0) + 1
+            histogram = self._histograms.get(histogram_key)
+            if histogram is None:
+                histogram = self._histograms[histogram_key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += duration
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        name = self.prefix
+        lines = [
+            f"# HELP {name}_requests_total Total requests handled.",
+            f"# TYPE {name}_requests_total counter",
+        ]
+        with self._lock:
+            counts = sorted(self._counts.items())
+            histograms = sorted((k, (list(v[0]), v[1])) for k, v in self._histograms.items())
+        for labels, count in counts:
+            lines.append(f"{name}_requests_total{_format_labels(labels)} {count}")
+
+        lines += [
+            f"# HELP {name}_request_duration_seconds Request latency.",
+            f"# TYPE {name}_request_duration_seconds histogram",
+        ]
+        for labels, (bucket_counts, total) in histograms:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(labels + (("le", le),))
+                lines.append(f"{name}_request_duration_seconds_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_request_duration_seconds_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_request_duration_seconds_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
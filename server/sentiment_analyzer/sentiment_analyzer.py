@@ -5,6 +5,48 @@ This can be deployed as a standalone Flask app or IBM Cloud Function.
 
 import json
 import os
+import time
+
+try:
+    from .lexicon import Lexicon
+    from .metrics import RequestMetrics
+except ImportError:
+    from lexicon import Lexicon
+    from metrics import RequestMetrics
+
+POSITIVE_WORDS = {
+    "great": 1, "excellent": 2, "amazing": 2, "fantastic": 2, "wonderful": 2,
+    "good": 1, "best": 2, "love": 2, "loved": 2, "perfect": 2,
+    "outstanding": 2, "superb": 2, "awesome": 2, "happy": 1, "satisfied": 1,
+    "recommend": 1, "recommended": 1, "helpful": 1, "friendly": 1, "clean": 1,
+    "fast": 1, "efficient": 1, "professional": 1, "knowledgeable": 1,
+    "honest": 1, "transparent": 1, "fair": 1, "exceptional": 2,
+    "brilliant": 2, "smooth": 1,
+}
+
+NEGATIVE_WORDS = {
+    "bad": 1, "terrible": 2, "horrible": 2, "awful": 2, "worst": 2,
+    "hate": 2, "hated": 2, "poor": 1, "disappointing": 1, "disappointed": 1,
+    "unhappy": 1, "rude": 1, "dirty": 1, "slow": 1, "overpriced": 1,
+    "broken": 1, "failed": 1, "never": 1, "waste": 1, "problem": 1,
+    "problems": 1, "issue": 1, "issues": 1, "dishonest": 2,
+    "unprofessional": 1, "scam": 2, "fraud": 2, "angry": 1, "frustrated": 1,
+}
+
+# Built once at import so workers forked after loading share it
+LEXICON = Lexicon(POSITIVE_WORDS, NEGATIVE_WORDS)
+
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+
+def _result(text, score):
+    return {
+        "sentiment": score.label,
+        "score": score.score,
+        "text": text,
+        "positive_signals": score.positive_hits,
+        "negative_signals": score.negative_hits
+    }
 
 
 def analyze_sentiment(text):
@@ -15,58 +57,87 @@ def analyze_sentiment(text):
     if not text or not text.strip():
         return {"sentiment": "neutral", "score": 0, "text": text}
 
-    positive_words = [
-        "great", "excellent", "amazing", "fantastic", "wonderful", "good",
-        "best", "love", "perfect", "outstanding", "superb", "awesome",
-        "happy", "satisfied", "recommend", "helpful", "friendly", "clean",
-        "fast", "efficient", "professional", "knowledgeable", "honest",
-        "transparent", "fair", "exceptional", "brilliant", "smooth"
-    ]
-    
-    negative_words = [
-        "bad", "terrible", "horrible", "awful", "worst", "hate", "poor",
-        "disappointing", "unhappy", "rude", "dirty", "slow", "overpriced",
-        "broken", "failed", "never", "waste", "problem", "issue", "dishonest",
-        "unprofessional", "scam", "fraud", "angry", "frustrated", "terrible"
+    return _result(text, LEXICON.score(text))
+
+
+def analyze_sentiment_many(texts):
+    """Analyze a list of texts in one pass, preserving order."""
+    texts = list(texts)
+    scores = LEXICON.score_many(texts)
+    return [
+        _result(text, score) if text and text.strip()
+        else {"sentiment": "neutral", "score": 0, "text": text}
+        for text, score in zip(texts, scores)
     ]
 
-    text_lower = text.lower()
-    pos_count = sum(1 for word in positive_words if word in text_lower)
-    neg_count = sum(1 for word in negative_words if word in text_lower)
 
-    if pos_count > neg_count:
-        sentiment = "positive"
-        score = min(pos_count / max(pos_count + neg_count, 1), 1.0)
-    elif neg_count > pos_count:
-        sentiment = "negative"
-        score = -min(neg_count / max(pos_count + neg_count, 1), 1.0)
-    else:
-        sentiment = "neutral"
-        score = 0
+def find_non_string(texts):
+    """Return the index of the first entry in ``texts`` that is not a string, or None."""
+    for i, text in enumerate(texts):
+        if not isinstance(text, str):
+            return i
+    return None
 
-    return {
-        "sentiment": sentiment,
-        "score": score,
-        "text": text,
-        "positive_signals": pos_count,
-        "negative_signals": neg_count
-    }
+
+def parse_ndjson(body):
+    """Parse NDJSON lines holding either a JSON string or {"text": ...}."""
+    texts = []
+    for line in body.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        texts.append(item.get("text", "") if isinstance(item, dict) else item)
+    return texts
 
 
 def main(params):
-    """IBM Cloud Function entry point."""
+    """IBM Cloud Function entry point.
+
+    Pass ``text`` for a single review or ``texts`` (a list) for batch mode.
+    """
+    if "texts" in params:
+        texts = params.get("texts")
+        if not isinstance(texts, list):
+            return {"statusCode": 400, "body": {"error": "texts must be a list"}}
+        if len(texts) > MAX_BATCH_SIZE:
+            return {"statusCode": 413, "body": {"error": f"At most {MAX_BATCH_SIZE} texts per batch"}}
+        bad = find_non_string(texts)
+        if bad is not None:
+            return {"statusCode": 400, "body": {"error": f"texts[{bad}] must be a string"}}
+        return {"statusCode": 200, "body": {"results": analyze_sentiment_many(texts)}}
+
     text = params.get("text", "")
+    if not isinstance(text, str):
+        return {"statusCode": 400, "body": {"error": "text must be a string"}}
     result = analyze_sentiment(text)
     return {"statusCode": 200, "body": result}
 
 
 # Flask app for local/standalone deployment
 try:
-    from flask import Flask, request, jsonify
+    from flask import Flask, Response, g, request, jsonify
     from flask_cors import CORS
 
     app = Flask(__name__)
     CORS(app)
+    metrics = RequestMetrics("sentiment")
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None and request.endpoint != 'metrics_view':
+            metrics.observe(
+                time.perf_counter() - start,
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code,
+            )
+        return response
 
     @app.route('/analyze', methods=['GET', 'POST'])
     def analyze():
@@ -75,14 +146,46 @@ try:
             text = data.get('text', '')
         else:
             text = request.args.get('text', '')
-        
+        if not isinstance(text, str):
+            return jsonify({"error": "text must be a string"}), 400
+
         result = analyze_sentiment(text)
         return jsonify(result)
 
+    @app.route('/analyze/batch', methods=['POST'])
+    def analyze_batch():
+        ndjson = request.mimetype == 'application/x-ndjson'
+        try:
+            if ndjson:
+                texts = parse_ndjson(request.get_data(as_text=True))
+            else:
+                data = request.get_json(silent=True) or {}
+                texts = data.get('texts', [])
+        except ValueError:
+            return jsonify({"error": "Invalid NDJSON body"}), 400
+
+        if not isinstance(texts, list):
+            return jsonify({"error": "texts must be a list"}), 400
+        if len(texts) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} texts per batch"}), 413
+        bad = find_non_string(texts)
+        if bad is not None:
+            return jsonify({"error": f"texts[{bad}] must be a string"}), 400
+
+        results = analyze_sentiment_many(texts)
+        if ndjson:
+            body = "".join(json.dumps(result) + "\n" for result in results)
+            return Response(body, mimetype='application/x-ndjson')
+        return jsonify({"results": results})
+
     @app.route('/health', methods=['GET'])
     def health():
         return jsonify({"status": "healthy", "service": "sentiment-analyzer"})
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics_view():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
     if __name__ == '__main__':
         port = int(os.environ.get('PORT', 5000))
         app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for running the sentiment service under gunicorn, either
+from this directory or as a package from server/:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    gunicorn -c sentiment_analyzer/gunicorn.conf.py sentiment_analyzer.wsgi:app
+"""
+
+# LEXICON is imported so it is loaded before fork
+if __package__:
+    from .sentiment_analyzer import app, LEXICON  # noqa: F401
+else:
+    from sentiment_analyzer import app, LEXICON  # noqa: F401
@@ -35,6 +35,7 @@ echo "🗄️  Setting up Django database..."
 cd server
 python manage.py makemigrations
 python manage.py migrate
+python manage.py seed_cars
 
 # Create superuser
 echo ""